@@ -0,0 +1,520 @@
+# ruff: noqa: E501
+# /// script
+# requires-python = ">=3.11"
+# dependencies = [
+#   "jinja2",
+#   "PyYAML",
+#   "python-dotenv",
+# ]
+# ///
+# https://docs.astral.sh/uv/guides/scripts/#creating-a-python-script
+# https://packaging.python.org/en/latest/specifications/inline-script-metadata/#inline-script-metadata
+#
+# Micro-benchmark suite for the hot functions across this repo that get called in loops.
+#
+# Every case generates realistic inputs at a range of sizes (small -> xlarge), times the target function with
+# timeit and stores every raw sample so that two runs can be compared statistically rather than by eyeballing means.
+#
+# USAGE:
+#   python3 benchmarks/bench.py run [--output FILE] [--filter SUBSTRING] [--sizes small,medium] [--repeat N]
+#   python3 benchmarks/bench.py compare BASELINE [CURRENT] [--alpha 0.01] [--threshold 0.05]
+#
+# `run` writes a JSON baseline (default: benchmarks/baselines/latest.json).
+# `compare` flags cases where CURRENT is slower than BASELINE with a one-sided Mann-Whitney U test AND the median
+# slowdown exceeds --threshold. When CURRENT is omitted the suite is run fresh with the same cases and sizes as the
+# baseline. Exit code is 1 when any regression is flagged so it can gate CI.
+#
+# The injinja cases cache in a temporary directory of their own, never in ~/.cache/injinja.
+#
+# Standard Library
+import argparse
+import functools
+import importlib.util
+import json
+import logging
+import os
+import platform
+import random
+import shlex
+import statistics
+import string
+import subprocess
+import sys
+import tempfile
+import timeit
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from types import ModuleType
+
+log = logging.getLogger(__name__)
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT / "src") not in sys.path:  # Benchmark the package of this checkout, not an installed copy
+    sys.path.insert(0, str(REPO_ROOT / "src"))
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+SIZES = ["small", "medium", "large", "xlarge"]
+
+# A benchmark setup returns the zero-arg callable to time and an optional teardown.
+Setup = tuple[Callable[[], object], Callable[[], None] | None]
+
+
+def load_script(name: str, path: Path) -> ModuleType:
+    """Import a standalone script (which may have a hyphenated filename) as a module."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, path)
+    if spec is None or spec.loader is None:  # pragma: no cover
+        raise ImportError(f"Cannot load {path}")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _word(rng: random.Random, length: int = 8) -> str:
+    return "".join(rng.choices(string.ascii_lowercase, k=length))
+
+
+@dataclass
+class Case:
+    """A benchmark case: a named target and the input size for each size label."""
+
+    name: str
+    sizes: dict[str, int]
+    setup: Callable[[int, Path], Setup]
+
+
+# ------------------------------------------------------------------------------
+# Cases
+# ------------------------------------------------------------------------------
+
+
+def setup_cli_handle_args(n: int, workdir: Path) -> Setup:
+    # Our Libraries
+    from python_onboarding_guide.utils import cli_handle_args
+
+    # The factory derives short flags from the first letter so flag names need distinct first letters (not -h).
+    letters = [letter for letter in string.ascii_lowercase if letter != "h"]
+    flags = [f"{letter}{_word(random.Random(n), 6)}" for letter in letters[:n]]
+    config = {flag: None for flag in flags}
+    args = [arg for flag in flags for arg in (f"--{flag}", f"value-{flag}")]
+    return (lambda: cli_handle_args(config, args)), None
+
+
+def setup_cli_resolve_env_var(n: int, workdir: Path) -> Setup:
+    # Our Libraries
+    from python_onboarding_guide.utils import ENV_PREFIX, cli_resolve_env_var
+
+    rng = random.Random(n)
+    keys = [f"key_{i}_{_word(rng, 4)}" for i in range(n)]
+    for key in keys:
+        os.environ[ENV_PREFIX + key.upper()] = _word(rng, 16)
+    lookups = keys[:: max(1, n // 100)]
+
+    def run() -> None:
+        for key in lookups:
+            cli_resolve_env_var(key)
+
+    def teardown() -> None:
+        for key in keys:
+            os.environ.pop(ENV_PREFIX + key.upper(), None)
+
+    return run, teardown
+
+
+def _write_template(workdir: Path, n: int) -> tuple[Path, dict]:
+    rng = random.Random(n)
+    template = workdir / f"template_{n}.sql.j2"
+    template.write_text(
+        "-- generated for {{ database }}.{{ schema }}\n"
+        "{% for table in tables %}\n"
+        "CREATE TABLE IF NOT EXISTS {{ database }}.{{ schema }}.{{ table.name }} (\n"
+        "{% for col in table.columns %}    {{ col.name }} {{ col.type }}{{ ',' if not loop.last }}\n{% endfor %}"
+        ");\n"
+        "{% endfor %}\n"
+    )
+    config = {
+        "database": "analytics",
+        "schema": "staging",
+        "tables": [
+            {
+                "name": _word(rng),
+                "columns": [{"name": _word(rng), "type": rng.choice(["VARCHAR", "NUMBER", "DATE"])} for _ in range(8)],
+            }
+            for _ in range(n)
+        ],
+    }
+    return template, config
+
+
+def _injinja(cache_dir: Path) -> tuple[ModuleType, Callable[[], None]]:
+    """injinja caching under cache_dir instead of ~/.cache/injinja, and the teardown restoring its CACHE_DIR."""
+    injinja = load_script("injinja", REPO_ROOT / "scripts" / "injinja.py")
+    previous = injinja.CACHE_DIR
+    injinja.CACHE_DIR = cache_dir
+    injinja.get_environment.cache_clear()  # Its bytecode cache is under CACHE_DIR
+
+    def restore() -> None:
+        injinja.CACHE_DIR = previous
+        injinja.get_environment.cache_clear()
+
+    return injinja, restore
+
+
+def setup_merge_template(n: int, workdir: Path) -> Setup:
+    injinja, restore = _injinja(workdir / f"cache-merge-{n}")
+    template, config = _write_template(workdir, n)
+    return (lambda: injinja.merge_template(str(template), config)), restore
+
+
+def _render_cache_setup(n: int, workdir: Path, mode: str) -> Setup:
+    """Render a template of n statements with the compiled-template caches in a given state.
+
+    cold: no in-memory Environment and an empty bytecode cache (first ever render).
+    bytecode: no in-memory Environment but a warm on-disk bytecode cache (a fresh process).
+    warm: the shared in-memory Environment already holds the compiled template.
+    """
+    # Standard Library
+    import shutil
+
+    injinja, restore = _injinja(workdir / f"cache-{mode}-{n}")
+    template = workdir / f"wide_{n}.sql.j2"
+    template.write_text(
+        "".join(
+            f"{{% if enabled_{i % 7} %}}SELECT {{{{ column_{i % 13} | upper }}}} FROM {{{{ schema }}}}.t{i};{{% endif %}}\n"
+            for i in range(n)
+        )
+    )
+    config = (
+        {"schema": "analytics"} | {f"enabled_{i}": True for i in range(7)} | {f"column_{i}": f"c{i}" for i in range(13)}
+    )
+
+    def run() -> None:
+        if mode != "warm":
+            injinja.get_environment.cache_clear()
+        if mode == "cold":
+            shutil.rmtree(injinja.CACHE_DIR, ignore_errors=True)
+        injinja.merge_template(str(template), config)
+
+    return run, restore
+
+
+def setup_load_config(n: int, workdir: Path, cached: bool = False) -> Setup:
+    # Standard Library
+    import shutil
+
+    # Third Party
+    import yaml
+
+    injinja, restore = _injinja(workdir / f"cache-config-{n}")
+    _, config = _write_template(workdir, n)
+    config["home_dir"] = "{{ home_dir }}"
+    config_file = workdir / f"config_{n}.yml"
+    config_file.write_text(yaml.safe_dump(config))
+    env = {"home_dir": "/home/bench"}
+
+    def run() -> None:
+        if not cached:
+            injinja._parse_cache.clear()
+            shutil.rmtree(injinja.CACHE_DIR / "parsed", ignore_errors=True)
+        injinja.load_config(str(config_file), env)
+
+    return run, restore
+
+
+def _shlex_read_env_file(env_file: Path) -> dict[str, str]:
+    """The per-line shlex parser exportenv.read_env_file used before the single-pass tokenizer, kept as a reference."""
+    values = {}
+    for line in env_file.read_text().splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, value = line.split("=", 1)
+        lexer = shlex.shlex(value, posix=True)
+        lexer.whitespace_split = True
+        values[key.strip()] = "".join(lexer)
+    return values
+
+
+def setup_read_env_file(n: int, workdir: Path, legacy: bool = False) -> Setup:
+    exportenv = load_script("exportenv", REPO_ROOT / "scripts" / "exportenv.py")
+    rng = random.Random(n)
+    lines = []
+    for i in range(n):
+        key = f"APP_{_word(rng, 6).upper()}_{i}"
+        style = i % 4
+        if style == 0:
+            lines.append(f"{key}={_word(rng, 24)}")
+        elif style == 1:
+            lines.append(f'{key}="{_word(rng, 8)} {_word(rng, 8)}" # inline comment')
+        elif style == 2:
+            lines.append(f"{key}='{_word(rng, 32)}'")
+        else:
+            lines.append(f"# comment about {key}")
+    env_file = workdir / f"env_{n}.env"
+    env_file.write_text("\n".join(lines) + "\n")
+    if legacy:
+        return (lambda: _shlex_read_env_file(env_file)), None
+    return (lambda: exportenv.read_env_file(env_file)), None
+
+
+def _pyenv_install_list(n: int) -> str:
+    """Generate a realistic `pyenv install --list` output with n entries."""
+    rng = random.Random(n)
+    entries = []
+    for _ in range(n):
+        minor, patch = rng.randint(0, 13), rng.randint(0, 20)
+        entries.append(
+            rng.choice(
+                [
+                    f"3.{minor}.{patch}",
+                    f"3.{minor}.{patch}",
+                    f"3.{minor}-dev",
+                    f"3.{minor}.{patch}rc1",
+                    f"pypy3.{minor}-7.3.{patch}",
+                    f"miniconda3-3.{minor}-{patch}",
+                ]
+            )
+        )
+    return "Available versions:\n" + "\n".join(f"  {entry}" for entry in entries) + "\n"
+
+
+def setup_max_patched_versions(n: int, workdir: Path) -> Setup:
+    latest_penv_versions = load_script("latest_penv_versions", REPO_ROOT / "latest_penv_versions.py")
+    entries = _pyenv_install_list(n).splitlines()[1:]
+    return functools.partial(latest_penv_versions.max_patched_versions, [e.strip() for e in entries]), None
+
+
+CASES = [
+    Case("utils.cli_handle_args", {"small": 3, "medium": 8, "large": 16, "xlarge": 25}, setup_cli_handle_args),
+    Case(
+        "utils.cli_resolve_env_var",
+        {"small": 10, "medium": 1_000, "large": 10_000, "xlarge": 50_000},
+        setup_cli_resolve_env_var,
+    ),
+    Case(
+        "injinja.merge_template", {"small": 10, "medium": 100, "large": 1_000, "xlarge": 10_000}, setup_merge_template
+    ),
+    *[
+        Case(
+            f"injinja.merge_template.{mode}",
+            {"small": 10, "medium": 100, "large": 1_000, "xlarge": 5_000},
+            functools.partial(_render_cache_setup, mode=mode),
+        )
+        for mode in ["cold", "bytecode", "warm"]
+    ],
+    Case("injinja.load_config", {"small": 10, "medium": 100, "large": 1_000, "xlarge": 5_000}, setup_load_config),
+    Case(
+        "injinja.load_config.cached",
+        {"small": 10, "medium": 100, "large": 1_000, "xlarge": 5_000},
+        functools.partial(setup_load_config, cached=True),
+    ),
+    Case(
+        "exportenv.read_env_file",
+        {"small": 10, "medium": 500, "large": 5_000, "xlarge": 50_000},
+        setup_read_env_file,
+    ),
+    Case(
+        "exportenv.read_env_file.shlex",
+        {"small": 10, "medium": 500, "large": 5_000, "xlarge": 50_000},
+        functools.partial(setup_read_env_file, legacy=True),
+    ),
+    Case(
+        "latest_penv_versions.max_patched_versions",
+        {"small": 50, "medium": 500, "large": 5_000, "xlarge": 50_000},
+        setup_max_patched_versions,
+    ),
+]
+
+
+# ------------------------------------------------------------------------------
+# Runner
+# ------------------------------------------------------------------------------
+
+
+def time_callable(fn: Callable[[], object], repeat: int) -> dict:
+    """Time fn with an autoranged loop count and return per-call samples in seconds."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    samples = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "number": number,
+        "samples": samples,
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+
+def run_suite(name_filter: str | None = None, sizes: list[str] | None = None, repeat: int = 10) -> dict:
+    """Run every matching case at every requested size."""
+    results: dict[str, dict] = {}
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        workdir = Path(tmp)
+        for case in CASES:
+            if name_filter and name_filter not in case.name:
+                continue
+            for size in sizes or SIZES:
+                if size not in case.sizes:
+                    continue
+                key = f"{case.name}[{size}]"
+                fn, teardown = case.setup(case.sizes[size], workdir)
+                try:
+                    fn()  # Warm up imports and lazily-built state before timing.
+                    results[key] = {"n": case.sizes[size], **time_callable(fn, repeat)}
+                finally:
+                    if teardown:
+                        teardown()
+                log.info(f"{key:<55} n={case.sizes[size]:<7} median={_fmt(results[key]['median'])}")
+    return results
+
+
+def _git_commit() -> str | None:
+    result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=REPO_ROOT)
+    return result.stdout.strip() or None
+
+
+def _fmt(seconds: float) -> str:
+    for unit, scale in [("s", 1.0), ("ms", 1e-3), ("us", 1e-6)]:
+        if seconds >= scale:
+            return f"{seconds / scale:8.3f} {unit}"
+    return f"{seconds / 1e-9:8.1f} ns"
+
+
+# ------------------------------------------------------------------------------
+# Statistics
+# ------------------------------------------------------------------------------
+
+
+def mann_whitney_greater(current: list[float], baseline: list[float]) -> float:
+    """One-sided Mann-Whitney U test p-value that `current` is stochastically greater than `baseline`.
+
+    Uses the normal approximation with tie and continuity correction which is adequate for n >= 5 per side.
+    """
+    n1, n2 = len(current), len(baseline)
+    pooled = sorted([(v, 0) for v in current] + [(v, 1) for v in baseline])
+
+    # Assign average ranks to ties
+    ranks = [0.0] * len(pooled)
+    tie_term = 0.0
+    i = 0
+    while i < len(pooled):
+        j = i
+        while j + 1 < len(pooled) and pooled[j + 1][0] == pooled[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        t = j - i + 1
+        tie_term += t**3 - t
+        i = j + 1
+
+    rank_sum = sum(rank for rank, (_, group) in zip(ranks, pooled, strict=True) if group == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2
+    mean_u = n1 * n2 / 2
+    n = n1 + n2
+    var_u = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if var_u <= 0:
+        return 1.0
+    z = (u - mean_u - 0.5) / var_u**0.5
+    return 1 - statistics.NormalDist().cdf(z)
+
+
+def compare(baseline: dict, current: dict, alpha: float, threshold: float) -> list[dict]:
+    """Compare two result sets and return one row per shared case."""
+    rows = []
+    for key, base in baseline["results"].items():
+        if key not in current["results"]:
+            continue
+        cur = current["results"][key]
+        ratio = cur["median"] / base["median"]
+        p_value = mann_whitney_greater(cur["samples"], base["samples"])
+        rows.append(
+            {
+                "case": key,
+                "baseline": base["median"],
+                "current": cur["median"],
+                "ratio": ratio,
+                "p_value": p_value,
+                "regression": p_value < alpha and ratio > 1 + threshold,
+            }
+        )
+    return rows
+
+
+# ------------------------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------------------------
+
+
+def cmd_run(args: argparse.Namespace) -> int:
+    sizes = args.sizes.split(",") if args.sizes else None
+    document = {
+        "meta": {
+            "created": datetime.now(UTC).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": run_suite(args.filter, sizes, args.repeat),
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(document, indent=2))
+    log.info(f"Wrote {len(document['results'])} results to {output}")
+    return 0
+
+
+def cmd_compare(args: argparse.Namespace) -> int:
+    baseline = json.loads(Path(args.baseline).read_text())
+    if args.current:
+        current = json.loads(Path(args.current).read_text())
+    else:
+        keys = baseline["results"].keys()
+        sizes = sorted({k.rsplit("[", 1)[1].rstrip("]") for k in keys}, key=SIZES.index)
+        current = {"results": run_suite(args.filter, sizes, baseline["meta"].get("repeat", 10))}
+
+    rows = compare(baseline, current, args.alpha, args.threshold)
+    print(f"{'case':<55} {'baseline':>11} {'current':>11} {'ratio':>7} {'p':>7}")
+    for row in rows:
+        flag = "  <-- REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['case']:<55} {_fmt(row['baseline'])} {_fmt(row['current'])} "
+            f"{row['ratio']:6.2f}x {row['p_value']:7.4f}{flag}"
+        )
+    regressions = [row for row in rows if row["regression"]]
+    print(f"\n{len(regressions)} significant slowdown(s) out of {len(rows)} case(s).")
+    return 1 if regressions else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks with stored JSON baselines.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Run the suite and write a JSON baseline.")
+    run.add_argument("-o", "--output", default=str(BASELINE_DIR / "latest.json"))
+    run.add_argument("-f", "--filter", default=None, help="Only run cases whose name contains this substring.")
+    run.add_argument("-s", "--sizes", default=None, help=f"Comma separated subset of {','.join(SIZES)}.")
+    run.add_argument("-r", "--repeat", type=int, default=10, help="Number of timed samples per case.")
+    run.set_defaults(func=cmd_run)
+
+    cmp = subparsers.add_parser("compare", help="Flag statistically significant slowdowns against a baseline.")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current", nargs="?", default=None, help="Results JSON. When omitted the suite is run now.")
+    cmp.add_argument("-f", "--filter", default=None)
+    cmp.add_argument("-a", "--alpha", type=float, default=0.01, help="Significance level of the one-sided test.")
+    cmp.add_argument("-t", "--threshold", type=float, default=0.05, help="Minimum relative median slowdown.")
+    cmp.set_defaults(func=cmd_compare)
+    return parser
+
+
+if __name__ == "__main__":
+    # Only this script logs at INFO so the loggers of the code under test stay quiet while being timed.
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    log.setLevel(logging.INFO)
+    cli_args = build_parser().parse_args(sys.argv[1:])
+    sys.exit(cli_args.func(cli_args))
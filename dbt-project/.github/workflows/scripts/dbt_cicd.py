@@ -1,19 +1,62 @@
 # /// script
 # requires-python = ">=3.12"
 # dependencies = [
-#   "requests",
-#   "types-requests"
+#   "aiohttp",
 # ]
 # ///
 # https://docs.astral.sh/uv/guides/scripts/#creating-a-python-script
 # https://packaging.python.org/en/latest/specifications/inline-script-metadata/#inline-script-metadata
 # Adapted from https://github.com/dbt-labs/jaffle-shop/blob/main/.github/workflows/scripts/dbt_cloud_run_job.py
+#
+# All requests go through one DbtCloudClient: a single pooled keep-alive aiohttp session with timeouts, retrying
+# transient failures, so any number of runs can be monitored concurrently from one event loop.
+#
+# The client also rate limits itself with a token bucket shared by every request: $DBT_CLOUD_API_RATE requests per
+# second (default 5, 0 for no limit). A 429's Retry-After, or X-RateLimit-Remaining: 0 until X-RateLimit-Reset, holds
+# back every request, not just the one that got it, and while requests are waiting for a token, triggering runs goes
+# before polling them, which goes before downloading artifacts.
+#
+# Polling follows the run status: every few seconds while Queued or Starting, then at a jittered interval that backs
+# off while Running. The Running duration of every successful run is kept per job in $DBT_RUN_HISTORY (default
+# ~/.cache/dbt_cicd/history.json, cache it between CI runs to keep it), and the median of the recent ones predicts
+# when a run will finish: polls are spaced out until shortly before that, then tightened around it. The whole run,
+# queue included, must finish within $DBT_JOB_TIMEOUT seconds (default 7200, 0 for no limit).
+#
+# USAGE:
+# uv run dbt_cicd.py                                    # The job $DBT_CLOUD_JOB_ID
+# uv run dbt_cicd.py -j 101 -j 102 -s pr_1 -s pr_1_full  # Every job with every schema override, 4 at a time
+# uv run dbt_cicd.py --matrix runs.json --concurrency 8  # [{"job": 101, "schema_override": "pr_1", ...}, ...]
+# uv run dbt_cicd.py --artifacts target/ --artifact manifest.json --artifact run_results.json
+#
+# Matrix runs are triggered and monitored concurrently from one event loop, at most --concurrency in flight. Status
+# transitions are logged per run as they happen, then a summary; the exit code is 1 unless every run succeeded.
+#
+# --artifacts DIR downloads the artifacts of each successful run (all of them, or those matching --artifact globs) into
+# DIR, or DIR/job-<id>[-<schema>] for a matrix, concurrently and streamed to disk in chunks. Downloads are not bound by
+# the 30 second timeout of API calls, only by 10 seconds to connect and 60 between reads. Sizes are checked against
+# Content-Length. Files already there are only replaced when they changed: the ETag of each download is kept in
+# DIR/.etags.json and sent back as If-None-Match, and an identical body leaves the existing file untouched.
+import argparse
 import asyncio
+import email.utils
+import filecmp
+import fnmatch
+import heapq
+import itertools
 import json
 import logging
 import os
+import random
+import statistics
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field, fields
+from itertools import product
+from pathlib import Path
+from typing import Any
 
-import requests
+import aiohttp
 
 # Set up logging
 log = logging.getLogger(__name__)
@@ -24,10 +67,11 @@ log = logging.getLogger(__name__)
 
 # Required environment variables
 api_base = os.getenv("DBT_CLOUD_HOST", "cloud.getdbt.com")
+api_url = api_base if "://" in api_base else f"https://{api_base}"  # A full URL points at e.g. a local stub API
 api_key = os.environ["DBT_CLOUD_SERVICE_TOKEN"]
 account_id = os.environ["DBT_ACCOUNT_ID"]
 project_id = os.environ["DBT_PROJECT_ID"]
-job_id = os.environ["DBT_CLOUD_JOB_ID"]
+job_id = os.getenv("DBT_CLOUD_JOB_ID", "")  # Required unless the jobs are given on the command line
 
 
 # Optional environment variables
@@ -36,10 +80,13 @@ git_branch = os.getenv("DBT_JOB_BRANCH", None)
 git_sha = os.getenv("DBT_JOB_SHA", None)
 github_pr_id = os.getenv("GITHUB_PR_ID", None)
 schema_override = os.getenv("DBT_JOB_SCHEMA_OVERRIDE", None)
+job_timeout = float(os.getenv("DBT_JOB_TIMEOUT", "7200"))
+api_rate = float(os.getenv("DBT_CLOUD_API_RATE", "5"))
+run_history_file = Path(os.getenv("DBT_RUN_HISTORY", Path.home() / ".cache" / "dbt_cicd" / "history.json")).expanduser()
 
 
 req_auth_header = {"Authorization": f"Token {api_key}"}
-req_job_url = f"https://{api_base}/api/v2/accounts/{account_id}/jobs/{job_id}/run/"
+req_job_url = f"{api_url}/api/v2/accounts/{account_id}/jobs/{job_id}/run/"
 run_status_map = {  # dbt run statuses are encoded as integers. This map provides a human-readable status
     1: "Queued",
     2: "Starting",
@@ -50,11 +97,324 @@ run_status_map = {  # dbt run statuses are encoded as integers. This map provide
 }
 
 type AuthHeader = dict[str, str | int]
+type Reader = Callable[[aiohttp.ClientResponse], Awaitable[Any]]
+
+TRANSIENT_STATUSES = {500, 502, 503, 504}
+TOO_MANY_REQUESTS = 429
+
+# Request priorities when rate limited, lowest first
+PRIORITY_TRIGGER = 0
+PRIORITY_POLL = 1
+PRIORITY_ARTIFACT = 2
+
+# Poll intervals in seconds
+STARTUP_POLL = 3.0  # While Queued or Starting
+MIN_POLL = 5.0
+MAX_POLL = 60.0
+POLL_BACKOFF = 1.5  # Growth of the interval while Running without (or beyond) an expected duration
+POLL_JITTER = 0.2  # +/- fraction, so concurrent pipelines do not poll in lockstep
+HISTORY_SIZE = 20  # Durations kept per job
+ARTIFACT_CHUNK_SIZE = 256 * 1024
+# Artifacts can take longer than the API's total timeout to stream, so only connecting and each read are bounded.
+ARTIFACT_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=60)
+ETAGS_FILE = ".etags.json"
+DEFAULT_CONCURRENCY = 4  # Matrix runs in flight at once
+
+
+class RunFailedError(Exception):
+    """A dbt Cloud run finished with the Error or Cancelled status."""
+
+    def __init__(self, message: str, status: str):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class RunSpec:
+    """One run of a matrix: a job and the payload to trigger it with."""
+
+    job: str
+    cause: str = job_cause
+    branch: str | None = git_branch
+    github_pr_id: str | None = github_pr_id
+    git_sha: str | None = git_sha
+    schema_override: str | None = schema_override
+
+    @property
+    def url(self) -> str:
+        return f"{api_url}/api/v2/accounts/{account_id}/jobs/{self.job}/run/"
+
+    @property
+    def label(self) -> str:
+        return f"job {self.job}" + (f" schema {self.schema_override}" if self.schema_override else "")
+
+    @property
+    def slug(self) -> str:
+        """A directory name for the artifacts of this run."""
+        return f"job-{self.job}" + (f"-{self.schema_override}".replace("/", "_") if self.schema_override else "")
+
+
+@dataclass
+class RunResult:
+    spec: RunSpec
+    status: str = "Not triggered"
+    run_id: int | None = None
+    seconds: float = 0.0
+    errors: list[str] = field(default_factory=list)
+
+
+def retry_after(headers: Any) -> float | None:
+    """Seconds to hold requests back for, from Retry-After or an exhausted X-RateLimit-Remaining/-Reset pair."""
+    if value := headers.get("Retry-After"):
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                return None
+    remaining = headers.get("X-RateLimit-Remaining", headers.get("RateLimit-Remaining"))
+    reset = headers.get("X-RateLimit-Reset", headers.get("RateLimit-Reset"))
+    try:
+        if remaining is not None and reset is not None and float(remaining) <= 0:
+            # Either a Unix timestamp or a number of seconds from now.
+            return max(0.0, float(reset) - time.time() if float(reset) > 1e9 else float(reset))
+    except ValueError:
+        pass
+    return None
+
+
+class TokenBucket:
+    """Client-side rate limit of rate requests per second on average, in bursts of up to capacity, 0 for no limit.
+
+    Waiting requests are let through lowest priority value first. pause() holds them all back, e.g. for a Retry-After.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, 2 * rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._order = itertools.count()  # FIFO within a priority
+        self._timer: asyncio.TimerHandle | None = None
+
+    async def acquire(self, priority: int = 0) -> None:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future))
+        self._dispatch()
+        await future
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        now = time.monotonic()
+        if self.rate > 0:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        while self._waiters and now >= self.paused_until and (self.rate <= 0 or self.tokens >= 1):
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():  # Cancelled while waiting, e.g. by a timeout
+                continue
+            self.tokens -= 1
+            future.set_result(None)
+        if self._waiters and self._timer is None:
+            wait = max(self.paused_until - now, (1 - self.tokens) / self.rate if self.rate > 0 else 0)
+            self._timer = asyncio.get_running_loop().call_later(wait, self._on_timer)
+
+
+class DbtCloudClient:
+    """dbt Cloud API client sharing one pooled, keep-alive HTTP session for the whole run.
+
+    Every request has a timeout and first takes a token from the shared TokenBucket. Idempotent requests (GET) are
+    retried with jittered exponential backoff on connection errors, timeouts and 5xx responses. Others only when the
+    connection failed before the request was sent, so a job is never triggered twice. A 429 was not processed either,
+    so any request is retried after it, once the Retry-After (or the backoff) has passed for every request.
+    """
+
+    def __init__(
+        self,
+        headers: AuthHeader,
+        timeout: float = 30,
+        retries: int = 4,
+        backoff: float = 1.0,
+        max_connections: int = 16,
+        limiter: TokenBucket | None = None,
+    ):
+        self.headers = {k: str(v) for k, v in headers.items()}
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=10)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_connections = max_connections
+        self.limiter = limiter or TokenBucket(api_rate)
+        self.session: aiohttp.ClientSession | None = None
+
+    async def __aenter__(self) -> "DbtCloudClient":
+        connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+        self.session = aiohttp.ClientSession(headers=self.headers, timeout=self.timeout, connector=connector)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        if self.session is not None:
+            await self.session.close()
+
+    def _delay(self, attempt: int) -> float:
+        return random.uniform(0, self.backoff * 2**attempt)  # noqa: S311 - jitter, not crypto
+
+    async def request(
+        self, method: str, url: str, read: Reader | None = None, priority: int | None = None, **kwargs: Any
+    ) -> Any:
+        """Send a request and return its decoded JSON body, raising aiohttp.ClientResponseError on HTTP errors.
+
+        Args:
+            method: The HTTP method.
+            url: The URL.
+            read: Reads the response instead of decoding JSON, e.g. to stream it. A retry calls it again from scratch.
+            priority: Of the request while rate limited. Default: PRIORITY_TRIGGER for POST, else PRIORITY_POLL.
+            **kwargs: Passed on to aiohttp.ClientSession.request.
+        """
+        if self.session is None:
+            raise RuntimeError("DbtCloudClient used outside 'async with'")
+        idempotent = method.upper() in {"GET", "HEAD", "OPTIONS"}
+        if priority is None:
+            priority = PRIORITY_TRIGGER if method.upper() == "POST" else PRIORITY_POLL
+        for attempt in range(self.retries + 1):
+            await self.limiter.acquire(priority)
+            try:
+                async with self.session.request(method, url, **kwargs) as response:
+                    wait = retry_after(response.headers)
+                    if wait is not None:
+                        self.limiter.pause(wait)
+                    retry = response.status == TOO_MANY_REQUESTS or (
+                        idempotent and response.status in TRANSIENT_STATUSES
+                    )
+                    if retry and attempt < self.retries:
+                        log.warning(f"{method} {url} -> HTTP {response.status}, retrying")
+                        if response.status == TOO_MANY_REQUESTS and wait is None:
+                            self.limiter.pause(self._delay(attempt))
+                    else:
+                        await self._raise_for_status(response)
+                        return await read(response) if read else self._checked(await response.json(), response)
+            except (
+                aiohttp.ClientConnectorError,
+                aiohttp.ServerDisconnectedError,
+                aiohttp.ClientPayloadError,
+                TimeoutError,
+            ) as e:
+                # A refused connection never reached dbt Cloud, anything else is only safe to repeat when idempotent.
+                if attempt == self.retries or not (idempotent or isinstance(e, aiohttp.ClientConnectorError)):
+                    raise
+                log.warning(f"{method} {url} -> {type(e).__name__}: {e}, retrying")
+            await asyncio.sleep(self._delay(attempt))
+        raise AssertionError("unreachable")  # pragma: no cover
+
+    @staticmethod
+    async def _raise_for_status(response: aiohttp.ClientResponse) -> None:
+        """raise_for_status, with dbt Cloud's own explanation of the error as the message when there is one."""
+        if response.ok:
+            return
+        try:
+            message = (await response.json(content_type=None))["status"]["user_message"] or response.reason
+        except (aiohttp.ClientError, ValueError, KeyError, TypeError):
+            message = response.reason
+        raise aiohttp.ClientResponseError(
+            response.request_info,
+            response.history,
+            status=response.status,
+            message=str(message),
+            headers=response.headers,
+        )
+
+    @staticmethod
+    def _checked(body: Any, response: aiohttp.ClientResponse) -> dict[str, Any]:
+        """The body of a successful API response, which always has data."""
+        if not isinstance(body, dict) or "data" not in body:
+            raise aiohttp.ClientResponseError(
+                response.request_info, response.history, status=response.status, message="Response has no data"
+            )
+        return body
+
+    async def get(self, url: str, **kwargs: Any) -> dict[str, Any]:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> dict[str, Any]:
+        return await self.request("POST", url, **kwargs)
+
+
+class RunHistory:
+    """The Running durations of recent successful runs per job, persisted as JSON.
+
+    Each record re-reads the file just before replacing it atomically, so pipelines sharing it keep each other's runs.
+    """
+
+    def __init__(self, path: Path = run_history_file, size: int = HISTORY_SIZE):
+        self.path = path
+        self.size = size
+        self.durations = self._read()
+
+    def _read(self) -> dict[str, list[float]]:
+        try:
+            data = json.loads(self.path.read_text())
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def expected(self, job: str | int) -> float | None:
+        """The median Running duration of the job in seconds, None without history."""
+        durations = self.durations.get(str(job))
+        return statistics.median(durations) if durations else None
+
+    def record(self, job: str | int, seconds: float) -> None:
+        self.durations = self._read()
+        durations = self.durations.setdefault(str(job), [])
+        durations.append(round(seconds, 1))
+        del durations[: -self.size]
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(self.durations, indent=2))
+            tmp.replace(self.path)
+        except OSError as e:
+            log.warning(f"Could not save run history to {self.path}: {e}")
+
+
+def next_poll(status: str, running_for: float, expected: float | None, previous: float) -> float:
+    """Seconds until the next status poll.
+
+    Args:
+        status: The current run status.
+        running_for: Seconds since the run was first seen Running.
+        expected: The expected Running duration from the history, if any.
+        previous: The previous interval, to back off from.
+    """
+    if status in ("Queued", "Starting"):
+        interval = STARTUP_POLL
+    elif expected is not None and running_for < expected - MIN_POLL:
+        # Halve the remaining time on each poll, so they converge on the expected finish.
+        interval = (expected - running_for) / 2
+    elif expected is not None and running_for < expected + MIN_POLL:
+        interval = MIN_POLL
+    else:
+        # No history, or overrunning it: back off.
+        interval = previous * POLL_BACKOFF if status == "Running" and previous >= MIN_POLL else MIN_POLL
+    interval = min(max(interval, STARTUP_POLL if status in ("Queued", "Starting") else MIN_POLL), MAX_POLL)
+    return interval * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)  # noqa: S311 - jitter, not crypto
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}m{seconds:02d}s"
 
 
 async def run_job(
+    client: DbtCloudClient,
     url: str,
-    headers: AuthHeader,
     cause: str,
     branch: str | None = None,
     github_pr_id: str | None = None,
@@ -76,58 +436,272 @@ async def run_job(
     # trigger job
     log.info(f"Triggering job:\n\turl: {url}\n\tpayload:\n{json.dumps(req_payload, indent=2)}")
 
-    response = requests.post(url, headers=headers, json=req_payload)
-    response_json = response.json()
+    response_json = await client.post(url, json=req_payload)
     log.debug(json.dumps(response_json, indent=2))
     run_id: int = response_json["data"]["id"]
     return run_id
 
 
-async def get_run_status(url: str, headers: AuthHeader) -> str:
+async def get_run_status(client: DbtCloudClient, url: str) -> str:
     """Gets the status of a running dbt job."""
-    response = requests.get(url, headers=headers)
-    run_status_code: int = response.json()["data"]["status"]
+    response_json = await client.get(url)
+    run_status_code: int = response_json["data"]["status"]
     run_status = run_status_map[run_status_code]
     return run_status
 
 
-async def main():
-    log.info("Beginning request for job run...")
-
-    # run job
-    run_id: int = 0
-    try:
-        run_id = await run_job(
-            req_job_url, req_auth_header, job_cause, git_branch, github_pr_id, git_sha, schema_override
-        )
-    except Exception as e:
-        log.error(f"ERROR! - Could not trigger job:\n {e}")
-        raise e
+async def monitor_run(
+    client: DbtCloudClient,
+    run_id: int,
+    job: str | int = job_id,
+    history: RunHistory | None = None,
+    timeout: float | None = None,
+    label: str = "",
+) -> None:
+    """Poll a run until it finishes, raising when it failed, was cancelled or took longer than timeout seconds.
 
+    Status transitions are logged as they happen (prefixed by label, to tell concurrent runs apart), polls that find the
+    status unchanged only at debug level.
+    """
     # build status check url and run status link
-    req_status_url = f"https://{api_base}/api/v2/accounts/{account_id}/runs/{run_id}/"
-    run_status_link = f"https://{api_base}/deploy/{account_id}/projects/{project_id}/runs/{run_id}/"
+    req_status_url = f"{api_url}/api/v2/accounts/{account_id}/runs/{run_id}/"
+    run_status_link = f"{api_url}/deploy/{account_id}/projects/{project_id}/runs/{run_id}/"
+    prefix = f"[{label}] " if label else ""
 
     # update user with status link
-    log.info(f"Job running! See job status at {run_status_link}")
+    log.info(f"{prefix}Job running! See job status at {run_status_link}")
 
-    # check status indefinitely with an initial wait period
-    await asyncio.sleep(30)
-    while True:
-        status = await get_run_status(req_status_url, req_auth_header)
-        log.info(f"Run status -> {status}")
+    history = history or RunHistory()
+    expected = history.expected(job)
+    if expected is not None:
+        log.info(f"{prefix}Expected run duration from history: {format_duration(expected)}")
 
-        if status in ["Error", "Cancelled"]:
-            raise Exception(f"Run failed or canceled. See why at {run_status_link}")
+    started = time.monotonic()
+    running_since: float | None = None
+    previous_status = ""
+    interval = 0.0
+    deadline = asyncio.timeout(timeout or None)
+    try:
+        async with deadline:
+            while True:
+                status = await get_run_status(client, req_status_url)
+                now = time.monotonic()
+                if running_since is None and status == "Running":
+                    running_since = now
+                running_for = now - (running_since or now)
+                finished = status in ("Success", "Error", "Cancelled")
+                ahead = expected and not finished and running_for < expected
+                eta = f" (ETA {format_duration(expected - running_for)})" if ahead else ""
+                log.log(
+                    logging.INFO if status != previous_status else logging.DEBUG, f"{prefix}Run status -> {status}{eta}"
+                )
+                previous_status = status
 
-        if status == "Success":
-            log.info(f"Job completed successfully! See details at {run_status_link}")
-            return
+                if status in ["Error", "Cancelled"]:
+                    raise RunFailedError(f"{prefix}Run failed or canceled. See why at {run_status_link}", status)
 
-        await asyncio.sleep(10)
+                if status == "Success":
+                    elapsed = format_duration(now - started)
+                    log.info(f"{prefix}Job completed successfully in {elapsed}! See {run_status_link}")
+                    if running_since is not None:  # Never seen Running, so how long it ran is unknown
+                        history.record(job, running_for)
+                    return
 
+                interval = next_poll(status, running_for, expected, interval)
+                await asyncio.sleep(interval)
+    except TimeoutError:
+        if not deadline.expired():  # A request timing out, not the run
+            raise
+        limit = format_duration(timeout or 0)
+        raise TimeoutError(f"{prefix}Run not finished after {limit}. See {run_status_link}") from None
+
+
+async def download_artifact(
+    client: DbtCloudClient, run_id: int, name: str, directory: Path, etags: dict[str, str]
+) -> bool:
+    """Stream one artifact of a run into directory, returning False when the local copy was already up to date."""
+    target = (directory / name).resolve()
+    if not target.is_relative_to(directory.resolve()):
+        raise ValueError(f"Artifact {name} is outside of {directory}")
+    url = f"{api_url}/api/v2/accounts/{account_id}/runs/{run_id}/artifacts/{name}"
+    headers = {"If-None-Match": etags[name]} if name in etags and target.exists() else {}
+
+    async def save(response: aiohttp.ClientResponse) -> bool:
+        if response.status == 304:  # Not Modified
+            return False
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+        size = 0
+        try:
+            with tmp.open("wb") as f:
+                async for chunk in response.content.iter_chunked(ARTIFACT_CHUNK_SIZE):
+                    f.write(chunk)
+                    size += len(chunk)
+            # Content-Length counts the encoded bytes when the body was compressed in transit.
+            expected = None if response.headers.get("Content-Encoding") else response.content_length
+            if expected is not None and size != expected:
+                raise aiohttp.ClientPayloadError(f"{name}: received {size} of {expected} bytes")
+            if "ETag" in response.headers:
+                etags[name] = response.headers["ETag"]
+            if target.exists() and filecmp.cmp(tmp, target, shallow=False):
+                return False
+            tmp.replace(target)
+            return True
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    return await client.request(
+        "GET", url, read=save, priority=PRIORITY_ARTIFACT, headers=headers, timeout=ARTIFACT_TIMEOUT
+    )
+
+
+async def download_artifacts(
+    client: DbtCloudClient, run_id: int, directory: Path, patterns: list[str] | None = None, label: str = ""
+) -> list[str]:
+    """Download the artifacts of a run matching any of the glob patterns (all by default) concurrently.
+
+    Returns:
+        The names of the artifacts that were new or changed.
+    """
+    prefix = f"[{label}] " if label else ""
+    listing = await client.get(
+        f"{api_url}/api/v2/accounts/{account_id}/runs/{run_id}/artifacts/", priority=PRIORITY_ARTIFACT
+    )
+    names = [name for name in listing["data"] if not patterns or any(fnmatch.fnmatch(name, p) for p in patterns)]
+
+    directory.mkdir(parents=True, exist_ok=True)
+    etags_file = directory / ETAGS_FILE
+    try:
+        etags: dict[str, str] = json.loads(etags_file.read_text())
+    except (OSError, ValueError):
+        etags = {}
+    try:
+        changed = await asyncio.gather(*(download_artifact(client, run_id, name, directory, etags) for name in names))
+    finally:
+        etags_file.write_text(json.dumps(etags, indent=2))
+
+    updated = [name for name, is_changed in zip(names, changed, strict=True) if is_changed]
+    log.info(f"{prefix}Artifacts in {directory}: {len(updated)} updated, {len(names) - len(updated)} unchanged")
+    return updated
+
+
+async def trigger_and_monitor(
+    client: DbtCloudClient,
+    spec: RunSpec,
+    slots: asyncio.Semaphore,
+    history: RunHistory,
+    timeout: float | None = None,
+    artifacts: Path | None = None,
+    artifact_patterns: list[str] | None = None,
+) -> RunResult:
+    """Trigger one run of a matrix once a slot is free and monitor it, recording (not raising) how it ended.
+
+    The artifacts of a successful run are then downloaded into the artifacts directory, when one is given.
+    """
+    result = RunResult(spec)
+    async with slots:
+        started = time.monotonic()
+        try:
+            result.run_id = await run_job(
+                client, spec.url, spec.cause, spec.branch, spec.github_pr_id, spec.git_sha, spec.schema_override
+            )
+            result.status = "Triggered"
+            await monitor_run(client, result.run_id, spec.job, history, timeout, spec.label)
+            result.status = "Success"
+            if artifacts is not None:
+                await download_artifacts(client, result.run_id, artifacts, artifact_patterns, spec.label)
+        except RunFailedError as e:
+            result.status = e.status
+            result.errors.append(str(e))
+        except TimeoutError as e:
+            result.status = "Timed out"
+            result.errors.append(str(e) or f"[{spec.label}] Request timed out")
+        except (aiohttp.ClientError, OSError, ValueError) as e:
+            log.error(f"[{spec.label}] ERROR! - {type(e).__name__}: {e}")
+            result.errors.append(f"[{spec.label}] {type(e).__name__}: {e}")
+        result.seconds = time.monotonic() - started
+    return result
+
+
+def summarise(results: list[RunResult]) -> int:
+    """Log one line per run and every error, returning the exit code: 0 only when every run succeeded."""
+    width = max(len(result.spec.label) for result in results)
+    lines = [
+        f"{r.spec.label:<{width}}  {r.status:<13}  {format_duration(r.seconds)}  run {r.run_id or '-'}" for r in results
+    ]
+    passed = sum(result.status == "Success" and not result.errors for result in results)
+    log.info(f"Summary: {passed}/{len(results)} runs succeeded\n" + "\n".join(lines))
+    for result in results:
+        for error in result.errors:
+            log.error(error)
+    return 0 if passed == len(results) else 1
+
+
+async def main(
+    specs: list[RunSpec] | None = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    artifacts: Path | None = None,
+    artifact_patterns: list[str] | None = None,
+) -> int:
+    specs = specs or [RunSpec(job_id)]
+    log.info(f"Beginning request for {len(specs)} job run(s)...")
+
+    def artifacts_dir(spec: RunSpec) -> Path | None:
+        return artifacts / spec.slug if artifacts is not None and len(specs) > 1 else artifacts
+
+    slots = asyncio.Semaphore(concurrency)
+    history = RunHistory()
+    async with DbtCloudClient(req_auth_header, max_connections=max(16, concurrency)) as client:
+        tasks = [
+            trigger_and_monitor(client, spec, slots, history, job_timeout, artifacts_dir(spec), artifact_patterns)
+            for spec in specs
+        ]
+        results = await asyncio.gather(*tasks)
+    return summarise(results)
+
+
+def load_matrix(path: str) -> list[RunSpec]:
+    """RunSpecs from a JSON list of objects with a job and any RunSpec payload fields, others from the environment."""
+    entries = json.loads(Path(path).read_text())
+    if not isinstance(entries, list) or not all(isinstance(entry, dict) and "job" in entry for entry in entries):
+        raise ValueError(f"{path} must be a JSON list of objects, each with a job")
+    known = [f.name for f in fields(RunSpec)]
+    for index, entry in enumerate(entries):
+        if unknown := sorted(set(entry).difference(known)):
+            raise ValueError(f"{path}: run {index} has unknown keys {', '.join(unknown)}, expected {', '.join(known)}")
+    return [RunSpec(**{k: str(v) if v is not None else None for k, v in entry.items()}) for entry in entries]
+
+
+def cli(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="Trigger and monitor dbt Cloud job runs.")
+    parser.add_argument("-j", "--job", action="append", help="Job ID to run, repeatable. Default: $DBT_CLOUD_JOB_ID.")
+    parser.add_argument(
+        "-s", "--schema-override", action="append", help="Schema override, repeatable: every job runs with each."
+    )
+    parser.add_argument("-m", "--matrix", help="JSON file listing the runs, instead of --job and --schema-override.")
+    parser.add_argument("-n", "--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Runs in flight at once.")
+    parser.add_argument(
+        "-a", "--artifacts", type=Path, help="Download the artifacts of successful runs into this directory."
+    )
+    parser.add_argument(
+        "--artifact", action="append", help="Glob of the artifacts to download, repeatable. Default: all."
+    )
+    args = parser.parse_args(argv)
+
+    jobs = args.job or ([job_id] if job_id else [])
+    if args.matrix:
+        try:
+            specs = load_matrix(args.matrix)
+        except (OSError, ValueError) as e:
+            parser.error(f"--matrix: {e}")
+    elif not jobs:
+        parser.error("no job to run: set DBT_CLOUD_JOB_ID or pass --job")
+    else:
+        specs = [
+            RunSpec(job, schema_override=schema)
+            for job, schema in product(jobs, args.schema_override or [schema_override])
+        ]
 
-if __name__ == "__main__":
     log_level = logging.DEBUG if os.getenv("LOG_LEVEL", None) == "DEBUG" else logging.INFO
     logging.basicConfig(
         level=log_level,
@@ -139,11 +713,18 @@ if __name__ == "__main__":
         api_base: {api_base}
         account_id: {account_id}
         project_id: {project_id}
-        job_id: {job_id}
+        jobs: {", ".join(spec.label for spec in specs)}
         job_cause: {job_cause}
         git_branch: {git_branch}
         git_sha: {git_sha}
         github_pr_id: {github_pr_id}
         schema_override: {schema_override}
+        job_timeout: {job_timeout}
+        api_rate: {api_rate}
+        run_history_file: {run_history_file}
     """)
-    asyncio.run(main())
+    return asyncio.run(main(specs, args.concurrency, args.artifacts, args.artifact))
+
+
+if __name__ == "__main__":
+    sys.exit(cli(sys.argv[1:]))
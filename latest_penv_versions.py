@@ -1,8 +1,35 @@
+# Print the `pyenv install` commands for the latest patch release of the newest Python series.
+#
+# USAGE: python3 latest_penv_versions.py [--family cpython|pypy|...] [--limit 3] [--json] [--refresh] [--ttl HOURS]
+#
+# The output of `pyenv install --list` is cached in $PYENV_VERSIONS_CACHE (default
+# ~/.cache/latest_penv_versions/index.json). Only a stale (older than --ttl, default 24 hours) or --refresh'ed index
+# runs `git pull` in ~/.pyenv and `pyenv install --list`, so a fresh-cache run starts no subprocess at all.
+# A failing or empty `pyenv install --list` exits with its error and leaves the cached index untouched.
+#
+# Families other than CPython are the `name[-X.Y]-A.B.C` entries of pyenv, e.g. pypy3.10-7.3.15 or graalpy-24.0.0,
+# grouped by their full prefix so each Python version of PyPy gets its own latest release.
+
 # Standard Library
+import argparse
+import json
+import os
+import re
 import subprocess
+import sys
+import time
 from itertools import groupby
 from pathlib import Path
 
+CACHE_FILE = Path(
+    os.getenv("PYENV_VERSIONS_CACHE", Path.home() / ".cache" / "latest_penv_versions" / "index.json")
+).expanduser()
+DEFAULT_TTL_HOURS = 24.0
+
+# X.Y.Z final releases only: no -dev, a/b/rc or t (free-threaded) builds.
+CPYTHON_VERSION = re.compile(r"^(?P<version>\d+\.\d+\.\d+)$")
+OTHER_VERSION = re.compile(r"^(?P<prefix>[a-z][a-z0-9.]*?)-(?P<version>\d+(?:\.\d+)+)$")
+
 
 def update_pyenv():
     """Update with latest information."""
@@ -10,28 +37,98 @@ def update_pyenv():
     subprocess.run("git pull", capture_output=True, shell=True, text=True, cwd=PYENV_HOME)
 
 
-def tidy_versions():
-    # Get all available versions
+def fetch_index() -> list[str]:
+    """Update pyenv and list every version it can install.
+
+    Raises:
+        RuntimeError: When `pyenv install --list` fails or lists nothing.
+    """
+    update_pyenv()
     result = subprocess.run("pyenv install --list", capture_output=True, shell=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"pyenv install --list exited with {result.returncode}: {result.stderr.strip()}")
+    lines = (line.strip() for line in result.stdout.splitlines())
+    versions = [line for line in lines if line and not line.startswith("Available")]
+    if not versions:
+        raise RuntimeError("pyenv install --list listed no versions")
+    return versions
+
+
+def load_index(refresh: bool = False, ttl_hours: float = DEFAULT_TTL_HOURS, cache_file: Path = CACHE_FILE) -> list[str]:
+    """The cached version index, fetched again only when it is missing, older than ttl_hours or refresh is set.
+
+    A failed fetch raises (see fetch_index) before anything is written, so it never replaces the cached index.
+    """
+    if not refresh:
+        try:
+            index = json.loads(cache_file.read_text())
+            if time.time() - index["fetched_at"] < ttl_hours * 3600:
+                return index["versions"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    versions = fetch_index()
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache_file.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps({"fetched_at": time.time(), "versions": versions}))
+    tmp.replace(cache_file)
+    return versions
 
-    # Get all python versions that are only X.Y.Z format and only digits. No dev or alpha versions etc
-    return {
-        pyversion.strip(): tuple([int(d) for d in pyversion.strip().split(".")])
-        for pyversion in result.stdout.strip().split("\n")
-        if pyversion.strip().startswith("3.") and all([d.isdigit() for d in pyversion.strip().split(".")])
-    }
 
+def parse_versions(entries: list[str], family: str = "cpython") -> list[tuple[str, str, tuple[int, ...]]]:
+    """(prefix, name, version tuple) of each entry of the family, the prefix being "" for CPython."""
+    parsed = []
+    for entry in entries:
+        if family == "cpython":
+            match = CPYTHON_VERSION.match(entry)
+            prefix = ""
+        else:
+            match = OTHER_VERSION.match(entry)
+            prefix = match["prefix"] if match else ""
+            if not prefix.startswith(family):
+                continue
+        if match:
+            parsed.append((prefix, entry, tuple(int(d) for d in match["version"].split("."))))
+    return parsed
 
-def max_patched_versions():
-    # Group tuples by the minor version number
-    grouped_versions = groupby(tidy_versions().values(), lambda v: v[1])
-    # Tuple sort to get the largest within each group
-    return [
-        ".".join([str(n) for n in list(v)])  # Convert tuple back to dot formatted string
-        for v in sorted([max(g, key=lambda x: x) for k, g in grouped_versions], reverse=True)
-    ]
+
+def _natural(text: str) -> tuple:
+    return tuple(int(part) if part.isdigit() else part for part in re.split(r"(\d+)", text))
+
+
+def max_patched_versions(entries: list[str] | None = None, family: str = "cpython") -> list[str]:
+    """The latest patch release of every prefix and major.minor series, newest series first."""
+    versions = parse_versions(load_index() if entries is None else entries, family)
+
+    # groupby only groups adjacent items, so sort by the group key first.
+    def series(v: tuple[str, str, tuple[int, ...]]) -> tuple[str, tuple[int, ...]]:
+        return v[0], v[2][:2]
+
+    latest = [max(group, key=lambda v: v[2]) for _, group in groupby(sorted(versions, key=series), key=series)]
+    # Ties between prefixes (pypy3.9 vs pypy3.10 at the same release) sort by the numbers in the prefix.
+    return [name for _, name, _ in sorted(latest, key=lambda v: (v[2], _natural(v[0])), reverse=True)]
+
+
+def cli(argv: list[str]):
+    parser = argparse.ArgumentParser(description="Latest pyenv patch versions.")
+    parser.add_argument("-f", "--family", default="cpython", help="cpython, or a pyenv prefix such as pypy or graalpy.")
+    parser.add_argument("-l", "--limit", type=int, default=3, help="Number of series to print, 0 for all.")
+    parser.add_argument("-j", "--json", action="store_true", help="Print the versions as a JSON list.")
+    parser.add_argument("-r", "--refresh", action="store_true", help="Refresh the cached index now.")
+    parser.add_argument("-t", "--ttl", type=float, default=DEFAULT_TTL_HOURS, help="Hours before the index is stale.")
+    args = parser.parse_args(argv)
+
+    try:
+        index = load_index(args.refresh, args.ttl)
+    except RuntimeError as e:
+        parser.exit(1, f"{parser.prog}: {e}\n")
+    versions = max_patched_versions(index, args.family)
+    versions = versions[: args.limit] if args.limit else versions
+    if args.json:
+        print(json.dumps(versions))
+    else:
+        print("\n".join([f"pyenv install {v}" for v in versions]))
 
 
 if __name__ == "__main__":
-    update_pyenv()
-    print("\n".join([f"pyenv install {v}" for v in max_patched_versions()[:3]]))
+    cli(sys.argv[1:])
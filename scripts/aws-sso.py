@@ -14,11 +14,48 @@
 #
 # It will generate and execute the export statements into the bash shell of the sso token you just acquired.
 #
+# USAGE: python3 aws-sso.py                                      # inspect the cached SSO sessions
+#        python3 aws-sso.py --list [--session NAME] [--credentials] [--concurrency 16] [--endpoint URL]
+#
+# --list reuses the access token `aws sso login` cached for the session (found by the sha1 of its name or start URL)
+# to enumerate every account and its roles through the SSO portal API, printed as JSON. Accounts are paginated and
+# the roles of every account (and with --credentials the credentials of every role) are fetched concurrently, at
+# most --concurrency requests in flight, retrying throttled (429) and unavailable (5xx) responses with jittered
+# exponential backoff. --endpoint (or $AWS_SSO_PORTAL_ENDPOINT) points it at a stub portal for testing.
+#
+# --credential-process prints role credentials in the format AWS CLIs and SDKs expect from `credential_process`:
+#
+#   [profile data-admin]
+#   credential_process = python3 /path/to/aws-sso.py --credential-process --session corp --account-id 123456789012 --role-name Admin
+#
+# Credentials are served from memory, then from a 0600 file under $AWS_SSO_CREDENTIALS_CACHE (default
+# ~/.cache/aws-sso), until 5 minutes before they expire. Within 15 minutes of expiry the cached credentials are still
+# served while a detached process refreshes them. A lock file per role makes parallel processes wait for (or skip)
+# the refresh already in flight, so they never stampede the SSO endpoint.
+#
 # Standard Library
+import argparse
+import asyncio
+import concurrent.futures
 import configparser
+import contextlib
+import email.utils
+import fcntl
 import hashlib
+import json
 import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections.abc import Iterator
+from datetime import UTC, datetime, timedelta
 from pathlib import Path
+from typing import Any, cast
 
 log = logging.getLogger(__name__)
 
@@ -27,46 +64,349 @@ aws_sso_cache = aws_config / "sso/cache"
 aws_credentials_file = aws_config / "credentials"
 aws_config_file = aws_config / "config"
 
-credentials = aws_credentials_file.read_text()
+RETRY_STATUSES = {429, 500, 502, 503, 504}
 
+CREDENTIALS_CACHE_DIR = Path(os.getenv("AWS_SSO_CREDENTIALS_CACHE", "~/.cache/aws-sso")).expanduser()
+EXPIRY_MARGIN = timedelta(minutes=5)  # Never serve credentials closer than this to their expiry
+REFRESH_AHEAD = timedelta(minutes=15)  # Refresh in the background once credentials are this close to expiry
+_credentials_memo: dict[Path, dict[str, Any]] = {}
 
-def main():
-    cache_files = [p.stem for p in list(aws_sso_cache.glob("*.json"))]
-    log.info(cache_files)
 
+def sso_sessions() -> dict[str, dict[str, Any]]:
+    """Map each SSO session of the AWS config to the key its token is cached under, its region and its profiles.
+
+    `aws sso login` caches the token of an `[sso-session NAME]` under the sha1 of NAME, shared by every profile naming
+    it in `sso_session`. A legacy profile (`sso_start_url` without `sso_session`) is a session of its own, cached under
+    the sha1 of its start URL.
+    """
     parser = configparser.ConfigParser()
     parser.read(aws_config_file)
+    sessions: dict[str, dict[str, Any]] = {}
     for section in parser.sections():
-        log.info(f"Section: {section}")
-        key = None
-        hash = None
+        name = section.split(" ", 1)[-1]
+        region = parser.get(section, "sso_region", fallback=None)
+        if section.startswith("sso-session "):
+            sessions.setdefault(name, {"profiles": []}).update(key=name, region=region)
+        elif parser.has_option(section, "sso_session"):
+            sessions.setdefault(parser.get(section, "sso_session"), {"profiles": []})["profiles"].append(name)
+        elif parser.has_option(section, "sso_start_url"):
+            sessions[name] = {"profiles": [name], "key": parser.get(section, "sso_start_url"), "region": region}
+    return sessions
 
-        if section.startswith("profile") and parser.has_option(section, "sso_session"):
-            key = parser.get(section, "sso_session")
 
-        elif section.startswith("sso-session") and parser.has_option(section, "sso_start_url"):
-            key = parser.get(section, "sso_start_url")
+def find_cached_tokens() -> dict[str, dict[str, Any]]:
+    """Map each SSO session to the unexpired token `aws sso login` cached for it, with the profiles using it."""
+    tokens = {}
+    for name, session in sso_sessions().items():
+        if "key" not in session:
+            log.debug(f"{name}: no [sso-session {name}] section for profiles {session['profiles']}")
+            continue
+        path = aws_sso_cache / f"{hashlib.sha1(session['key'].encode()).hexdigest()}.json"
+        try:
+            token = json.loads(path.read_text())
+        except FileNotFoundError:
+            continue
+        if datetime.fromisoformat(token["expiresAt"].replace("Z", "+00:00")) <= datetime.now(UTC):
+            log.debug(f"{name}: cached token expired")
+            continue
+        # Newer caches (sso-session) do not record the region, take it from the config instead.
+        token.setdefault("region", session["region"])
+        tokens[name] = token | {"profiles": session["profiles"]}
+    return tokens
 
-        if key:
-            hash_object = hashlib.sha1(key.encode())
-            hash = hash_object.hexdigest()
-            log.info(hash)
-            if hash in cache_files:
-                log.info("Cache hit")
-                log.info(f"{key} = {hash}.json")
-                log.info((aws_sso_cache / f"{hash}.json").read_text())
-            else:
-                log.info("Cache miss")
 
-    # TODO: aws sso get-role-credentials --role-name <role-name> --account-id <account-id> --access-token <access-token> --region <region>
-    # aws sso list-accounts --profile <profile> --no-paginate --access-token <access-token> --region <region>
-    # aws sso list-account-roles --profile <profile> --no-paginate --access-token <access-token> --region <region> --account-id <account-id>
+def retry_after_seconds(value: str | None) -> float | None:
+    """Seconds to wait from a Retry-After header, given either as delay-seconds or as an HTTP date."""
+    if not value:
+        return None
+    with contextlib.suppress(ValueError):
+        return max(0.0, float(value))
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:  # "-0000" dates are UTC with no zone given
+        when = when.replace(tzinfo=UTC)
+    return max(0.0, (when - datetime.now(UTC)).total_seconds())
 
 
-if __name__ == "__main__":
+class SSOPortal:
+    """Minimal asyncio client of the AWS SSO portal API (what `aws sso list-accounts` etc. call).
+
+    Requests are blocking urllib calls run on a thread pool, which keeps the script free of dependencies. A semaphore
+    bounds the requests in flight and throttled or unavailable responses are retried with jittered backoff.
+    """
+
+    def __init__(
+        self,
+        access_token: str,
+        region: str,
+        endpoint: str | None = None,
+        concurrency: int = 16,
+        retries: int = 5,
+        backoff: float = 0.5,
+    ):
+        self.access_token = access_token
+        self.endpoint = (endpoint or f"https://portal.sso.{region}.amazonaws.com").rstrip("/")
+        self.retries = retries
+        self.backoff = backoff
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    def _request(self, url: str) -> dict[str, Any]:
+        request = urllib.request.Request(url, headers={"x-amz-sso_bearer_token": self.access_token})
+        with urllib.request.urlopen(request, timeout=30) as response:  # noqa: S310 - https (or a stub) endpoint
+            return json.load(response)
+
+    async def get(self, path: str, **params: str | int | None) -> dict[str, Any]:
+        """GET an API path, retrying 429 and 5xx responses honouring Retry-After when given."""
+        query = urllib.parse.urlencode({k: v for k, v in params.items() if v is not None})
+        url = f"{self.endpoint}{path}?{query}"
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+            async with self._semaphore:
+                try:
+                    return await loop.run_in_executor(self._executor, self._request, url)
+                except urllib.error.HTTPError as e:
+                    if e.code not in RETRY_STATUSES or attempt == self.retries:
+                        raise
+                    status, retry_after = e.code, e.headers.get("Retry-After")
+            # Full jitter: sleep a random fraction of the exponential backoff, outside the semaphore.
+            delay = retry_after_seconds(retry_after)
+            if delay is None:
+                delay = random.uniform(0, self.backoff * 2**attempt)  # noqa: S311
+            log.debug(f"HTTP {status} from {path}, retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")  # pragma: no cover
+
+    async def _paginate(self, path: str, list_key: str, **params: str | int | None) -> list[dict[str, Any]]:
+        items: list[dict[str, Any]] = []
+        next_token = None
+        while True:
+            page = await self.get(path, max_result=100, next_token=next_token, **params)
+            items.extend(page.get(list_key, []))
+            if not (next_token := page.get("nextToken")):
+                return items
+
+    async def list_accounts(self) -> list[dict[str, Any]]:
+        return await self._paginate("/assignment/accounts", "accountList")
+
+    async def list_account_roles(self, account_id: str) -> list[dict[str, Any]]:
+        return await self._paginate("/assignment/roles", "roleList", account_id=account_id)
+
+    async def get_role_credentials(self, account_id: str, role_name: str) -> dict[str, Any]:
+        response = await self.get("/federation/credentials", account_id=account_id, role_name=role_name)
+        return response["roleCredentials"]
+
+    async def enumerate(self, with_credentials: bool = False) -> list[dict[str, Any]]:
+        """Every account with its roles (and each role's credentials), fetched concurrently."""
+        accounts = await self.list_accounts()
+        roles = await asyncio.gather(*(self.list_account_roles(a["accountId"]) for a in accounts))
+        for account, account_roles in zip(accounts, roles, strict=True):
+            account["roles"] = account_roles
+        if with_credentials:
+            all_roles = [role for account in accounts for role in account["roles"]]
+            role_credentials = await asyncio.gather(
+                *(self.get_role_credentials(role["accountId"], role["roleName"]) for role in all_roles)
+            )
+            for role, creds in zip(all_roles, role_credentials, strict=True):
+                role["credentials"] = creds
+        return accounts
+
+
+def session_tokens(session: str | None = None) -> dict[str, dict[str, Any]]:
+    """The unexpired cached tokens of every session, or only of the named session or profile (which must then exist)."""
+    tokens = find_cached_tokens()
+    if session is None:
+        return tokens
+    for name, token in tokens.items():
+        if session == name or session in token["profiles"]:
+            return {name: token}
+    raise KeyError(f"No unexpired cached token for {session}, run `aws sso login` for it")
+
+
+async def list_sessions(
+    session: str | None = None, with_credentials: bool = False, concurrency: int = 16, endpoint: str | None = None
+) -> dict[str, list[dict[str, Any]]]:
+    """Enumerate the accounts and roles of every cached SSO session (or just the named one)."""
+    tokens = session_tokens(session)
+
+    results = {}
+    for name, token in tokens.items():
+        portal = SSOPortal(token["accessToken"], token["region"], endpoint, concurrency)
+        try:
+            results[name] = await portal.enumerate(with_credentials)
+        finally:
+            portal.close()
+        log.info(f"{name}: {len(results[name])} accounts, {sum(len(a['roles']) for a in results[name])} roles")
+    return results
+
+
+def _credentials_cache_file(session: str | None, account_id: str, role_name: str) -> Path:
+    key = hashlib.sha1(f"{session}|{account_id}|{role_name}".encode()).hexdigest()
+    return CREDENTIALS_CACHE_DIR / f"{key}.json"
+
+
+def _remaining(credentials: dict[str, Any]) -> timedelta:
+    return datetime.fromisoformat(credentials["Expiration"]) - datetime.now(UTC)
+
+
+def _read_cached_credentials(path: Path) -> dict[str, Any] | None:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+@contextlib.contextmanager
+def _file_lock(path: Path, blocking: bool = True) -> Iterator[bool]:
+    """Hold an exclusive lock on path, yielding False instead of waiting when not blocking and it is taken."""
+    path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+    with path.open("w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def fetch_role_credentials(
+    session: str | None, account_id: str, role_name: str, endpoint: str | None = None
+) -> dict[str, Any]:
+    """Exchange the cached SSO token for role credentials, in the credential_process output format."""
+    tokens = session_tokens(session)
+    if len(tokens) != 1:
+        raise KeyError(f"Pass --session, cached SSO sessions: {', '.join(tokens) or 'none'}")
+    token = next(iter(tokens.values()))
+
+    async def fetch() -> dict[str, Any]:
+        portal = SSOPortal(token["accessToken"], token["region"], endpoint, concurrency=1)
+        try:
+            return await portal.get_role_credentials(account_id, role_name)
+        finally:
+            portal.close()
+
+    role_credentials = asyncio.run(fetch())
+    return {
+        "Version": 1,
+        "AccessKeyId": role_credentials["accessKeyId"],
+        "SecretAccessKey": role_credentials["secretAccessKey"],
+        "SessionToken": role_credentials["sessionToken"],
+        "Expiration": datetime.fromtimestamp(role_credentials["expiration"] / 1000, UTC).isoformat(),
+    }
+
+
+def refresh_credentials(
+    session: str | None, account_id: str, role_name: str, endpoint: str | None = None, blocking: bool = True
+) -> dict[str, Any] | None:
+    """Fetch and cache role credentials under the role's lock, unless another process has just done so.
+
+    A blocking refresh always returns the credentials (or raises). Only when not blocking does it return None, without
+    waiting, if another process is already refreshing.
+    """
+    path = _credentials_cache_file(session, account_id, role_name)
+    with _file_lock(path.with_suffix(".lock"), blocking) as locked:
+        if not locked:
+            return None
+        cached = _read_cached_credentials(path)
+        if cached and _remaining(cached) > REFRESH_AHEAD:
+            return cached  # Refreshed by another process while we waited for the lock
+        credentials = fetch_role_credentials(session, account_id, role_name, endpoint)
+        with tempfile.NamedTemporaryFile("w", dir=path.parent, delete=False) as tmp:  # Created 0600
+            json.dump(credentials, tmp)
+        Path(tmp.name).replace(path)
+    _credentials_memo[path] = credentials
+    return credentials
+
+
+def _refresh_in_background(session: str | None, account_id: str, role_name: str, endpoint: str | None) -> None:
+    argv = ["--credential-process", "--refresh", "--account-id", account_id, "--role-name", role_name]
+    argv += ["--session", session] if session else []
+    argv += ["--endpoint", endpoint] if endpoint else []
+    # Detached, so the AWS CLI or SDK that called us gets its (still valid) credentials without waiting.
+    subprocess.Popen(  # noqa: S603 - re-runs this script with our own arguments
+        [sys.executable, __file__, *argv],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def get_credentials(
+    session: str | None, account_id: str, role_name: str, endpoint: str | None = None
+) -> dict[str, Any]:
+    """Role credentials from memory or the disk cache, refreshed when they are about to expire."""
+    path = _credentials_cache_file(session, account_id, role_name)
+    credentials = _credentials_memo.get(path) or _read_cached_credentials(path)
+    if credentials is None or _remaining(credentials) < EXPIRY_MARGIN:
+        # Blocking: waits for a refresh already in flight instead of returning None
+        credentials = cast("dict[str, Any]", refresh_credentials(session, account_id, role_name, endpoint))
+    elif _remaining(credentials) < REFRESH_AHEAD:
+        _refresh_in_background(session, account_id, role_name, endpoint)
+    _credentials_memo[path] = credentials
+    return credentials
+
+
+def main():
+    cache_files = [p.stem for p in list(aws_sso_cache.glob("*.json"))]
+    log.info(cache_files)
+
+    for name, session in sso_sessions().items():
+        log.info(f"Session: {name}, profiles: {session['profiles']}")
+        if "key" not in session:
+            log.info(f"No [sso-session {name}] section")
+            continue
+        hash = hashlib.sha1(session["key"].encode()).hexdigest()
+        log.info(hash)
+        if hash in cache_files:
+            log.info("Cache hit")
+            log.info(f"{session['key']} = {hash}.json")
+            log.info((aws_sso_cache / f"{hash}.json").read_text())
+        else:
+            log.info("Cache miss")
+
+
+def cli(argv: list[str]):
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s::%(name)s::%(levelname)s::%(module)s:%(lineno)d| %(message)s",
         datefmt="%Y-%m-%d %H:%M:%S",
     )
-    main()
+    parser = argparse.ArgumentParser(description="Inspect cached AWS SSO sessions.")
+    parser.add_argument("-l", "--list", action="store_true", help="List the accounts and roles of cached sessions.")
+    parser.add_argument("-s", "--session", help="Only this profile or sso-session name.")
+    parser.add_argument("-c", "--credentials", action="store_true", help="With --list, also fetch role credentials.")
+    parser.add_argument("-n", "--concurrency", type=int, default=16, help="Maximum SSO requests in flight.")
+    parser.add_argument("-e", "--endpoint", default=os.getenv("AWS_SSO_PORTAL_ENDPOINT"), help="SSO portal URL.")
+    parser.add_argument("-p", "--credential-process", action="store_true", help="Print credential_process output.")
+    parser.add_argument("-a", "--account-id", help="Account of the role for --credential-process.")
+    parser.add_argument("-r", "--role-name", help="Role name for --credential-process.")
+    parser.add_argument("--refresh", action="store_true", help=argparse.SUPPRESS)  # Background refresh worker
+    args = parser.parse_args(argv)
+
+    if args.credential_process:
+        if not (args.account_id and args.role_name):
+            parser.error("--credential-process requires --account-id and --role-name")
+        if args.refresh:
+            refresh_credentials(args.session, args.account_id, args.role_name, args.endpoint, blocking=False)
+            return
+        print(json.dumps(get_credentials(args.session, args.account_id, args.role_name, args.endpoint)))
+        return
+
+    if not args.list:
+        main()
+        return
+    results = asyncio.run(list_sessions(args.session, args.credentials, args.concurrency, args.endpoint))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    cli(sys.argv[1:])
@@ -6,13 +6,46 @@
 # https://docs.astral.sh/uv/guides/scripts/#creating-a-python-script
 # https://packaging.python.org/en/latest/specifications/inline-script-metadata/#inline-script-metadata
 #
-# USAGE: python3 exportenv.py [--debug] [--unset]
+# USAGE: python3 exportenv.py [--debug] [--unset] [--hook [--environment NAME]]
 # Load a .env file from the current working directory and print out the environment variables as export statements
 #   --unset     print out unset statements instead
 #   --debug     print out debugging statements as hash comments
+#   --hook      shell prompt hook mode, see below
 #
 # Use in combination with `eval $(python3 exportenv.py)` to load the environment variables into the current shell.
 #
+# Hook mode layers .env, .env.local and .env.<environment> (later files win, NAME from --environment or
+# $EXPORTENV_ENVIRONMENT) and prints only the `export`/`unset` statements that changed since the previous prompt.
+# The shell itself carries the state: $__EXPORTENV_STATE holds a hash of the path, inode, size and mtime of each file,
+# so an unchanged directory costs a few stat calls and no parsing. Parsed layers are cached in $EXPORTENV_CACHE_DIR
+# (default ~/.cache/exportenv) by that hash, along with the environment variables they interpolated.
+#
+# $__EXPORTENV_ORIGINAL holds the value each exported key had before the hook first set it (JSON, null when it was
+# unset). Leaving the directory restores those values instead of unsetting the keys, so a .env that sets
+# PATH=${PATH}:/opt/bin or overrides EDITOR hands the shell its own values back, and ${VAR} interpolates against the
+# original values, so editing the .env does not append to PATH again.
+#
+#   bash: PROMPT_COMMAND='eval "$(python3 exportenv.py --hook)"'"${PROMPT_COMMAND:+;$PROMPT_COMMAND}"
+#   zsh:  precmd() { eval "$(python3 exportenv.py --hook)" }
+#
+# Supported .env syntax, parsed in a single pass over the whole file:
+#
+#   export KEY=value            # optional `export`, inline comments need whitespace before the #
+#   KEY='literal $NOT expanded' # single quotes: no escapes except \' and \\, no interpolation
+#   KEY="a\tb ${OTHER}"         # double quotes: \n \t \r \" \\ \$ escapes and interpolation
+#   KEY="first line
+#   second line"                # quoted values may span lines
+#   KEY=${OTHER:-default}/bin   # ${VAR} and ${VAR:-default} resolve earlier keys first, then the environment
+#
+# Keys must be valid shell names ([A-Za-z_][A-Za-z0-9_]*), lines with any other key are skipped like comments. This
+# parser follows dotenv/shell conventions rather than the shlex tokenising of earlier versions, which differs for:
+#
+#   KEY=a b     -> a b            (was ab: whitespace inside unquoted values is kept)
+#   KEY=abc#x   -> abc#x          (was abc: # only starts a comment after whitespace)
+#   KEY="a"b    -> "a"b           (was ab: quotes only count around the whole value, this one is kept literally)
+#   KEY="a\nb"  -> a, newline, b  (was a\nb: escapes are interpreted in double quotes)
+#   KEY=${X}    -> the value of X (was ${X}: no interpolation)
+#
 # One liner:
 #
 # curl -fsSL https://raw.githubusercontent.com/neozenith/python-onboarding-guide/refs/heads/main/scripts/exportenv.py | python3
@@ -24,34 +57,69 @@
 # curl -fsSL https://raw.githubusercontent.com/neozenith/python-onboarding-guide/refs/heads/main/scripts/exportenv.py | sh -c 'python3 - --debug --unset'
 #
 # Standard Library
+import hashlib
+import json
 import logging
+import os
 import pathlib
-import sys
+import re
 import shlex
+import sys
+from collections import ChainMap
+from collections.abc import Iterator, Mapping
 
 log = logging.getLogger(__name__)
 
-log_level = logging.DEBUG if "--debug" in sys.argv else logging.INFO
+HOOK_STATE_VAR = "__EXPORTENV_STATE"
+HOOK_ORIGINAL_VAR = "__EXPORTENV_ORIGINAL"
+CACHE_DIR = pathlib.Path(os.getenv("EXPORTENV_CACHE_DIR", pathlib.Path.home() / ".cache" / "exportenv"))
+CACHE_MAX_ENTRIES = 256
+
+
+# One match per assignment. Quoted values may contain newlines, so a multi-line value is consumed whole and the
+# lines inside it are never mistaken for assignments. Comments, blank and malformed lines simply do not match.
+__ENV_ENTRY = re.compile(
+    r"""
+    ^[ \t]*(?:export[ \t]+)?(?P<key>[A-Za-z_][A-Za-z0-9_]*)[ \t]*=[ \t]*
+    (?:
+        '(?P<single>(?:[^'\\]|\\[\s\S])*)'[ \t\r]*(?:\#[^\n]*)?$
+      | "(?P<double>(?:[^"\\]|\\[\s\S])*)"[ \t\r]*(?:\#[^\n]*)?$
+      | (?P<bare>[^\n]*)
+    )
+    """,
+    re.MULTILINE | re.VERBOSE,
+)
+__INLINE_COMMENT = re.compile(r"\s+#.*")
+__VARIABLE = r"\$\{(?P<var>[A-Za-z_][A-Za-z0-9_]*)(?::-(?P<default>[^}]*))?\}"
+__DOUBLE_QUOTED = re.compile(rf"\\(?P<escape>[\s\S])|{__VARIABLE}")
+__UNQUOTED = re.compile(__VARIABLE)
+__SINGLE_QUOTED = re.compile(r"\\(['\\])")
+__ESCAPES = {"n": "\n", "t": "\t", "r": "\r"}
 
 
-def __parse_env_line(line: str) -> tuple[str | None, str | None]:
-    """Parses a single line into a key-value pair. Handles quoted values and inline comments.
-    Returns (None, None) for invalid lines."""
-    # Guard checks for empty lines or lines without '='
-    line = line.strip()
-    if not line or line.startswith("#") or "=" not in line:
-        return None, None
+def parse_env(text: str, environ: Mapping[str, str] | None = None) -> dict[str, str]:
+    """Parse the contents of a .env file in one pass, see the header of this file for the supported syntax.
 
-    # Split the line into key and value at the first '='
-    key, value = line.split("=", 1)
-    key = key.strip()
+    ${VAR} references resolve keys assigned earlier in text first, then environ (default os.environ), else "".
+    """
+    environ = os.environ if environ is None else environ
+    values: dict[str, str] = {}
 
-    # Use shlex to process the value (handles quotes and comments)
-    lexer = shlex.shlex(value, posix=True)
-    lexer.whitespace_split = True  # Tokenize by whitespace
-    value = "".join(lexer)  # Preserve the full quoted/cleaned value
+    def substitute(match: re.Match) -> str:
+        if match["var"] is None:  # An escape sequence in a double quoted value
+            return __ESCAPES.get(match["escape"], match["escape"])
+        value = values.get(match["var"], environ.get(match["var"]))
+        return value or match["default"] or ""
 
-    return key, value
+    for match in __ENV_ENTRY.finditer(text):
+        if match["single"] is not None:
+            value = __SINGLE_QUOTED.sub(r"\1", match["single"])
+        elif match["double"] is not None:
+            value = __DOUBLE_QUOTED.sub(substitute, match["double"])
+        else:
+            value = __UNQUOTED.sub(substitute, __INLINE_COMMENT.sub("", match["bare"]).strip())
+        values[match["key"]] = value
+    return values
 
 
 def read_env_file(file_path: str | pathlib.Path) -> dict[str, str] | None:
@@ -59,15 +127,127 @@ def read_env_file(file_path: str | pathlib.Path) -> dict[str, str] | None:
     If the file does not exist or is not a regular file, returns None.
     """
     file = file_path if type(file_path) is pathlib.Path else pathlib.Path(file_path)
-    return (
-        {
-            key: value
-            for key, value in map(__parse_env_line, file.read_text().splitlines())
-            if key is not None and value is not None
-        }
-        if file.is_file()
-        else None
-    )
+    return parse_env(file.read_text()) if file.is_file() else None
+
+
+def layered_env_files(directory: pathlib.Path, environment: str | None = None) -> list[pathlib.Path]:
+    """The .env files of directory in the order they are layered, later files overriding earlier ones."""
+    names = [".env", ".env.local"] + ([f".env.{environment}"] if environment else [])
+    return [directory / name for name in names]
+
+
+def files_signature(files: list[pathlib.Path]) -> str:
+    """Hash of the path, inode, size and mtime of each existing file, or "" when none of them exist."""
+    stats = []
+    for file in files:
+        try:
+            stat = file.stat()
+        except OSError:
+            continue
+        stats.append([str(file), stat.st_ino, stat.st_size, stat.st_mtime_ns])
+    return hashlib.sha1(json.dumps(stats).encode()).hexdigest() if stats else ""
+
+
+class _RecordingEnviron(Mapping[str, str]):
+    """A read-only view of an environment that records every variable looked up, and its value (None if unset)."""
+
+    def __init__(self, environ: Mapping[str, str]):
+        self.environ = environ
+        self.seen: dict[str, str | None] = {}
+
+    def __getitem__(self, key: str) -> str:
+        self.seen[key] = self.environ.get(key)
+        return self.environ[key]
+
+    def __contains__(self, key: object) -> bool:
+        if isinstance(key, str):
+            self.seen[key] = self.environ.get(key)
+        return key in self.environ
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.environ)
+
+    def __len__(self) -> int:
+        return len(self.environ)
+
+
+def _cached_values(signature: str) -> dict | None:
+    try:
+        cached = json.loads((CACHE_DIR / f"{signature}.json").read_text())
+    except (OSError, ValueError):
+        return None
+    return cached if isinstance(cached, dict) and {"values", "environ"} <= cached.keys() else None
+
+
+def _cache_values(signature: str, cached: dict) -> None:
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = CACHE_DIR / f"{signature}.json.{os.getpid()}"
+        tmp.write_text(json.dumps(cached))
+        tmp.replace(CACHE_DIR / f"{signature}.json")
+        entries = sorted(CACHE_DIR.glob("*.json"), key=lambda path: path.stat().st_mtime_ns)
+        for stale in entries[:-CACHE_MAX_ENTRIES]:
+            stale.unlink(missing_ok=True)
+    except OSError as e:
+        log.debug(f"# Not caching {signature}: {e}")
+
+
+def load_layered_env(files: list[pathlib.Path], signature: str, environ: Mapping[str, str]) -> dict[str, str]:
+    """Parse and layer the files, interpolating against environ.
+
+    The values cached for signature are reused when every environment variable they interpolated is unchanged.
+    """
+    cached = _cached_values(signature)
+    if cached is not None and all(environ.get(key) == value for key, value in cached["environ"].items()):
+        return cached["values"]
+
+    values: dict[str, str] = {}
+    recording = _RecordingEnviron(environ)
+    for file in files:
+        if file.is_file():
+            # Later layers can interpolate keys from earlier ones as well as from the environment.
+            values.update(parse_env(file.read_text(), ChainMap(values, recording)))
+    _cache_values(signature, {"values": values, "environ": recording.seen})
+    return values
+
+
+def _saved_originals() -> dict[str, str | None]:
+    try:
+        originals = json.loads(os.environ.get(HOOK_ORIGINAL_VAR, "{}"))
+    except ValueError:
+        return {}
+    return originals if isinstance(originals, dict) else {}
+
+
+def _export(key: str, value: str | None) -> str:
+    return f"unset {key}" if value is None else f"export {key}={shlex.quote(value)}"
+
+
+def hook(directory: pathlib.Path | None = None, environment: str | None = None) -> list[str]:
+    """Return the shell statements that move the shell from its previous .env state to the current one.
+
+    Returns nothing, without reading any .env file, when the files have not changed since the previous call.
+    """
+    previous_signature = os.environ.get(HOOK_STATE_VAR, "")
+    files = layered_env_files(directory or pathlib.Path.cwd(), environment)
+    signature = files_signature(files)
+    if signature == previous_signature:
+        return []
+
+    # The environment as it was before the hook exported anything.
+    originals = _saved_originals()
+    environ = {key: value for key, value in os.environ.items() if key not in originals}
+    environ.update({key: value for key, value in originals.items() if value is not None})
+
+    current = load_layered_env(files, signature, environ) if signature else {}
+    statements = [_export(key, value) for key, value in originals.items() if key not in current]
+    statements += [_export(key, value) for key, value in current.items() if os.environ.get(key) != value]
+
+    originals = {key: originals[key] if key in originals else environ.get(key) for key in current}
+    statements.append(_export(HOOK_STATE_VAR, signature or None))
+    statements.append(_export(HOOK_ORIGINAL_VAR, json.dumps(originals) if originals else None))
+    return statements
+
 
 def main(should_unset: bool = False):
     env_file = pathlib.Path.cwd() / ".env"
@@ -78,16 +258,24 @@ def main(should_unset: bool = False):
                 if should_unset:
                     log.info(f"unset {key}")
                 else:
-                    log.info(f"export {key}={value}")
+                    log.info(f"export {key}={shlex.quote(value)}")
 
 
-if __name__ == "__main__":
+def cli(argv: list[str]):
+    log_level = logging.DEBUG if "--debug" in argv else logging.INFO
     logging.basicConfig(level=log_level, format="%(message)s", handlers=[logging.StreamHandler(sys.stdout)])
 
-    log.debug(f"# {sys.argv}")
+    log.debug(f"# {argv}")
     log.debug(f"# {pathlib.Path.cwd()}")
-    should_unset = "--unset" in sys.argv
+    if "--hook" in argv:
+        flag = "--environment"
+        environment = argv[argv.index(flag) + 1] if flag in argv[:-1] else os.getenv("EXPORTENV_ENVIRONMENT")
+        for statement in hook(environment=environment):
+            log.info(statement)
+        return
+    should_unset = "--unset" in argv
     main(should_unset)
 
-    
 
+if __name__ == "__main__":
+    cli(sys.argv[1:])
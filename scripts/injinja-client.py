@@ -0,0 +1,59 @@
+# ruff: noqa: E501
+# /// script
+# requires-python = ">=3.11"
+# dependencies = [
+# ]
+# ///
+# https://docs.astral.sh/uv/guides/scripts/#creating-a-python-script
+# https://packaging.python.org/en/latest/specifications/inline-script-metadata/#inline-script-metadata
+#
+# Thin, standard library only client for the `injinja.py --serve` render daemon.
+#
+# Takes exactly the same flags as injinja.py and forwards them, with the working directory, over the daemon's Unix
+# socket. Startup therefore never imports jinja2/yaml and a render costs a few milliseconds once the daemon is warm.
+# When no daemon is listening it transparently runs injinja.py from the same directory instead.
+#
+# USAGE: python3 injinja-client.py [--debug] [--template/-t TEMPLATE] [--config/-c CONFIGFILE] [--env KEY=VALUE] [--output OUTPUTFILE]
+#
+# The socket defaults to $INJINJA_SOCKET, else $INJINJA_CACHE_DIR/daemon.sock, else ~/.cache/injinja/daemon.sock
+#
+# Standard Library
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+
+CACHE_DIR = Path(os.getenv("INJINJA_CACHE_DIR", Path.home() / ".cache" / "injinja"))
+DAEMON_SOCKET = Path(os.getenv("INJINJA_SOCKET", CACHE_DIR / "daemon.sock"))
+INJINJA_SCRIPT = Path(__file__).resolve().parent / "injinja.py"
+
+
+def request(argv: list[str], socket_path: Path = DAEMON_SOCKET) -> int:
+    """Send one CLI invocation to the daemon, relay its stdout/stderr and return its exit code."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(socket_path))
+        sock.sendall(json.dumps({"argv": argv, "cwd": str(Path.cwd())}).encode() + b"\n")
+        with sock.makefile("rb") as responses:
+            for line in responses:
+                message = json.loads(line)
+                if "stdout" in message:
+                    sys.stdout.write(message["stdout"])
+                elif "stderr" in message:
+                    sys.stderr.write(message["stderr"])
+                elif "exit" in message:
+                    sys.stdout.flush()
+                    return message["exit"]
+    raise ConnectionError("injinja daemon closed the connection without an exit code")
+
+
+def main(argv: list[str], socket_path: Path = DAEMON_SOCKET) -> int:
+    try:
+        return request(argv, socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        # No daemon listening: behave exactly like the real script
+        os.execv(sys.executable, [sys.executable, str(INJINJA_SCRIPT), *argv])
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -29,26 +29,113 @@
 #
 # USAGE: python3 injinja.py [--debug] [--template/-t TEMPLATE]  [--config/-c CONFIGFILE] [--env KEY=VALUE] [--env KEY=VALUE] [--output OUTPUTFILE]
 #
+# Batch mode renders many template x config pairs in one process pool, parsing each config once:
+#
+# USAGE: python3 injinja.py --batch MANIFEST [--workers N] [--env KEY=VALUE]
+#
+# MANIFEST is a JSON/YAML/TOML file with a list of items (or a mapping with `defaults` and `items`):
+#
+#   defaults:
+#     env: {home_dir: /home/me}
+#   items:
+#     - {template: templates/a.sql.j2, config: conf/a.yml, output: out/a.sql}
+#     - {template: "templates/*.tf.j2", config: conf/shared.yml, output: "out/{stem}"}  # glob pair
+#
+# A glob `template` expands to one item per match and `output` may use {stem}, {name} and {parent} of the match.
+# Outputs are written atomically and a failing item is reported without aborting the rest of the batch.
+#
 # One liner:
 #
 # curl -fsSL https://raw.githubusercontent.com/neozenith/python-onboarding-guide/refs/heads/main/scripts/injinja.py | sh -c "python3 - -t template.j2 -c config.yml -e home_dir=$HOME"
 #
-# TODO: Add custom directives like !include for YAML parser inspired by:
-# https://github.com/littleK0i/SnowDDL/blob/master/snowddl/parser/_yaml.py
-# TODO: Add merging of collections of JSON or YAML if a pathspec is given
-# https://deepmerge.readthedocs.io/en/latest/index.html
+# Multiple --config flags, directories and glob patterns are deep-merged in the order given, later files winning:
+#
+# USAGE: python3 injinja.py -t template.j2 -c base.yml -c 'overrides/**/*.yml' [--merge-lists append|prepend|replace|unique]
+#
+# Parsed config files are cached in memory and under $INJINJA_CACHE_DIR keyed by a hash of their path, content and
+# --env values, so unchanged fragments are never rendered or parsed again on later runs. A cached config is only reused
+# while every file it includes is unchanged and every glob !include still matches the same files. The most recently
+# used 256 parsed configs are kept on disk. Compiled templates are cached under $INJINJA_CACHE_DIR/bytecode, one file
+# per template recompiled when its source changes, keeping the 1024 most recently used.
+#
+# YAML configs may pull in other files with `!include path/to/fragment.yml` (relative to the including file).
+# A glob such as `!include tables/*.yml` becomes a list with one entry per match. Every physical file is parsed once
+# per run however many times it is referenced, and include cycles are reported instead of recursing forever.
+# Inspired by: https://github.com/littleK0i/SnowDDL/blob/master/snowddl/parser/_yaml.py
+#
+# Merging strategy inspired by: https://deepmerge.readthedocs.io/en/latest/index.html
+#
+# Renders to stdout or --output are streamed chunk by chunk (Template.generate) through a buffered writer, so peak
+# memory does not grow with the size of the generated SQL/Terraform. merge_template still returns a string.
+#
+# --serve [SOCKET] starts an opt-in daemon that keeps a warm interpreter with compiled templates and parsed configs.
+# `injinja-client.py` takes exactly the same flags, forwards them over the Unix socket and falls back to running this
+# script when no daemon is listening. Configs are revalidated by mtime/size on every request and templates by mtime.
+#
+# USAGE: python3 injinja.py --serve &
+#        python3 injinja-client.py -t template.j2 -c config.yml -e key=value
+#
+# --incremental [MANIFEST] records a hash of every input behind each output file (template and the templates it
+# includes, config files and their !includes, --env values) in a JSON manifest (default .injinja-manifest.json).
+# Later runs skip outputs whose inputs are unchanged. Independently of that, an output whose rendered bytes are
+# identical to the existing file is never rewritten, so its mtime does not trigger downstream rebuilds.
+#
+# --data NAME=PATH exposes a CSV, JSONL or Parquet file to templates as a lazily read stream of rows (dicts), so
+# `{% for row in NAME %}` over a million-row inventory never holds more than one row (or Parquet batch) in memory.
+# The file is re-read on each loop over it. Parquet needs `pyarrow` installed. The config must be a mapping at the top
+# level (or empty) for the sources to sit next to its keys.
+#
+# USAGE: python3 injinja.py -t tables.sql.j2 -c config.yml --data tables=inventory.csv --data grants=grants.jsonl
+#
+# --lint [PATHSPEC] parses (without rendering) every template under the given files, directories or globs across a
+# process pool and reports every variable a template reads but never defines, and that is not a top level key of
+# the --config files (when given) or a --data source. All gaps are reported at once with file:line, exit code 1.
+# Without a PATHSPEC the current directory is linted. Directories are searched without descending into hidden
+# directories (.git, .venv, ...), virtualenvs or node_modules.
+# Results are cached under $INJINJA_CACHE_DIR by template content and the injinja and Jinja2 versions, so re-linting a
+# large tree only parses the templates that changed. The results of the 4096 most recently linted templates are kept.
+#
+# USAGE: python3 injinja.py --lint templates/ [-c config.yml] [--data rows=rows.csv]
+#
+# --profile-render [JSON] instruments the Environment while rendering (single or --batch, rendered in-process) and
+# logs a table of wall time, call count and generated size for every template, include, block and macro, sorted by
+# time, plus the largest generated fragments. The same numbers are written as JSON (default injinja-profile.json).
+# Times are inclusive: a template's time contains the includes, blocks and macros it renders.
+#
+# --watch keeps running after the first render (single or --batch) and re-renders only the outputs whose inputs
+# changed: config files, their !include'd files and templates pulled in with {% include/import/extends %}.
+# A file that starts (or stops) matching a glob !include also re-renders the configs including it.
+# Uses inotify through `watchdog` when it is installed, otherwise debounced mtime polling.
 
 # Standard Library
 import argparse
+import concurrent.futures
+import contextlib
+import csv
+import filecmp
+import functools
+import glob
+import hashlib
+import io
 import json
 import logging
+import os
 import pathlib
+import pickle
+import queue
+import shutil
+import socketserver
 import sys
+import tempfile
+import time
 import tomllib
-from typing import Any
+from collections.abc import Iterable, Iterator
+from dataclasses import asdict, dataclass, field
+from typing import IO, Any
 
 # Third Party
 import jinja2
+import jinja2.meta
 import yaml
 
 log = logging.getLogger(__name__)
@@ -58,12 +145,66 @@ logging.basicConfig(level=log_level, format="%(message)s")
 log.debug(f"# {sys.argv}")
 log.debug(f"# {pathlib.Path.cwd()}")
 
+CACHE_DIR = pathlib.Path(os.getenv("INJINJA_CACHE_DIR", pathlib.Path.home() / ".cache" / "injinja"))
+DAEMON_SOCKET = pathlib.Path(os.getenv("INJINJA_SOCKET", CACHE_DIR / "daemon.sock"))
+
+# Configs and their !include fragments parse through libyaml when PyYAML was built with it.
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+STREAM_BUFFER_SIZE = 1024 * 1024
+CONFIG_SUFFIXES = (".json", ".yml", ".yaml", ".toml")
+TEMPLATE_SUFFIXES = (".j2", ".jinja", ".jinja2")
+SKIPPED_DIRS = {"node_modules", "__pycache__", "site-packages"}  # Never searched for configs or templates
+DATA_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".parquet": "parquet"}
+LIST_STRATEGIES = ["append", "prepend", "replace", "unique"]
+
+PARSE_CACHE_VERSION = 3  # Bump whenever the pickled payload of the parse cache changes shape
+PARSE_CACHE_MAX_ENTRIES = 4096
+PARSE_CACHE_MAX_FILES = 256
+BYTECODE_CACHE_MAX_FILES = 1024
+LINT_CACHE_MAX_FILES = 4096  # One small file per distinct template, enough for the templates of a large tree
+MANIFEST_VERSION = 1  # Bump when renders change in a way the manifests of piped (fileless) runs cannot detect
+_parse_cache: dict[str, bytes] = {}
+_configs_memo: dict[tuple, tuple[tuple, dict, Any, set[pathlib.Path]]] = {}
+
 cli_config = {
     "debug": True,
-    "template": {"required": True, "help": "The Jinja2 template file to use."},
-    "config": {"required": True, "help": "The configuration file to use."},
+    "template": {"help": "The Jinja2 template file to use."},
+    "config": {"action": "append", "help": "Config file, directory or glob to deep-merge. Repeatable."},
     "env": {"action": "append", "default": [], "help": "Environment variables to pass to the template."},
     "output": "stdout",
+    "data": {
+        "action": "append",
+        "default": [],
+        "help": "NAME=PATH of a CSV, JSONL or Parquet file exposed to templates as a lazy stream of rows. Repeatable.",
+    },
+    "batch": {"default": None, "help": "Manifest of template/config/output items to render in one process pool."},
+    "merge-lists": {"choices": LIST_STRATEGIES, "default": "append", "help": "How lists are deep-merged."},
+    "workers": {"type": int, "default": os.cpu_count(), "help": "Number of worker processes in batch mode."},
+    "watch": {"action": "store_true", "help": "Re-render affected outputs whenever an input file changes."},
+    "incremental": {
+        "nargs": "?",
+        "const": ".injinja-manifest.json",
+        "default": None,
+        "help": "Skip outputs whose inputs are unchanged since the run recorded in this manifest.",
+    },
+    "lint": {
+        "nargs": "?",
+        "const": ".",
+        "default": None,
+        "help": "Report undeclared variables of every template under this file, directory or glob without rendering.",
+    },
+    "profile-render": {
+        "nargs": "?",
+        "const": "injinja-profile.json",
+        "default": None,
+        "help": "Log per template/include/block/macro render times and write them as JSON to this file.",
+    },
+    "serve": {
+        "nargs": "?",
+        "const": str(DAEMON_SOCKET),
+        "default": None,
+        "help": f"Run a render daemon on this Unix socket (default {DAEMON_SOCKET}).",
+    },
 }
 
 
@@ -72,87 +213,1211 @@ def dict_from_keyvalue_list(args: list[str] | None = None) -> dict[str, str] | N
     return {k: v for k, v in [x.split("=") for x in args]} if args else None
 
 
+class DataSource:
+    """Rows of a CSV, JSONL or Parquet file as dicts, read lazily every time a template iterates over it.
+
+    Only the path is held (and pickled to batch workers), never the rows themselves.
+    """
+
+    def __init__(self, filename: str | pathlib.Path):
+        self.path = pathlib.Path(filename)
+        try:
+            self.format = DATA_FORMATS[self.path.suffix.lower()]
+        except KeyError:
+            raise ValueError(f"Data source {filename} must be one of {', '.join(DATA_FORMATS)}") from None
+
+    def __repr__(self) -> str:
+        return f"DataSource({str(self.path)!r})"
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        return getattr(self, f"_iter_{self.format}")()
+
+    def _iter_csv(self) -> Iterator[dict[str, Any]]:
+        with self.path.open(newline="") as f:
+            yield from csv.DictReader(f)
+
+    def _iter_jsonl(self) -> Iterator[dict[str, Any]]:
+        with self.path.open() as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def _iter_parquet(self) -> Iterator[dict[str, Any]]:
+        try:
+            # Third Party
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError(f"Reading {self.path} requires pyarrow: pip install pyarrow") from None
+        with pq.ParquetFile(self.path) as f:
+            for batch in f.iter_batches():
+                yield from batch.to_pylist()
+
+
+def data_sources_from_keyvalue_list(args: list[str] | None = None) -> dict[str, DataSource]:
+    """Convert a list of 'name=path' strings into lazily read data sources."""
+    sources = {}
+    for arg in args or []:
+        name, _, path = arg.partition("=")
+        if not name.isidentifier() or not path:
+            raise ValueError(f"--data expects NAME=PATH, got {arg!r}")
+        sources[name] = DataSource(path)
+    return sources
+
+
+def with_data(config: Any, data: dict[str, DataSource] | None, config_files: Iterable[str] = ()) -> Any:
+    """Add the data sources to the template context, next to (and overriding) the top level config keys.
+
+    A config that is a top level list or scalar has no keys to add them next to, which is a ValueError naming the
+    config_files it was loaded from.
+    """
+    if not data:
+        return config
+    if config is not None and not isinstance(config, dict):
+        source = f"config {', '.join(config_files)}" if config_files else "config"
+        raise ValueError(f"--data needs a mapping at the top level of the {source}, not a {type(config).__name__}")
+    return {**(config or {}), **data}
+
+
+def _data_dependencies(data: dict[str, DataSource] | None) -> set[pathlib.Path]:
+    return {source.path.resolve() for source in (data or {}).values()}
+
+
+class PathLoader(jinja2.FileSystemLoader):
+    """FileSystemLoader that loads absolute template paths as-is and relative ones from the search path."""
+
+    def get_source(self, environment, template):
+        if pathlib.PurePath(template).is_absolute():
+            return jinja2.FileSystemLoader("/", encoding=self.encoding).get_source(environment, template)
+        return super().get_source(environment, template)
+
+
+class TemplateBytecodeCache(jinja2.FileSystemBytecodeCache):
+    """On-disk bytecode cache with one file per template path, marking the files it loads as recently used.
+
+    Jinja2 stores the checksum of the source with the bytecode and discards it when the source changed, so an edited
+    template is compiled again into the same file rather than a new one.
+    """
+
+    def load_bytecode(self, bucket: jinja2.bccache.Bucket) -> None:
+        super().load_bytecode(bucket)
+        if bucket.code is not None:
+            with contextlib.suppress(OSError):
+                os.utime(self._get_cache_filename(bucket))  # Pruning removes the least recently used files first
+
+
+def _bytecode_cache() -> jinja2.BytecodeCache | None:
+    directory = CACHE_DIR / "bytecode"
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        log.debug(f"# Bytecode cache disabled, {CACHE_DIR} is not writable")
+        return None
+    _prune_cache(directory, "__jinja2_*.cache", BYTECODE_CACHE_MAX_FILES)  # Templates since deleted or moved
+    return TemplateBytecodeCache(str(directory))
+
+
+@functools.cache
+def get_environment() -> jinja2.Environment:
+    """Shared Environment so each template is parsed and compiled once per process (and once per edit on disk).
+
+    Relative template names, including {% include %}/{% import %}/{% extends %}, resolve from the working directory.
+    """
+    kwargs: dict[str, Any] = {"loader": PathLoader("."), "bytecode_cache": _bytecode_cache(), "auto_reload": True}
+    # NOTE: Providing jinja 2.11.x compatable version to better cross operate
+    # with dbt-databricks v1.2.2 and down stream dbt-spark and dbt-core
+    if int(jinja2.__version__[0]) >= 3:
+        kwargs["undefined"] = jinja2.StrictUndefined
+    return jinja2.Environment(**kwargs)
+
+
+def get_template(template_filename: str) -> jinja2.Template:
+    """Fetch a compiled template from the shared Environment by file path."""
+    return get_environment().get_template(str(pathlib.Path(template_filename).resolve()))
+
+
 def merge_template(template_filename: str, config: dict[str, Any] | None) -> str:
     """Load a Jinja2 template from file and merge configuration."""
-    # Step 1: get raw content as a string
-    raw_content = pathlib.Path(template_filename).read_text()
-
-    # Step 2: Treat raw_content as a Jinja2 template if providing configuration
-    if config:
-        # NOTE: Providing jinja 2.11.x compatable version to better cross operate
-        # with dbt-databricks v1.2.2 and down stream dbt-spark and dbt-core
-        if int(jinja2.__version__[0]) >= 3:
-            content = jinja2.Template(raw_content, undefined=jinja2.StrictUndefined).render(**config)
-        else:
-            content = jinja2.Template(raw_content).render(**config)
+    # Step 1: Without configuration the raw content is passed through untouched
+    if not config:
+        return pathlib.Path(template_filename).read_text()
 
-    else:
-        content = raw_content
+    # Step 2: Render the cached, compiled template with the configuration
+    return get_template(template_filename).render(**config)
 
-    return content
 
+def stream_template(template_filename: str, config: dict[str, Any] | None, out: IO[str]) -> None:
+    """Render a template into out chunk by chunk so the full output is never held in memory."""
+    if not config:
+        with pathlib.Path(template_filename).open() as f:
+            shutil.copyfileobj(f, out, STREAM_BUFFER_SIZE)
+        return
 
-def load_config(filename: str, environment_variables: dict[str, str] | None = None) -> Any:
-    """Detect if file is JSON or YAML and return parsed datastructure.
+    # generate() yields many tiny fragments, so coalesce them into fewer, larger writes.
+    pending: list[str] = []
+    pending_size = 0
+    for chunk in get_template(template_filename).generate(**config):
+        pending.append(chunk)
+        pending_size += len(chunk)
+        if pending_size >= STREAM_BUFFER_SIZE:
+            out.write("".join(pending))
+            pending, pending_size = [], 0
+    out.write("".join(pending))
 
-    When environment_variables is provided, then the file is first treated as a Jinja2 template.
-    """
-    # Step 1 & 2: Get raw template string and merge config (as necessary), returning as string
-    content = merge_template(filename, environment_variables)
 
-    # Step 3: Parse populated string into a data structure.
+def parse_config(content: str, filename: str) -> Any:
+    """Parse a JSON, YAML or TOML string based on the file extension of filename."""
     if filename.lower().endswith("json"):
         return json.loads(content)
     elif any([filename.lower().endswith(ext) for ext in ["yml", "yaml"]]):
-        return yaml.safe_load(content)
+        return yaml.load(content, Loader=YAML_LOADER)  # noqa: S506 - YAML_LOADER is always a safe loader
     elif filename.lower().endswith("toml"):
         return tomllib.loads(content)
 
     raise ValueError(f"File type of {filename} not supported.")  # pragma: no cover
 
 
+class IncludeLoader(YAML_LOADER):  # type: ignore[valid-type,misc]
+    """Safe YAML loader that resolves `!include` through the IncludeResolver of the current run."""
+
+    include_base: pathlib.Path
+    include_resolver: "IncludeResolver"
+
+
+def _construct_include(loader: IncludeLoader, node: yaml.Node) -> Any:
+    spec = loader.construct_scalar(node)  # type: ignore[arg-type]
+    pattern = str(loader.include_base / spec)  # An absolute spec replaces include_base entirely
+    if glob.has_magic(pattern):
+        matches = sorted(glob.glob(pattern, recursive=True))  # noqa: PTH207
+        loader.include_resolver.record_glob(pattern, matches)
+        return [loader.include_resolver.load(match) for match in matches]
+    return loader.include_resolver.load(pattern)
+
+
+IncludeLoader.add_constructor("!include", _construct_include)
+
+
+class IncludeResolver:
+    """Per-run cache of parsed config files so each physical file is parsed once, with include cycle detection."""
+
+    def __init__(self, environment_variables: dict[str, str] | None = None):
+        self.environment_variables = environment_variables
+        self.cache: dict[pathlib.Path, Any] = {}
+        self.dependencies: dict[pathlib.Path, set[pathlib.Path]] = {}
+        self.globs: dict[pathlib.Path, dict[str, list[str]]] = {}  # The glob !includes of each file and their matches
+        self._stack: list[pathlib.Path] = []
+
+    def load(self, filename: str | pathlib.Path) -> Any:
+        """Return the parsed content of filename, parsing it only on first reference."""
+        path = pathlib.Path(filename).resolve()
+        if path in self._stack:
+            cycle = " -> ".join(str(p) for p in [*self._stack[self._stack.index(path) :], path])
+            raise ValueError(f"Circular !include: {cycle}")
+
+        if path not in self.cache:
+            self.dependencies[path] = set()
+            self._stack.append(path)
+            try:
+                self.cache[path] = self._parse(path)
+            finally:
+                self._stack.pop()
+
+        # Every file currently being parsed depends on this one and on everything it includes
+        for parent in self._stack:
+            self.dependencies[parent] |= {path} | self.dependencies[path]
+        return self.cache[path]
+
+    def record_glob(self, pattern: str, matches: list[str]) -> None:
+        """Record the files a glob !include of the file being parsed matched."""
+        self.globs.setdefault(self._stack[-1], {})[pattern] = matches
+
+    def globs_of(self, paths: set[pathlib.Path]) -> dict[pathlib.Path, dict[str, list[str]]]:
+        return {path: self.globs[path] for path in paths if path in self.globs}
+
+    def _parse(self, path: pathlib.Path) -> Any:
+        if not path.is_file():
+            raise FileNotFoundError(f"Config file {path} does not exist")
+        content = merge_template(str(path), self.environment_variables)
+        if path.suffix.lower() not in (".yml", ".yaml"):
+            return parse_config(content, str(path))
+
+        loader = IncludeLoader(content)
+        loader.include_base = path.parent
+        loader.include_resolver = self
+        try:
+            return loader.get_single_data()
+        finally:
+            loader.dispose()
+
+
+def _file_digest(filename: str | pathlib.Path) -> str:
+    with pathlib.Path(filename).open("rb") as f:  # In chunks: --data files can be far larger than memory
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+@functools.cache
+def _script_digest() -> str:
+    """Hash of this script, as a new injinja may render differently. `curl ... | python3 -` has no file to hash."""
+    try:
+        return _file_digest(__file__)
+    except OSError:
+        return f"manifest-v{MANIFEST_VERSION}"
+
+
+def globs_unchanged(globs: dict[pathlib.Path, dict[str, list[str]]]) -> bool:
+    """Whether every glob !include still matches exactly the files it matched when its config was parsed."""
+    return all(
+        sorted(glob.glob(pattern, recursive=True)) == matches  # noqa: PTH207
+        for patterns in globs.values()
+        for pattern, matches in patterns.items()
+    )
+
+
+def _prune_cache(directory: pathlib.Path, pattern: str, keep: int) -> None:
+    """Delete all but the keep most recently modified files of directory matching pattern."""
+    try:
+        cached = sorted(directory.glob(pattern), key=lambda f: f.stat().st_mtime_ns)
+        for stale in cached[: max(0, len(cached) - keep)]:
+            stale.unlink(missing_ok=True)
+    except OSError:  # e.g. a file pruned by a concurrent run
+        log.debug(f"# Could not prune {directory}")
+
+
+def _parse_cache_key(filename: str, environment_variables: dict[str, str] | None) -> str:
+    path = pathlib.Path(filename).resolve()
+    digest = hashlib.sha256(path.read_bytes())
+    # The same text elsewhere resolves its relative !includes (and its suffix's parser) differently
+    digest.update(f"\0{PARSE_CACHE_VERSION}\0{path}\0".encode())
+    digest.update(json.dumps(environment_variables, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def load_config(
+    filename: str, environment_variables: dict[str, str] | None = None, resolver: IncludeResolver | None = None
+) -> Any:
+    """Detect if file is JSON or YAML and return parsed datastructure.
+
+    When environment_variables is provided, then the file is first treated as a Jinja2 template.
+    Results are cached by content hash in memory and on disk so unchanged files are never re-parsed. A cached result
+    is only reused while every file it `!include`s is also unchanged and its glob `!include`s match the same files.
+    """
+    resolver = resolver or IncludeResolver(environment_variables)
+    path = pathlib.Path(filename).resolve()
+    key = _parse_cache_key(filename, environment_variables)
+    cache_file = CACHE_DIR / "parsed" / f"{key}.pickle"
+    if key not in _parse_cache and cache_file.is_file():
+        _parse_cache[key] = cache_file.read_bytes()
+        with contextlib.suppress(OSError):
+            os.utime(cache_file)  # Pruning removes the least recently used files first
+    if key in _parse_cache:
+        data, dependencies, globs = pickle.loads(_parse_cache[key])  # noqa: S301 - only ever written by this script
+        try:
+            is_fresh = all(_file_digest(dep) == digest for dep, digest in dependencies.items())
+        except OSError:
+            is_fresh = False
+        if is_fresh and globs_unchanged(globs):
+            resolver.dependencies[path] = {pathlib.Path(dep) for dep in dependencies}
+            resolver.globs.update(globs)
+            return data
+
+    # Step 1, 2 & 3: Get raw template string, merge config (as necessary) and parse it, resolving any !include
+    data = resolver.load(path)
+
+    dependencies = {str(dep): _file_digest(dep) for dep in resolver.dependencies[path]}
+    globs = resolver.globs_of(resolver.dependencies[path] | {path})
+    _parse_cache[key] = pickle.dumps((data, dependencies, globs))
+    while len(_parse_cache) > PARSE_CACHE_MAX_ENTRIES:
+        _parse_cache.pop(next(iter(_parse_cache)))
+    try:
+        atomic_write(cache_file, _parse_cache[key])
+    except OSError:
+        log.debug(f"# Could not write parse cache {cache_file}")
+    _prune_cache(cache_file.parent, "*.pickle", PARSE_CACHE_MAX_FILES)
+    return data
+
+
+def _walk(directory: str, suffixes: tuple[str, ...]) -> list[str]:
+    """The files with one of the suffixes under directory, skipping hidden, virtualenv and dependency directories."""
+    found = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [
+            d
+            for d in dirs
+            if not d.startswith(".") and d not in SKIPPED_DIRS and not pathlib.Path(root, d, "pyvenv.cfg").exists()
+        ]
+        found.extend(str(pathlib.Path(root, f)) for f in files if pathlib.PurePath(f).suffix.lower() in suffixes)
+    return sorted(found)
+
+
+def expand_pathspec(pathspec: str | list[str], suffixes: tuple[str, ...] = CONFIG_SUFFIXES) -> list[str]:
+    """Expand files, directories (recursively) and glob patterns into config files, keeping the order given.
+
+    Directories contribute the files with one of the given suffixes, outside hidden directories, virtualenvs and
+    node_modules.
+    """
+    files: list[str] = []
+    for spec in [pathspec] if isinstance(pathspec, str) else pathspec:
+        if glob.has_magic(spec):
+            matches = sorted(glob.glob(spec, recursive=True))  # noqa: PTH207
+        elif pathlib.Path(spec).is_dir():
+            matches = _walk(spec, suffixes)
+        else:
+            matches = [spec]
+        if not matches:
+            raise FileNotFoundError(f"No files match {spec}")
+        files.extend(matches)
+    return list(dict.fromkeys(files))
+
+
+def deep_merge(base: Any, override: Any, list_strategy: str = "append") -> Any:
+    """Recursively merge override into base without mutating either.
+
+    Mappings merge key by key, lists combine according to list_strategy and any other value in override wins.
+    """
+    if isinstance(base, dict) and isinstance(override, dict):
+        merged = dict(base)
+        for key, value in override.items():
+            merged[key] = deep_merge(base[key], value, list_strategy) if key in base else value
+        return merged
+
+    if isinstance(base, list) and isinstance(override, list):
+        if list_strategy == "append":
+            return base + override
+        elif list_strategy == "prepend":
+            return override + base
+        elif list_strategy == "unique":
+            return base + [item for item in override if item not in base]
+        elif list_strategy == "replace":
+            return override
+        raise ValueError(f"Unknown list strategy {list_strategy}. Expected one of {LIST_STRATEGIES}")
+
+    return override
+
+
+def load_configs(
+    pathspec: str | list[str],
+    environment_variables: dict[str, str] | None = None,
+    list_strategy: str = "append",
+    resolver: IncludeResolver | None = None,
+) -> Any:
+    """Load every config file matched by pathspec and deep-merge them in order.
+
+    The files share one IncludeResolver so fragments included from several of them are parsed only once.
+    """
+    files = expand_pathspec(pathspec)
+    resolver = resolver or IncludeResolver(environment_variables)
+    merged = load_config(files[0], environment_variables, resolver)
+    for filename in files[1:]:
+        merged = deep_merge(merged, load_config(filename, environment_variables, resolver), list_strategy)
+    return merged
+
+
+@contextlib.contextmanager
+def atomic_open(filename: str | pathlib.Path, mode: str = "w") -> Iterator[IO]:
+    """Open a buffered sibling temporary file that is renamed over filename only if the block succeeds.
+
+    Readers never see partial output and a failed render leaves any previous output untouched. When the new content
+    is byte-for-byte identical to the existing file, the existing file (and its mtime) is kept.
+    """
+    path = pathlib.Path(filename)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        mode, dir=path.parent, prefix=f".{path.name}.", delete=False, buffering=STREAM_BUFFER_SIZE
+    ) as tmp:
+        try:
+            yield tmp
+        except BaseException:
+            tmp.close()
+            pathlib.Path(tmp.name).unlink()
+            raise
+    if path.is_file() and filecmp.cmp(tmp.name, path, shallow=False):
+        pathlib.Path(tmp.name).unlink()
+        return
+    # NamedTemporaryFile is created 0600, keep the permissions a plain open() would have given the output
+    pathlib.Path(tmp.name).chmod(path.stat().st_mode if path.exists() else 0o666 & ~_umask())
+    pathlib.Path(tmp.name).replace(path)
+
+
+def _umask() -> int:
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+def _stat_signature(paths: set[pathlib.Path]) -> tuple:
+    signature = []
+    for path in sorted(paths):
+        try:
+            stat = path.stat()
+            signature.append((str(path), stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((str(path), None, None))
+    return tuple(signature)
+
+
+def load_configs_memoised(
+    pathspec: str | list[str], environment_variables: dict[str, str] | None = None, list_strategy: str = "append"
+) -> tuple[Any, set[pathlib.Path]]:
+    """load_configs memoised for the life of the process and revalidated by the mtime and size of every input.
+
+    A long running process (the --serve daemon) then only stats the inputs of an unchanged config (and re-expands its
+    glob !includes), instead of hashing and unpickling it on every request. Returns the merged config and every file it was built from.
+    """
+    files = [pathlib.Path(f).resolve() for f in expand_pathspec(pathspec)]
+    key = (tuple(files), json.dumps(environment_variables, sort_keys=True), list_strategy)
+    if key in _configs_memo:
+        signature, globs, conf, dependencies = _configs_memo.pop(key)
+        if _stat_signature(dependencies) == signature and globs_unchanged(globs):
+            _configs_memo[key] = (signature, globs, conf, dependencies)  # Re-insert as most recently used
+            return conf, dependencies
+
+    resolver = IncludeResolver(environment_variables)
+    conf = load_configs([str(f) for f in files], environment_variables, list_strategy, resolver)
+    dependencies = set(files).union(*(resolver.dependencies.get(f, set()) for f in files))
+    _configs_memo[key] = (_stat_signature(dependencies), resolver.globs_of(dependencies), conf, dependencies)
+    while len(_configs_memo) > 128:
+        _configs_memo.pop(next(iter(_configs_memo)))
+    return conf, dependencies
+
+
+class BuildManifest:
+    """Hashes of the inputs behind each rendered output, so outputs with unchanged inputs can be skipped.
+
+    An output is fresh when the render parameters match, every input recorded on its last render still has the same
+    content, and the output itself has not been touched since.
+    """
+
+    def __init__(self, filename: str | pathlib.Path, data: dict[str, DataSource] | None = None):
+        self.path = pathlib.Path(filename)
+        self.data = {name: str(source.path.resolve()) for name, source in (data or {}).items()}
+        self.outputs: dict[str, dict[str, Any]] = {}
+        if self.path.is_file():
+            self.outputs = json.loads(self.path.read_text()).get("outputs", {})
+        self.skipped = 0
+        self._pending: dict[str, str] = {}  # Render keys of outputs checked but not yet recorded
+
+    def render_key(self, template: str, config_files: list[str], env: dict[str, str] | None, list_strategy: str) -> str:
+        """Hash of everything about a render that is not the content of an input file."""
+        parameters = [str(pathlib.Path(template).resolve()), config_files, env or {}, list_strategy, self.data]
+        digest = hashlib.sha256(json.dumps(parameters, sort_keys=True).encode())
+        digest.update(_script_digest().encode())
+        return digest.hexdigest()
+
+    def is_fresh(self, output: str, render_key: str) -> bool:
+        path = str(pathlib.Path(output).resolve())
+        self._pending[path] = render_key
+        record = self.outputs.get(path)
+        if not record or record["key"] != render_key:
+            return False
+        try:
+            stat = pathlib.Path(output).stat()
+            if [stat.st_size, stat.st_mtime_ns] != record["output"]:
+                return False
+            is_fresh = all(_file_digest(path) == digest for path, digest in record["inputs"].items())
+        except OSError:
+            return False
+        self.skipped += is_fresh
+        return is_fresh
+
+    def stale_pairs(
+        self,
+        pairs: list[tuple[str, str]],
+        config: list[str],
+        env: dict[str, str] | None,
+        list_strategy: str,
+        results: dict[str, str | None],
+    ) -> list[tuple[str, str]]:
+        """Return the (template, output) pairs that need rendering, marking the fresh ones as succeeded in results."""
+        config_files = [str(f) for f in expand_pathspec(config)]
+        stale = []
+        for template, output in pairs:
+            key = self.render_key(template, config_files, env, list_strategy)
+            if self.is_fresh(output, key):
+                results[output] = None
+            else:
+                stale.append((template, output))
+        return stale
+
+    def record(self, output: str, inputs: set[pathlib.Path]) -> None:
+        """Record a successful render of output, keyed by the render parameters last checked by is_fresh."""
+        stat = pathlib.Path(output).stat()
+        path = str(pathlib.Path(output).resolve())
+        self.outputs[path] = {
+            "key": self._pending.pop(path),
+            "inputs": {str(path): _file_digest(path) for path in sorted(inputs)},
+            "output": [stat.st_size, stat.st_mtime_ns],
+        }
+
+    def record_all(self, pairs: list[tuple[str, str]], config_inputs: dict[str, set[pathlib.Path]]) -> None:
+        """Record a batch of successful renders, resolving the dependencies of each template only once."""
+        template_inputs: dict[str, set[pathlib.Path]] = {}
+        for template, output in pairs:
+            if template not in template_inputs:
+                template_inputs[template] = template_dependencies(template)
+            self.record(output, template_inputs[template] | config_inputs[output])
+
+    def save(self) -> None:
+        atomic_write(self.path, json.dumps({"outputs": self.outputs}, indent=2, sort_keys=True))
+
+
+def atomic_write(filename: str | pathlib.Path, content: str | bytes) -> None:
+    """Write content to a sibling temporary file and rename it into place so readers never see partial output."""
+    with atomic_open(filename, "wb" if isinstance(content, bytes) else "w") as f:
+        f.write(content)
+
+
+def render_to(template_filename: str, config: dict[str, Any] | None, output: str = "stdout") -> None:
+    """Stream a render to stdout (with a trailing newline like print) or atomically into the output file."""
+    if output == "stdout":
+        stream_template(template_filename, config, sys.stdout)
+        sys.stdout.write("\n")
+        sys.stdout.flush()
+    else:
+        with atomic_open(output) as out:
+            stream_template(template_filename, config, out)
+
+
+@dataclass
+class ProfileEntry:
+    """Render statistics of one template, include, block or macro."""
+
+    kind: str
+    name: str
+    calls: int = 0
+    seconds: float = 0.0
+    chars: int = 0
+    largest: int = 0
+
+
+class RenderProfiler:
+    """Instrument the shared Environment for the duration of a with block and collect ProfileEntry statistics.
+
+    Templates are instrumented as they are loaded through a Template subclass wrapping their root and block render
+    functions, and macros through jinja2.runtime.Macro. Render functions are generators, so only the time spent
+    producing each chunk is counted, not the time the consumer spends writing it out.
+    """
+
+    def __init__(self) -> None:
+        self.entries: dict[tuple[str, str], ProfileEntry] = {}
+        self._rendering = 0  # Template renders in progress, non-zero while inside a render
+
+    def __enter__(self) -> "RenderProfiler":
+        env = get_environment()
+        profiler = self
+        self._template_class, self._invoke = env.template_class, jinja2.runtime.Macro._invoke
+
+        class ProfiledTemplate(env.template_class):  # type: ignore[name-defined,misc]
+            @classmethod
+            def _from_namespace(cls, environment, namespace, globals):
+                t = super()._from_namespace(environment, namespace, globals)
+                name = profiler._display_name(t.filename or t.name)
+                t.root_render_func = profiler._wrap_template(name, t.root_render_func)
+                t.blocks = {b: profiler._wrap("block", f"{name}:{b}", func) for b, func in t.blocks.items()}
+                return t
+
+        def invoke(macro, arguments, autoescape):
+            entry = self._entry("macro", macro.name)
+            start = time.perf_counter()
+            rv = self._invoke(macro, arguments, autoescape)
+            self._record(entry, time.perf_counter() - start, len(rv))
+            return rv
+
+        env.template_class = ProfiledTemplate
+        jinja2.runtime.Macro._invoke = invoke  # type: ignore[method-assign]
+        env.cache.clear()  # Reload (from the bytecode cache) so every template is instrumented
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        env = get_environment()
+        env.template_class = self._template_class
+        jinja2.runtime.Macro._invoke = self._invoke  # type: ignore[method-assign]
+        env.cache.clear()
+
+    @staticmethod
+    def _display_name(filename: str | None) -> str:
+        path = pathlib.Path(filename or "<string>")
+        return str(path.relative_to(pathlib.Path.cwd())) if path.is_relative_to(pathlib.Path.cwd()) else str(path)
+
+    def _entry(self, kind: str, name: str) -> ProfileEntry:
+        return self.entries.setdefault((kind, name), ProfileEntry(kind, name))
+
+    @staticmethod
+    def _record(entry: ProfileEntry, seconds: float, chars: int) -> None:
+        entry.calls += 1
+        entry.seconds += seconds
+        entry.chars += chars
+        entry.largest = max(entry.largest, chars)
+
+    def _wrap_template(self, name: str, render_func):
+        def root(context, *args, **kwargs):
+            # A template started while another one is producing output is an include, import or parent template.
+            kind = "include" if self._rendering else "template"
+            self._rendering += 1
+            try:
+                yield from self._wrap(kind, name, render_func)(context, *args, **kwargs)
+            finally:
+                self._rendering -= 1
+
+        return root
+
+    def _wrap(self, kind: str, name: str, render_func):
+        def render(*args, **kwargs) -> Iterator[str]:
+            entry = self._entry(kind, name)
+            seconds, chars = 0.0, 0
+            chunks = render_func(*args, **kwargs)
+            try:
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        chunk = next(chunks)
+                    except StopIteration:
+                        return
+                    finally:
+                        seconds += time.perf_counter() - start
+                    chars += len(chunk)
+                    yield chunk
+            finally:
+                self._record(entry, seconds, chars)
+
+        return render
+
+    def report(self, json_filename: str | None = None, top: int = 10) -> None:
+        """Log the entries sorted by time and the largest fragments, and write them all to json_filename."""
+        entries = sorted(self.entries.values(), key=lambda e: e.seconds, reverse=True)
+        width = max([len(e.name) for e in entries] + [4])
+        log.info(f"{'kind':<8} {'name':<{width}} {'calls':>7} {'total ms':>10} {'mean ms':>9} {'chars':>12}")
+        for e in entries:
+            mean = e.seconds / e.calls * 1000 if e.calls else 0.0
+            log.info(f"{e.kind:<8} {e.name:<{width}} {e.calls:>7} {e.seconds * 1000:>10.2f} {mean:>9.3f} {e.chars:>12}")
+        log.info(f"# Largest fragments (top {top})")
+        for e in sorted(entries, key=lambda e: e.largest, reverse=True)[:top]:
+            log.info(f"{e.kind:<8} {e.name:<{width}} {e.largest:>12} chars")
+        if json_filename:
+            atomic_write(json_filename, json.dumps([asdict(e) for e in entries], indent=2))
+            log.info(f"# Profile written to {json_filename}")
+
+
+@dataclass(frozen=True)
+class BatchItem:
+    """One template x config -> output render in a batch."""
+
+    template: str
+    config: tuple[str, ...]
+    output: str
+    env: tuple[tuple[str, str], ...] = field(default=())
+
+
+def expand_batch_manifest(manifest_filename: str, cli_env: dict[str, str] | None = None) -> list[BatchItem]:
+    """Expand a batch manifest, including glob templates, into concrete render items."""
+    manifest = load_config(manifest_filename)
+    defaults, entries = (
+        ({}, manifest) if isinstance(manifest, list) else (manifest.get("defaults", {}), manifest["items"])
+    )
+
+    items = []
+    for entry in entries:
+        entry = {**defaults, **entry}
+        env = tuple(sorted({**(cli_env or {}), **entry.get("env", {})}.items()))
+        pattern = entry["template"]
+        templates = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]  # noqa: PTH207
+        for template in templates:
+            path = pathlib.Path(template)
+            output = entry["output"].format(stem=path.stem, name=path.name, parent=path.parent)
+            config = (entry["config"],) if isinstance(entry["config"], str) else tuple(entry["config"])
+            items.append(BatchItem(template, config, output, env))
+    return items
+
+
+def _render_group(conf: Any, pairs: list[tuple[str, str]]) -> list[tuple[str, str | None]]:
+    """Worker: render every (template, output) pair against one parsed config."""
+    results = []
+    for template, output in pairs:
+        try:
+            render_to(template, conf, output)
+            results.append((output, None))
+        except Exception as e:
+            results.append((output, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def render_batch(
+    items: list[BatchItem],
+    workers: int | None = None,
+    list_strategy: str = "append",
+    manifest: BuildManifest | None = None,
+    data: dict[str, DataSource] | None = None,
+) -> dict[str, str | None]:
+    """Render a batch, parsing each config once and rendering across a process pool.
+
+    Returns a mapping of output filename to an error message, or None when the item succeeded (or was skipped as
+    unchanged according to the manifest).
+    """
+    # Parse every distinct (config, env) once up front and group the renders that share it.
+    groups: dict[tuple[tuple[str, ...], tuple], list[tuple[str, str]]] = {}
+    for item in items:
+        groups.setdefault((item.config, item.env), []).append((item.template, item.output))
+
+    results: dict[str, str | None] = {}
+    tasks = []
+    rendered: dict[str, set[pathlib.Path]] = {}  # output -> the config files it was rendered from
+    workers = max(1, workers or 1)
+    for (config, env), pairs in groups.items():
+        try:
+            conf, config_inputs = load_configs_memoised(list(config), dict(env) or None, list_strategy)
+            conf = with_data(conf, data, config)
+        except Exception as e:
+            results.update({output: f"{', '.join(config)}: {type(e).__name__}: {e}" for _, output in pairs})
+            continue
+        if manifest and not (pairs := manifest.stale_pairs(pairs, list(config), dict(env), list_strategy, results)):
+            continue
+        rendered.update({output: config_inputs | _data_dependencies(data) for _, output in pairs})
+        # Chunk each group so the config is pickled at most once per worker.
+        chunk = -(-len(pairs) // workers)
+        tasks.extend((conf, pairs[i : i + chunk]) for i in range(0, len(pairs), chunk))
+
+    if workers == 1 or len(tasks) == 1:
+        for conf, pairs in tasks:
+            results.update(_render_group(conf, pairs))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_render_group, conf, pairs): pairs for conf, pairs in tasks}
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    results.update(future.result())
+                except Exception as e:  # e.g. a worker process died or the config could not be pickled
+                    results.update({output: f"{type(e).__name__}: {e}" for _, output in futures[future]})
+
+    if manifest:
+        succeeded = [(t, o) for _, pairs in tasks for t, o in pairs if results.get(o) is None]
+        manifest.record_all(succeeded, rendered)
+    return results
+
+
+def template_dependencies(template_filename: str) -> set[pathlib.Path]:
+    """Return the template file and every template it statically includes, imports or extends, recursively."""
+    env = get_environment()
+    pending = [str(pathlib.Path(template_filename).resolve())]
+    found: set[pathlib.Path] = set()
+    while pending:
+        name = pending.pop()
+        try:
+            source, filename, _ = env.loader.get_source(env, name)  # type: ignore[union-attr]
+        except jinja2.TemplateNotFound:
+            continue
+        path = pathlib.Path(filename).resolve()
+        if path not in found:
+            found.add(path)
+            # Dynamic names like {% include some_var %} are reported as None and cannot be tracked
+            pending.extend(ref for ref in jinja2.meta.find_referenced_templates(env.parse(source)) if ref)
+    return found
+
+
+def _lint_source(source: str, filename: str) -> list[tuple[int, str, str]]:
+    """Return (line, variable, problem) for each undeclared variable or syntax error, variable empty for the latter."""
+    env = get_environment()
+    try:
+        ast = env.parse(source, filename=filename)
+    except jinja2.TemplateSyntaxError as e:
+        return [(e.lineno, "", f"syntax error: {e.message}")]
+    undeclared = jinja2.meta.find_undeclared_variables(ast) - set(env.globals)
+    first_use: dict[str, int] = {}
+    for node in ast.find_all(jinja2.nodes.Name):
+        if node.ctx == "load" and node.name in undeclared:
+            first_use.setdefault(node.name, node.lineno)
+    return [(line, name, f"undeclared variable '{name}'") for name, line in first_use.items()]
+
+
+def _lint_templates(filenames: list[str]) -> list[tuple[str, int, str, str]]:
+    """Worker: lint each template, reusing the result cached under CACHE_DIR for content it has seen before."""
+    problems = []
+    for filename in filenames:
+        try:
+            source = pathlib.Path(filename).read_bytes()
+            content = source.decode()
+        except (OSError, UnicodeDecodeError) as e:
+            problems.append((filename, 0, "", f"{type(e).__name__}: {e}"))
+            continue
+        # A new injinja may lint differently, as may a new Jinja2
+        key = hashlib.sha256(f"{jinja2.__version__}|{_script_digest()}|".encode() + source).hexdigest()
+        cache_file = CACHE_DIR / "lint" / f"{key}.json"
+        try:
+            found = [tuple(problem) for problem in json.loads(cache_file.read_text())]
+            with contextlib.suppress(OSError):
+                os.utime(cache_file)  # Pruning removes the least recently used results first
+        except (OSError, ValueError):
+            found = _lint_source(content, filename)
+            with contextlib.suppress(OSError):
+                cache_file.parent.mkdir(parents=True, exist_ok=True)
+                atomic_write(cache_file, json.dumps(found))
+        problems.extend((filename, *problem) for problem in found)
+    return problems  # type: ignore[return-value]
+
+
+def lint(pathspec: str | list[str], provided: set[str] | None = None, workers: int | None = None) -> list[str]:
+    """Statically check every template in pathspec for variables that neither it nor provided defines.
+
+    Without provided every undeclared variable is reported. Returns `file:line: problem` sorted by file and line.
+    """
+    templates = expand_pathspec(pathspec, TEMPLATE_SUFFIXES)
+    workers = max(1, min(workers or 1, len(templates)))
+    # About four chunks per worker, so a directory of a few huge templates does not leave the other workers idle.
+    chunk = max(1, min(64, -(-len(templates) // (workers * 4))))
+    chunks = [templates[i : i + chunk] for i in range(0, len(templates), chunk)]
+    if workers == 1:
+        results = list(map(_lint_templates, chunks))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_lint_templates, chunks))
+    _prune_cache(CACHE_DIR / "lint", "*.json", LINT_CACHE_MAX_FILES)
+    problems = sorted(
+        (filename, line, problem)
+        for chunk_problems in results
+        for filename, line, variable, problem in chunk_problems
+        if not (provided is not None and variable in provided)
+    )
+    log.info(f"# Linted {len(templates)} templates, {len(problems)} problems")
+    return [f"{filename}:{line}: {problem}" for filename, line, problem in problems]
+
+
+def _lint_main(args: dict[str, Any], env: dict[str, str] | None, data: dict[str, DataSource]) -> int:
+    """--lint: report the gaps between the templates and the names the config and data sources provide."""
+    provided = set(data) if args["config"] or data else None
+    if args["config"]:
+        conf, _ = load_configs_memoised(args["config"], env, args["merge_lists"])
+        provided |= set(conf) if isinstance(conf, dict) else set()  # type: ignore[operator]
+    problems = lint(args["lint"], provided, args["workers"])
+    for problem in problems:
+        log.error(problem)
+    return 1 if problems else 0
+
+
+class FileWatcher:
+    """Report sets of changed files, using inotify via watchdog when installed and mtime polling otherwise.
+
+    Bursts of events (editors often write, rename and chmod in one save) are debounced into a single change set.
+    """
+
+    def __init__(self, interval: float = 0.5, debounce: float = 0.2):
+        self.interval = interval
+        self.debounce = debounce
+        self.paths: set[pathlib.Path] = set()
+        self.globs: dict[pathlib.Path, dict[str, list[str]]] = {}
+        self._events: queue.Queue[pathlib.Path] = queue.Queue()
+        self._watched_dirs: set[pathlib.Path] = set()
+        self._mtimes: dict[pathlib.Path, int | None] = {}
+        try:
+            # Third Party
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            self._observer = None
+            log.debug("# watchdog is not installed, polling for changes")
+            return
+
+        events = self._events
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                # Ignore opened/closed_no_write events, which our own reads of the inputs generate
+                if event.event_type not in ("created", "modified", "moved", "deleted", "closed"):
+                    return
+                for attr in ("src_path", "dest_path"):
+                    if getattr(event, attr, None):
+                        events.put(pathlib.Path(os.fsdecode(getattr(event, attr))).resolve())
+
+        self._handler = _Handler()
+        self._observer = Observer()
+        self._observer.start()
+
+    def watch(self, paths: set[pathlib.Path], globs: dict[pathlib.Path, dict[str, list[str]]] | None = None) -> None:
+        """Replace the set of watched files, and the glob !includes (and their matches) of the configs among them."""
+        self.paths = set(paths)
+        self.globs = {owner: dict(patterns) for owner, patterns in (globs or {}).items()}
+        if self._observer is None:
+            self._mtimes = {path: self._mtime(path) for path in self.paths}
+            return
+        for directory in {path.parent for path in self.paths} - self._watched_dirs:
+            if directory.is_dir():
+                self._observer.schedule(self._handler, str(directory), recursive=False)
+                self._watched_dirs.add(directory)
+
+    def changes(self) -> Iterator[set[pathlib.Path]]:
+        """Yield each debounced set of watched files that changed."""
+        while True:
+            changed = self._wait_for_events() | self._changed_globs() if self._observer else self._poll()
+            if changed := changed & self.paths:
+                yield changed
+
+    def stop(self) -> None:
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+
+    def _wait_for_events(self) -> set[pathlib.Path]:
+        changed = {self._events.get()}
+        while True:
+            try:
+                changed.add(self._events.get(timeout=self.debounce))
+            except queue.Empty:
+                return changed
+
+    def _changed_globs(self) -> set[pathlib.Path]:
+        """The configs whose glob !includes now match other files, each reported once."""
+        changed = set()
+        for owner, patterns in self.globs.items():
+            for pattern, matches in patterns.items():
+                latest = sorted(glob.glob(pattern, recursive=True))  # noqa: PTH207
+                if latest != matches:
+                    patterns[pattern] = latest
+                    changed.add(owner)
+        return changed
+
+    @staticmethod
+    def _mtime(path: pathlib.Path) -> int | None:
+        try:
+            return path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _poll(self) -> set[pathlib.Path]:
+        changed: set[pathlib.Path] = set()
+        while True:
+            time.sleep(self.debounce if changed else self.interval)
+            latest = {path: self._mtime(path) for path in self.paths}
+            newly_changed = {path for path, mtime in latest.items() if self._mtimes.get(path) != mtime}
+            newly_changed |= self._changed_globs()
+            self._mtimes = latest
+            if changed and not newly_changed:
+                return changed
+            changed |= newly_changed
+
+
+def watch(
+    items: list[BatchItem],
+    list_strategy: str = "append",
+    watcher: FileWatcher | None = None,
+    data: dict[str, DataSource] | None = None,
+) -> None:
+    """Render every item, then re-render only the items affected by each change to one of their input files.
+
+    The warm Environment and the parsed configs of unaffected items are reused between renders.
+    """
+    watcher = watcher or FileWatcher()
+    configs: dict[tuple, tuple[Any, set[pathlib.Path]]] = {}
+    dependencies: dict[BatchItem, set[pathlib.Path]] = {}
+    globs: dict[pathlib.Path, dict[str, list[str]]] = {}
+
+    def render(item: BatchItem) -> None:
+        dependencies[item] = {pathlib.Path(item.template).resolve()} | template_dependencies(item.template)
+        dependencies[item] |= _data_dependencies(data)
+        try:
+            group = (item.config, item.env)
+            if group not in configs:
+                files = [pathlib.Path(f).resolve() for f in expand_pathspec(list(item.config))]
+                dependencies[item] |= set(files)
+                resolver = IncludeResolver(dict(item.env) or None)
+                conf = load_configs([str(f) for f in files], dict(item.env) or None, list_strategy, resolver)
+                configs[group] = (conf, set(files).union(*(resolver.dependencies.get(f, set()) for f in files)))
+                globs.update(resolver.globs)
+            conf, config_dependencies = configs[group]
+            dependencies[item] |= config_dependencies
+            render_to(item.template, with_data(conf, data, item.config), item.output)
+        except Exception as e:
+            log.error(f"FAILED {item.output}: {type(e).__name__}: {e}")
+            return
+        if item.output != "stdout":
+            log.info(f"# Rendered {item.output}")
+
+    for item in items:
+        render(item)
+    watcher.watch(set().union(*dependencies.values()), globs)
+    log.info(f"# Watching {len(watcher.paths)} files for changes. Press Ctrl+C to stop.")
+
+    try:
+        for changed in watcher.changes():
+            log.info(f"# Changed: {', '.join(sorted(str(p) for p in changed))}")
+            for group in [group for group, (_, deps) in configs.items() if deps & changed]:
+                del configs[group]
+            for item in [item for item, deps in dependencies.items() if deps & changed]:
+                render(item)
+            watcher.watch(set().union(*dependencies.values()), globs)
+    finally:
+        watcher.stop()
+
+
+class _ClientStream(io.TextIOBase):
+    """Text stream forwarding each write to the daemon client as a {name: text} JSON line."""
+
+    def __init__(self, wfile: IO[bytes], name: str):
+        self.wfile = wfile
+        self.name = name
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if text:
+            self.wfile.write(json.dumps({self.name: text}).encode() + b"\n")
+        return len(text)
+
+    def flush(self) -> None:
+        self.wfile.flush()
+
+
+def _handle_daemon_request(request: dict[str, Any], wfile: IO[bytes]) -> int:
+    """Run one CLI invocation inside the daemon with stdout, stderr and logs forwarded to the client."""
+    stdout, stderr = _ClientStream(wfile, "stdout"), _ClientStream(wfile, "stderr")
+    handler = logging.StreamHandler(stderr)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(handler)
+    log.propagate = False
+    cwd = pathlib.Path.cwd()
+    try:
+        os.chdir(request["cwd"])
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            args = __handle_args(cli_config, list(request["argv"]))
+            if args["watch"] or args["serve"]:
+                raise ValueError("--watch and --serve cannot be sent to the daemon")
+            return main(request["argv"])
+    except SystemExit as e:  # argparse errors and --help
+        return e.code if isinstance(e.code, int) else int(e.code is not None)
+    except Exception as e:
+        stderr.write(f"{type(e).__name__}: {e}\n")
+        return 1
+    finally:
+        os.chdir(cwd)
+        log.removeHandler(handler)
+        log.propagate = True
+        stdout.flush()
+
+
+class _DaemonRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        exit_code = _handle_daemon_request(request, self.wfile)
+        self.wfile.write(json.dumps({"exit": exit_code}).encode() + b"\n")
+
+
+def serve(socket_path: str | pathlib.Path = DAEMON_SOCKET) -> None:
+    """Serve render requests from injinja-client.py over a Unix domain socket, one at a time."""
+    path = pathlib.Path(socket_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.unlink(missing_ok=True)
+    with socketserver.UnixStreamServer(str(path), _DaemonRequestHandler) as server:
+        path.chmod(0o600)
+        log.info(f"# injinja daemon listening on {path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            log.info("# injinja daemon stopped.")
+        finally:
+            path.unlink(missing_ok=True)
+
+
 def __argparse_factory(config):
     """Josh's Opinionated Argument Parser Factory."""
     parser = argparse.ArgumentParser()
+    used_short_flags = {"-h"}
 
     # Take a dictionary of configuration. The key is the flag name, the value is a dictionary of kwargs.
     for flag, flag_kwargs in config.items():
-        # Automatically handle long and short case for flags
+        # Automatically handle long and short case for flags.
+        # The short flag is only added when its first letter is not already taken by an earlier flag.
         lowered_flag = flag.lower()
         short_flag = f"-{lowered_flag[0]}"
         long_flag = f"--{lowered_flag}"
+        flags = [long_flag] if short_flag in used_short_flags else [short_flag, long_flag]
+        used_short_flags.add(short_flag)
 
         # If the value of the config dict is a dictionary then unpack it like standard kwargs for add_argument
         # Otherwise assume the value is a simple default value like a string.
         if isinstance(flag_kwargs, dict):
-            parser.add_argument(short_flag, long_flag, **flag_kwargs)
+            parser.add_argument(*flags, **flag_kwargs)
         elif isinstance(flag_kwargs, bool):
             store_type = "store_true" if flag_kwargs else "store_false"
-            parser.add_argument(short_flag, long_flag, action=store_type)
+            parser.add_argument(*flags, action=store_type)
         else:
-            parser.add_argument(short_flag, long_flag, default=flag_kwargs)
+            parser.add_argument(*flags, default=flag_kwargs)
     return parser
 
 
 def __handle_args(config, args):
-    script_filename = pathlib.Path(__file__).name
-    log.info(script_filename)
-    if script_filename in args:
-        args.remove(script_filename)
-    return vars(__argparse_factory(config).parse_args(args))
+    parser = __argparse_factory(config)
+    parsed = vars(parser.parse_args(args))
+    if not (parsed["batch"] or parsed["serve"] or parsed["lint"]) and not (parsed["template"] and parsed["config"]):
+        parser.error("the following arguments are required: -t/--template, -c/--config")
+    return parsed
+
+
+def _watch_main(args: dict[str, Any], env: dict[str, str] | None, data: dict[str, DataSource]) -> int:
+    """--watch: render the single item or the batch, then keep re-rendering on changes until interrupted."""
+    if args["batch"]:
+        items = expand_batch_manifest(args["batch"], env)
+    else:
+        env_items = tuple(sorted((env or {}).items()))
+        items = [BatchItem(args["template"], tuple(args["config"]), args["output"], env_items)]
+    try:
+        watch(items, args["merge_lists"], data=data)
+    except KeyboardInterrupt:
+        log.info("# Stopped watching.")
+    return 0
+
+
+def _render_main(args: dict[str, Any], env: dict[str, str] | None, data: dict[str, DataSource]) -> int:
+    """Render the single template or the --batch manifest, skipping unchanged outputs with --incremental."""
+    manifest = BuildManifest(args["incremental"], data) if args["incremental"] else None
+
+    if args["batch"]:
+        items = expand_batch_manifest(args["batch"], env)
+        results = render_batch(items, args["workers"], args["merge_lists"], manifest, data)
+        failures = {output: error for output, error in results.items() if error}
+        for output, error in sorted(failures.items()):
+            log.error(f"FAILED {output}: {error}")
+        skipped = f", {manifest.skipped} unchanged" if manifest else ""
+        log.info(f"# Rendered {len(results) - len(failures)}/{len(results)} outputs{skipped}")
+        if manifest:
+            manifest.save()
+        return 1 if failures else 0
 
+    conf, config_inputs = load_configs_memoised(args["config"], env, args["merge_lists"])
+    conf, config_inputs = with_data(conf, data, args["config"]), config_inputs | _data_dependencies(data)
+    if manifest and args["output"] != "stdout":
+        pair = (args["template"], args["output"])
+        if not manifest.stale_pairs([pair], args["config"], env, args["merge_lists"], {}):
+            log.debug(f"# {args['output']} is up to date")
+            return 0
+        render_to(args["template"], conf, args["output"])
+        manifest.record(args["output"], template_dependencies(args["template"]) | config_inputs)
+        manifest.save()
+        return 0
 
-def main(args):
-    args = __handle_args(cli_config, sys.argv)
+    render_to(args["template"], conf, args["output"])
+    return 0
+
+
+def main(args) -> int:
+    args = __handle_args(cli_config, args)
     env = dict_from_keyvalue_list(args["env"])
-    conf = load_config(args["config"], env)
-    merged_template = merge_template(args["template"], conf)
+    data = data_sources_from_keyvalue_list(args["data"])
 
-    if args["output"] == "stdout":
-        print(merged_template)
-    else:
-        pathlib.Path(args["output"]).write_text(merged_template)
+    if args["serve"]:
+        serve(args["serve"])
+        return 0
+
+    if args["lint"]:
+        return _lint_main(args, env, data)
+
+    if args["watch"]:
+        return _watch_main(args, env, data)
+
+    if args["profile_render"]:
+        # Worker processes would each instrument their own copy of the Environment, so render in this process.
+        with RenderProfiler() as profiler:
+            exit_code = _render_main({**args, "workers": 1}, env, data)
+        profiler.report(args["profile_render"])
+        return exit_code
+
+    return _render_main(args, env, data)
 
 
 if __name__ == "__main__":
-    main(sys.argv)
+    sys.exit(main(sys.argv[1:]))
@@ -2,7 +2,9 @@
 # /// script
 # requires-python = ">=3.11"
 # dependencies = [
+# "PyYAML",
 # "ruamel.yaml",
+# "jsonschema",
 # ]
 # ///
 # https://docs.astral.sh/uv/guides/scripts/#creating-a-python-script
@@ -10,19 +12,52 @@
 #
 # USAGE:
 # curl -fsSL https://raw.githubusercontent.com/neozenith/python-onboarding-guide/refs/heads/main/scripts/yaml-check.py | sh -c 'python3 - path/to/yamlfile.yml'
-
 #
-import ruamel.yaml
-from pprint import pprint as pp
+# python3 yaml-check.py FILE                    # preview one file as JSON, as before
+# python3 yaml-check.py PATH [PATH ...] [--schema SCHEMA] [--workers N]
+# python3 yaml-check.py --check FILE            # validate a single file instead of previewing it
+# python3 yaml-check.py --jsonl [--items] PATH [PATH ...] > out.jsonl
+#
+# A single file with no --schema, --jsonl or --check is previewed as JSON, as it always was. Anything else is
+# validated: every YAML file given directly, found under a directory (*.yml, *.yaml) or matched by a glob, across a
+# process pool. Syntax is checked with libyaml's C loader when PyYAML was built with it; ruamel.yaml (round-trip, much
+# slower) is only used for previews. --schema checks every document against a JSON Schema (JSON or YAML) that each
+# worker compiles once. All problems are reported together as file:line:column: message, with exit code 1.
+#
+# --jsonl streams every document of every file to stdout as one compact JSON line each, parsing lazily so memory
+# stays flat however large the file is. With --items a document that is a top-level sequence is written one item per
+# line instead, so a multi-GB exported manifest never has to fit in memory either.
+#
+
+# Standard Library
+import argparse
+import concurrent.futures
+import glob
+import json
+import logging
+import os
 import sys
+from collections.abc import Iterator
 from pathlib import Path
-import logging
-import json
+from typing import IO, Any
+
+# Third Party
+import yaml
+
 log = logging.getLogger(__name__)
 
+# Validation and --jsonl only need plain Python data, so use libyaml's loader when PyYAML has it.
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+YAML_SUFFIXES = (".yml", ".yaml")
+
+_validator: Any = None  # The compiled JSON Schema validator of this worker process
+
 
 def preview_yaml(filepath: str):
     """Read and preview a YAML file."""
+    # Third Party
+    import ruamel.yaml
+
     p = Path(filepath)
     yaml = ruamel.yaml.YAML()
     yaml.preserve_quotes = True
@@ -31,12 +66,172 @@ def preview_yaml(filepath: str):
     content = yaml.load(p.read_text(encoding="utf-8"))
     log.info("Content:")
     print(json.dumps(content, indent=2))
-    
+
+
+def expand_paths(paths: list[str]) -> list[str]:
+    """Expand files, directories (recursively) and glob patterns into YAML files, keeping the order given."""
+    files: list[str] = []
+    for spec in paths:
+        if glob.has_magic(spec):
+            matches = sorted(glob.glob(spec, recursive=True))  # noqa: PTH207
+        elif Path(spec).is_dir():
+            matches = sorted(str(p) for p in Path(spec).rglob("*") if p.suffix.lower() in YAML_SUFFIXES)
+        else:
+            matches = [spec]
+        if not matches:
+            raise FileNotFoundError(f"No files match {spec}")
+        files.extend(matches)
+    return list(dict.fromkeys(files))
+
+
+def load_schema(filepath: str) -> dict[str, Any]:
+    """Load a JSON Schema from a JSON or YAML file and check that it is itself a valid schema."""
+    # Third Party
+    import jsonschema
+
+    text = Path(filepath).read_text(encoding="utf-8")
+    schema = json.loads(text) if filepath.lower().endswith(".json") else yaml.load(text, Loader=YAML_LOADER)  # noqa: S506 - always a safe loader
+    jsonschema.validators.validator_for(schema).check_schema(schema)
+    return schema
+
+
+def _init_worker(schema: dict[str, Any] | None) -> None:
+    """Compile the schema once per worker instead of once per file."""
+    global _validator
+    if schema is not None:
+        # Third Party
+        import jsonschema
+
+        _validator = jsonschema.validators.validator_for(schema)(schema)
+
+
+def _node_at(node: yaml.Node, path: list) -> yaml.Node:
+    """The deepest node along a JSON Schema error path, to report the line the offending value starts on."""
+    for key in path:
+        if isinstance(node, yaml.MappingNode):
+            node = next((value for k, value in node.value if k.value == str(key)), node)
+        elif isinstance(node, yaml.SequenceNode) and isinstance(key, int) and key < len(node.value):
+            node = node.value[key]
+    return node
+
+
+def check_file(filepath: str) -> list[str]:
+    """Return a file:line:column: message for every syntax error or schema violation in a YAML file."""
+    try:
+        text = Path(filepath).read_text(encoding="utf-8")
+        documents = list(yaml.load_all(text, Loader=YAML_LOADER))  # noqa: S506 - always a safe loader
+    except yaml.MarkedYAMLError as e:
+        mark = e.problem_mark or e.context_mark
+        line, column = (mark.line + 1, mark.column + 1) if mark else (0, 0)
+        return [f"{filepath}:{line}:{column}: {e.problem or e.context}"]
+    except (OSError, UnicodeDecodeError, yaml.YAMLError) as e:
+        return [f"{filepath}:0:0: {type(e).__name__}: {e}"]
+
+    if _validator is None:
+        return []
+    errors = []
+    nodes: list[yaml.Node] = []
+    for index, document in enumerate(documents):
+        for error in _validator.iter_errors(document):
+            # Line numbers only exist on the node graph, so compose (not construct) the file again, only on failure.
+            nodes = nodes or list(yaml.compose_all(text, Loader=YAML_LOADER))  # noqa: S506 - always a safe loader
+            mark = _node_at(nodes[index], list(error.absolute_path)).start_mark
+            line, column = mark.line + 1, mark.column + 1
+            location = "/".join(str(p) for p in error.absolute_path) or "<root>"
+            errors.append(f"{filepath}:{line}:{column}: {location}: {error.message}")
+    return errors
+
+
+def _check_files(filepaths: list[str]) -> list[str]:
+    return [error for filepath in filepaths for error in check_file(filepath)]
+
+
+def check_files(filepaths: list[str], schema: dict[str, Any] | None = None, workers: int | None = None) -> list[str]:
+    """Check every file across a process pool and return all the errors, in the order of filepaths."""
+    workers = max(1, min(workers or 1, len(filepaths)))
+    if workers == 1:
+        _init_worker(schema)
+        return _check_files(filepaths)
+
+    # Up to 64 files per task: far fewer round trips to the pool than one task per file.
+    chunk = max(1, min(64, -(-len(filepaths) // (workers * 4))))
+    chunks = [filepaths[i : i + chunk] for i in range(0, len(filepaths), chunk)]
+    with concurrent.futures.ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(schema,)) as pool:
+        return [error for errors in pool.map(_check_files, chunks) for error in errors]
+
+
+class _StreamingLoader(YAML_LOADER, yaml.composer.Composer):  # type: ignore[valid-type,misc]
+    """The (C when available) safe loader plus the pure-Python composer's compose_node, to compose one node at a time.
+
+    CParser only exposes whole documents, but its get_event/check_event are all compose_node needs.
+    """
+
+    def __init__(self, stream: IO[bytes]):
+        super().__init__(stream)
+        self.anchors: dict[str, yaml.Node] = {}
+
+
+def iter_documents(stream: IO[bytes], items: bool = False) -> Iterator[Any]:
+    """Lazily yield each document of a YAML stream, or each item of a document that is a top-level sequence."""
+    loader = _StreamingLoader(stream)
+    try:
+        loader.get_event()  # StreamStartEvent
+        while not loader.check_event(yaml.StreamEndEvent):
+            loader.get_event()  # DocumentStartEvent
+            loader.anchors = {}
+            if items and loader.check_event(yaml.SequenceStartEvent):
+                loader.get_event()
+                while not loader.check_event(yaml.SequenceEndEvent):
+                    yield loader.construct_document(loader.compose_node(None, None))
+                loader.get_event()
+            else:
+                yield loader.construct_document(loader.compose_node(None, None))
+            loader.get_event()  # DocumentEndEvent
+    finally:
+        loader.dispose()
+
+
+def write_jsonl(filepaths: list[str], out: IO[str], items: bool = False) -> int:
+    """Stream every document (or top-level sequence item) of each file to out as compact JSON lines."""
+    count = 0
+    for filepath in filepaths:
+        with Path(filepath).open("rb") as stream:
+            for document in iter_documents(stream, items):
+                # default=str covers the timestamps and dates YAML can produce but JSON has no type for.
+                out.write(json.dumps(document, separators=(",", ":"), default=str) + "\n")
+                count += 1
+    return count
+
+
+def cli(argv: list[str]):
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description="Validate and preview YAML files.")
+    parser.add_argument("paths", nargs="+", help="YAML files, directories or glob patterns.")
+    parser.add_argument("-p", "--preview", action="store_true", help="Print each file as JSON (round-trip loader).")
+    parser.add_argument("-c", "--check", action="store_true", help="Validate a single file instead of previewing it.")
+    parser.add_argument("-j", "--jsonl", action="store_true", help="Stream every document to stdout as JSON Lines.")
+    parser.add_argument("-i", "--items", action="store_true", help="With --jsonl, one line per top-level list item.")
+    parser.add_argument("-s", "--schema", help="JSON Schema (JSON or YAML file) every document must satisfy.")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="Number of worker processes.")
+    args = parser.parse_args(argv)
+
+    files = expand_paths(args.paths)
+    single_file = len(args.paths) == 1 and Path(args.paths[0]).is_file()
+    if args.preview or (single_file and not (args.check or args.schema or args.jsonl)):
+        for filepath in files:
+            preview_yaml(filepath)
+        return
+    if args.jsonl:
+        count = write_jsonl(files, sys.stdout, args.items)
+        log.debug(f"# Wrote {count} JSON lines")
+        return
+
+    errors = check_files(files, load_schema(args.schema) if args.schema else None, args.workers)
+    for error in errors:
+        print(error)
+    log.info(f"# Checked {len(files)} files, {len(errors)} errors")
+    sys.exit(1 if errors else 0)
+
 
 if __name__ == "__main__":
-    logging.basicConfig(level=logging.INFO)
-    if len(sys.argv) != 2:
-        print("Usage: preview_yaml.py <path_to_yaml>")
-        sys.exit(1)
-    
-    preview_yaml(sys.argv[1])
+    cli(sys.argv[1:])
@@ -0,0 +1,119 @@
+# Unified entry point for the standalone scripts in this repo.
+#
+# The scripts stay standalone so they can still be run with `curl ... | python3 -` or `uv run`, this module only
+# registers them as subcommands. Building the parser imports nothing but the standard library and the chosen script
+# is only imported after the subcommand is known, so `onboard --help` never pays for jinja2, yaml, requests etc.
+#
+# The scripts are not packaged, they are loaded from the checkout, so only an editable install (`pip install -e
+# ".[scripts]"`) works unless $ONBOARD_REPO_ROOT points at a checkout. The `scripts` extra installs what the scripts
+# import. A subcommand whose script is missing, or which needs a newer Python or unset environment variables, fails
+# with a usage error naming what is missing instead of a traceback.
+
+# Standard Library
+import argparse
+import importlib.util
+import os
+import sys
+from dataclasses import dataclass
+from pathlib import Path, PurePath
+from types import ModuleType
+
+REPO_ROOT = Path(os.getenv("ONBOARD_REPO_ROOT", Path(__file__).resolve().parents[2]))
+
+
+@dataclass(frozen=True)
+class Command:
+    """A subcommand backed by a function in a standalone script."""
+
+    path: str
+    func: str
+    help: str
+    python: tuple[int, int] = (3, 10)
+    env: tuple[str, ...] = ()  # Read by the script when it is imported
+
+    @property
+    def module(self) -> str:
+        """The file's stem (hyphens and all), the name spawned pool workers import it by from its directory."""
+        return PurePath(self.path).stem
+
+
+COMMANDS: dict[str, Command] = {
+    "render": Command(
+        "scripts/injinja.py", "main", "Render a Jinja2 template from a templated config.", python=(3, 11)
+    ),
+    "exportenv": Command("scripts/exportenv.py", "cli", "Print a .env file as export statements."),
+    "yaml-check": Command("scripts/yaml-check.py", "cli", "Validate and preview YAML files.", python=(3, 11)),
+    "aws-sso": Command("scripts/aws-sso.py", "cli", "Inspect cached AWS SSO sessions.", python=(3, 11)),
+    "pyenv-latest": Command("latest_penv_versions.py", "cli", "Latest pyenv patch versions."),
+    "dbt-cicd": Command(
+        "dbt-project/.github/workflows/scripts/dbt_cicd.py",
+        "cli",
+        "Trigger and monitor a dbt Cloud job.",
+        python=(3, 12),
+        env=("DBT_CLOUD_SERVICE_TOKEN", "DBT_ACCOUNT_ID", "DBT_PROJECT_ID"),
+    ),
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the top level parser without importing any subcommand module."""
+    parser = argparse.ArgumentParser(prog="onboard", description="Run one of the python-onboarding-guide scripts.")
+    subparsers = parser.add_subparsers(dest="command", required=True, metavar="COMMAND")
+    for name, command in COMMANDS.items():
+        # Every argument after the subcommand (including --help) belongs to the script's own parser.
+        subparsers.add_parser(name, help=command.help, add_help=False)
+    return parser
+
+
+def unavailable(command: Command, repo_root: Path = REPO_ROOT) -> str | None:
+    """Why the script backing a subcommand cannot be loaded here, or None when it can."""
+    if not (repo_root / command.path).is_file():
+        return (
+            f"{command.path} not found in {repo_root}, the scripts are only available from an editable install "
+            "of the repository (pip install -e .) or with ONBOARD_REPO_ROOT set to a checkout"
+        )
+    if sys.version_info < command.python:
+        return f"requires Python >= {'.'.join(map(str, command.python))}"
+    if missing := [name for name in command.env if name not in os.environ]:
+        return f"requires the environment variables {', '.join(missing)}"
+    return None
+
+
+def load_command(command: Command, repo_root: Path = REPO_ROOT) -> ModuleType:
+    """Import the script backing a subcommand."""
+    if command.module in sys.modules:
+        return sys.modules[command.module]
+    path = repo_root / command.path
+    if not path.is_file():
+        raise FileNotFoundError(unavailable(command, repo_root))
+    # Workers of a spawned (not forked) process pool re-import the module by name to unpickle its functions, with the
+    # parent's sys.path. Appended, so the script directories never shadow an installed package.
+    if str(path.parent) not in sys.path:
+        sys.path.append(str(path.parent))
+    spec = importlib.util.spec_from_file_location(command.module, path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"Cannot load {command.path} from {repo_root}")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[command.module] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Dispatch to the chosen subcommand and return its exit code."""
+    parser = build_parser()
+    args, rest = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+    command = COMMANDS[args.command]
+    if reason := unavailable(command, REPO_ROOT):
+        parser.error(f"{args.command}: {reason}")
+    # The scripts' parsers take their prog from argv[0], so their usage reads `onboard render` and not `cli.py`.
+    prog, sys.argv[0] = sys.argv[0], f"onboard {args.command}"
+    try:
+        result = getattr(load_command(command, REPO_ROOT), command.func)(rest)
+    finally:
+        sys.argv[0] = prog
+    return result if isinstance(result, int) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+# Standard Library
+import asyncio
+import hashlib
+import http.server
+import json
+import threading
+import urllib.parse
+from datetime import UTC, datetime, timedelta
+from email.utils import format_datetime
+
+# Third Party
+import pytest
+
+# Our Libraries
+from python_onboarding_guide.cli import COMMANDS, load_command
+
+aws_sso = load_command(COMMANDS["aws-sso"])
+
+ACCOUNTS = [{"accountId": str(100 + i), "accountName": f"account-{i}"} for i in range(3)]
+
+
+class StubPortal(http.server.BaseHTTPRequestHandler):
+    """The SSO portal API, paginating one account per page and throttling the first request of every path."""
+
+    throttled: set[str]
+    requests: list[str]
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send(self, status: int, body: dict | None = None, headers: dict[str, str] | None = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(json.dumps(body or {}).encode())
+
+    def do_GET(self) -> None:  # noqa: N802 - http.server's naming
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        self.requests.append(self.path)
+        if self.headers["x-amz-sso_bearer_token"] != "token":
+            return self._send(401)
+        if url.path not in self.throttled:
+            self.throttled.add(url.path)
+            # An HTTP date, not delay-seconds, and already in the past: retry straight away
+            return self._send(429, headers={"Retry-After": format_datetime(datetime.now(UTC), usegmt=True)})
+        if url.path == "/assignment/accounts":
+            index = int(query.get("next_token", 0))
+            page = {"accountList": ACCOUNTS[index : index + 1]}
+            return self._send(200, page | ({"nextToken": str(index + 1)} if index + 1 < len(ACCOUNTS) else {}))
+        if url.path == "/assignment/roles":
+            roles = [{"accountId": query["account_id"], "roleName": name} for name in ("Admin", "ReadOnly")]
+            return self._send(200, {"roleList": roles})
+        if url.path == "/federation/credentials":
+            credentials = {
+                "accessKeyId": f"{query['account_id']}/{query['role_name']}",
+                "secretAccessKey": "secret",
+                "sessionToken": "session",
+                "expiration": int((datetime.now(UTC) + timedelta(hours=1)).timestamp() * 1000),
+            }
+            return self._send(200, {"roleCredentials": credentials})
+        return self._send(404)
+
+
+@pytest.fixture(name="portal")
+def _portal():
+    """A running stub portal: the handler class, with the requests it received and its url."""
+    handler = type("Handler", (StubPortal,), {"throttled": set(), "requests": []})
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    handler.url = f"http://127.0.0.1:{server.server_port}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield handler
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(name="portal_url")
+def _portal_url(portal):
+    return portal.url
+
+
+def test_portal_enumerates_accounts_roles_and_credentials(portal_url) -> None:
+    async def enumerate_portal():
+        portal = aws_sso.SSOPortal("token", "eu-west-1", portal_url, concurrency=4, backoff=0.01)
+        try:
+            return await portal.enumerate(with_credentials=True)
+        finally:
+            portal.close()
+
+    accounts = asyncio.run(enumerate_portal())
+
+    assert [a["accountId"] for a in accounts] == ["100", "101", "102"]
+    assert [role["roleName"] for role in accounts[0]["roles"]] == ["Admin", "ReadOnly"]
+    assert accounts[2]["roles"][1]["credentials"]["accessKeyId"] == "102/ReadOnly"
+
+
+def test_portal_raises_client_errors(portal_url) -> None:
+    async def list_accounts():
+        portal = aws_sso.SSOPortal("expired", "eu-west-1", portal_url, backoff=0.01)
+        try:
+            return await portal.list_accounts()
+        finally:
+            portal.close()
+
+    with pytest.raises(aws_sso.urllib.error.HTTPError, match="401"):
+        asyncio.run(list_accounts())
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        (None, None),
+        ("", None),
+        ("3", 3.0),
+        ("0.5", 0.5),
+        ("Wed, 21 Oct 2015 07:28:00 GMT", 0.0),
+        ("not a date", None),
+    ],
+)
+def test_retry_after_seconds(value, expected) -> None:
+    assert aws_sso.retry_after_seconds(value) == expected
+
+
+def test_retry_after_seconds_of_a_future_date() -> None:
+    value = format_datetime(datetime.now(UTC) + timedelta(seconds=30), usegmt=True)
+    assert 28 < aws_sso.retry_after_seconds(value) <= 30
+
+
+def test_cached_tokens_are_found_per_session(tmp_path, monkeypatch) -> None:
+    config, cache = tmp_path / "config", tmp_path / "sso" / "cache"
+    cache.mkdir(parents=True)
+    monkeypatch.setattr(aws_sso, "aws_config_file", config)
+    monkeypatch.setattr(aws_sso, "aws_sso_cache", cache)
+    config.write_text(
+        "[sso-session corp]\nsso_start_url = https://corp.awsapps.com/start\nsso_region = eu-west-1\n"
+        "[profile data-admin]\nsso_session = corp\n"
+        "[profile data-read]\nsso_session = corp\n"
+        "[profile legacy]\nsso_start_url = https://legacy.awsapps.com/start\nsso_region = us-east-1\n"
+        "[profile orphan]\nsso_session = missing\n"
+    )
+    expires = (datetime.now(UTC) + timedelta(hours=1)).isoformat()
+    for key in ("corp", "https://legacy.awsapps.com/start"):
+        token = {"accessToken": key, "expiresAt": expires}
+        (cache / f"{hashlib.sha1(key.encode()).hexdigest()}.json").write_text(json.dumps(token))
+
+    tokens = aws_sso.find_cached_tokens()
+
+    assert sorted(tokens) == ["corp", "legacy"]
+    assert tokens["corp"]["profiles"] == ["data-admin", "data-read"]
+    assert tokens["corp"]["region"] == "eu-west-1"
+    assert aws_sso.session_tokens("data-read") == {"corp": tokens["corp"]}
+    with pytest.raises(KeyError, match="orphan"):
+        aws_sso.session_tokens("orphan")
+
+
+@pytest.fixture(name="credentials_cache")
+def _credentials_cache(tmp_path, monkeypatch):
+    """A logged in corp session, an empty credentials cache and the background refreshes started."""
+    config, cache = tmp_path / "config", tmp_path / "sso" / "cache"
+    cache.mkdir(parents=True)
+    config.write_text("[sso-session corp]\nsso_start_url = https://corp.awsapps.com/start\nsso_region = eu-west-1\n")
+    token = {"accessToken": "token", "expiresAt": (datetime.now(UTC) + timedelta(hours=1)).isoformat()}
+    (cache / f"{hashlib.sha1(b'corp').hexdigest()}.json").write_text(json.dumps(token))
+    monkeypatch.setattr(aws_sso, "aws_config_file", config)
+    monkeypatch.setattr(aws_sso, "aws_sso_cache", cache)
+    monkeypatch.setattr(aws_sso, "CREDENTIALS_CACHE_DIR", tmp_path / "credentials")
+    monkeypatch.setattr(aws_sso, "_credentials_memo", {})
+    started: list[list[str]] = []
+    monkeypatch.setattr(aws_sso.subprocess, "Popen", lambda args, **kwargs: started.append(args))
+    return started
+
+
+def _cache_credentials(remaining: timedelta) -> dict:
+    """Write cached credentials of the corp session's Admin role in account 100, expiring after remaining."""
+    credentials = {"AccessKeyId": "cached", "Expiration": (datetime.now(UTC) + remaining).isoformat()}
+    path = aws_sso._credentials_cache_file("corp", "100", "Admin")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(credentials))
+    return credentials
+
+
+def _federation_requests(portal) -> list[str]:
+    return [path for path in portal.requests if path.startswith("/federation/credentials")]
+
+
+def test_fresh_cached_credentials_are_served_without_a_call(portal, credentials_cache) -> None:
+    cached = _cache_credentials(timedelta(hours=1))
+
+    assert aws_sso.get_credentials("corp", "100", "Admin", portal.url) == cached
+    assert portal.requests == []
+    assert credentials_cache == []
+
+
+def test_credentials_near_expiry_are_served_while_refreshed_in_the_background(portal, credentials_cache) -> None:
+    cached = _cache_credentials(timedelta(minutes=10))
+
+    assert aws_sso.get_credentials("corp", "100", "Admin", portal.url) == cached
+    assert portal.requests == []
+    [args] = credentials_cache
+    assert args[-10:] == [
+        "--credential-process",
+        "--refresh",
+        "--account-id",
+        "100",
+        "--role-name",
+        "Admin",
+        "--session",
+        "corp",
+        "--endpoint",
+        portal.url,
+    ]
+
+
+@pytest.mark.parametrize("cached", [None, timedelta(minutes=2)])
+def test_expired_credentials_are_refreshed_under_the_lock(portal, credentials_cache, monkeypatch, cached) -> None:
+    if cached:
+        _cache_credentials(cached)
+    path = aws_sso._credentials_cache_file("corp", "100", "Admin")
+    fetch = aws_sso.fetch_role_credentials
+
+    def fetch_holding_the_lock(*args):
+        with aws_sso._file_lock(path.with_suffix(".lock"), blocking=False) as locked:
+            assert not locked
+        return fetch(*args)
+
+    monkeypatch.setattr(aws_sso, "fetch_role_credentials", fetch_holding_the_lock)
+
+    credentials = aws_sso.get_credentials("corp", "100", "Admin", portal.url)
+
+    assert credentials["AccessKeyId"] == "100/Admin"
+    assert aws_sso._remaining(credentials) > timedelta(minutes=55)
+    assert len(_federation_requests(portal)) == 2  # Throttled once, then served
+    assert json.loads(path.read_text()) == credentials
+    assert path.stat().st_mode & 0o777 == 0o600
+    assert credentials_cache == []
+    # Served from memory from now on
+    assert aws_sso.get_credentials("corp", "100", "Admin", portal.url) is credentials
+    assert len(_federation_requests(portal)) == 2
+
+
+def test_refresh_rereads_credentials_another_process_refreshed(portal, credentials_cache, monkeypatch) -> None:
+    path = aws_sso._credentials_cache_file("corp", "100", "Admin")
+    expired = {"AccessKeyId": "expired", "Expiration": datetime.now(UTC).isoformat()}
+    monkeypatch.setitem(aws_sso._credentials_memo, path, expired)
+    refreshed = _cache_credentials(timedelta(hours=1))  # By another process, while this one waited for the lock
+
+    assert aws_sso.get_credentials("corp", "100", "Admin", portal.url) == refreshed
+    assert portal.requests == []
+
+
+def test_background_refresh_skips_when_a_refresh_is_in_flight(portal, credentials_cache) -> None:
+    path = aws_sso._credentials_cache_file("corp", "100", "Admin")
+
+    with aws_sso._file_lock(path.with_suffix(".lock")):
+        assert aws_sso.refresh_credentials("corp", "100", "Admin", portal.url, blocking=False) is None
+
+    assert portal.requests == []
+    assert not path.exists()
@@ -0,0 +1,125 @@
+# Standard Library
+import os
+import subprocess
+import sys
+
+# Third Party
+import pytest
+
+# Our Libraries
+from python_onboarding_guide.cli import COMMANDS, REPO_ROOT, build_parser, main, unavailable
+
+
+def test_build_parser_imports_no_subcommand_modules() -> None:
+    """Building the parser and its help must not import any script or its heavy dependencies."""
+    code = (
+        "import sys\n"
+        "from python_onboarding_guide.cli import build_parser\n"
+        "build_parser().format_help()\n"
+        "heavy = {'jinja2', 'yaml', 'ruamel', 'requests', 'injinja', 'exportenv', 'dbt_cicd'}\n"
+        "print(sorted(heavy & set(sys.modules)))\n"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "[]"
+
+
+@pytest.mark.parametrize("name", sorted(COMMANDS))
+def test_command_paths_exist(name) -> None:
+    assert (REPO_ROOT / COMMANDS[name].path).is_file()
+
+
+def test_unknown_args_are_passed_through() -> None:
+    args, rest = build_parser().parse_known_args(["render", "--help", "-t", "template.j2"])
+    assert args.command == "render"
+    assert rest == ["--help", "-t", "template.j2"]
+
+
+def test_dispatch_exportenv(tmp_path, monkeypatch, caplog) -> None:
+    (tmp_path / ".env").write_text("FOO=bar\n")
+    monkeypatch.chdir(tmp_path)
+    caplog.set_level("INFO")
+
+    assert main(["exportenv", "--unset"]) == 0
+    assert "unset FOO" in caplog.messages
+
+
+def test_missing_script_is_a_usage_error(tmp_path, monkeypatch, capsys) -> None:
+    """Installed without the checkout (not editable) the scripts are missing."""
+    monkeypatch.setattr("python_onboarding_guide.cli.REPO_ROOT", tmp_path)
+
+    with pytest.raises(SystemExit) as exc:
+        main(["aws-sso"])
+
+    assert exc.value.code == 2
+    assert "editable install" in capsys.readouterr().err
+
+
+def test_dbt_cicd_requires_its_environment(monkeypatch) -> None:
+    for name in COMMANDS["dbt-cicd"].env:
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("DBT_ACCOUNT_ID", "1")
+    monkeypatch.setattr(sys, "version_info", (3, 12, 0))
+
+    reason = unavailable(COMMANDS["dbt-cicd"])
+    assert reason == "requires the environment variables DBT_CLOUD_SERVICE_TOKEN, DBT_PROJECT_ID"
+
+
+@pytest.mark.parametrize(
+    ("name", "version", "reason"),
+    [
+        ("dbt-cicd", (3, 11, 9), "requires Python >= 3.12"),
+        ("render", (3, 10, 14), "requires Python >= 3.11"),
+        ("yaml-check", (3, 10, 14), "requires Python >= 3.11"),
+        ("aws-sso", (3, 10, 14), "requires Python >= 3.11"),
+        ("exportenv", (3, 10, 14), None),
+        ("pyenv-latest", (3, 10, 14), None),
+    ],
+)
+def test_commands_require_the_python_of_their_script(monkeypatch, name, version, reason) -> None:
+    monkeypatch.setattr(sys, "version_info", version)
+
+    assert unavailable(COMMANDS[name]) == reason
+
+
+def test_old_python_is_a_usage_error(monkeypatch, capsys) -> None:
+    monkeypatch.setattr(sys, "version_info", (3, 10, 14))
+
+    with pytest.raises(SystemExit) as exc:
+        main(["render", "--help"])
+
+    assert exc.value.code == 2
+    assert "render: requires Python >= 3.11" in capsys.readouterr().err
+
+
+def test_script_usage_names_the_subcommand(capsys) -> None:
+    with pytest.raises(SystemExit):
+        main(["pyenv-latest", "--help"])
+
+    assert capsys.readouterr().out.startswith("usage: onboard pyenv-latest ")
+
+
+@pytest.mark.parametrize(
+    ("argv", "output"),
+    [
+        (["yaml-check", "{tmp}", "--workers", "2"], "a.yml:2:1:"),
+        (["render", "--lint", "{tmp}", "--workers", "2"], "a.j2:1:"),
+    ],
+)
+def test_process_pools_work_when_spawned(tmp_path, argv, output) -> None:
+    """Spawned workers (macOS and Windows) must import the script by name to unpickle its worker functions."""
+    for name in ("a", "b"):
+        (tmp_path / f"{name}.yml").write_text("key: [unclosed\n" if name == "a" else "key: value\n")
+        (tmp_path / f"{name}.j2").write_text("{{ undeclared }}\n" if name == "a" else "{% set x = 1 %}{{ x }}\n")
+    code = (
+        "import multiprocessing, sys\n"
+        "from python_onboarding_guide.cli import main\n"
+        "if __name__ == '__main__':\n"
+        "    multiprocessing.set_start_method('spawn')\n"
+        f"    sys.exit(main({[arg.format(tmp=tmp_path) for arg in argv]!r}))\n"
+    )
+    env = {**os.environ, "INJINJA_CACHE_DIR": str(tmp_path / "cache")}
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, timeout=120)
+
+    assert result.returncode == 1, result.stderr
+    assert output in result.stdout + result.stderr
+    assert "BrokenProcessPool" not in result.stderr
@@ -0,0 +1,218 @@
+# Standard Library
+import asyncio
+import os
+import sys
+import time
+from unittest import mock
+
+# Third Party
+import pytest
+
+# Our Libraries
+from python_onboarding_guide.cli import COMMANDS, load_command
+
+if sys.version_info < COMMANDS["dbt-cicd"].python:
+    pytest.skip("dbt_cicd.py requires Python 3.12", allow_module_level=True)
+pytest.importorskip("aiohttp")
+web = pytest.importorskip("aiohttp.web")
+
+# The script reads its dbt Cloud settings from the environment when it is imported
+with mock.patch.dict(os.environ, {name: "1" for name in COMMANDS["dbt-cicd"].env}):
+    dbt_cicd = load_command(COMMANDS["dbt-cicd"])
+
+STATUS_CODES = {status: code for code, status in dbt_cicd.run_status_map.items()}
+
+
+class StubClient:
+    """Answers run status requests with the given statuses in turn."""
+
+    def __init__(self, *statuses: str):
+        self.statuses = list(statuses)
+
+    async def get(self, url: str) -> dict:
+        return {"data": {"status": STATUS_CODES[self.statuses.pop(0)]}}
+
+
+@pytest.mark.parametrize(
+    ("statuses", "recorded"),
+    [
+        (["Queued", "Running", "Success"], True),
+        (["Running", "Success"], True),
+        (["Queued", "Success"], False),
+        (["Starting", "Success"], False),
+        (["Success"], False),
+    ],
+)
+def test_monitor_run_records_only_observed_durations(tmp_path, monkeypatch, statuses, recorded) -> None:
+    monkeypatch.setattr(dbt_cicd, "next_poll", lambda *args: 0)
+    history = dbt_cicd.RunHistory(tmp_path / "history.json")
+
+    asyncio.run(dbt_cicd.monitor_run(StubClient(*statuses), 1, job=101, history=history))
+
+    assert (history.expected(101) is not None) is recorded
+
+
+def test_load_matrix(tmp_path) -> None:
+    matrix = tmp_path / "runs.json"
+    matrix.write_text('[{"job": 101, "schema_override": "pr_1"}, {"job": 102, "branch": null}]')
+
+    specs = dbt_cicd.load_matrix(str(matrix))
+
+    assert [spec.job for spec in specs] == ["101", "102"]
+    assert specs[0].schema_override == "pr_1"
+    assert specs[1].branch is None
+
+
+@pytest.mark.parametrize(
+    ("content", "error"),
+    [
+        ('[{"job": 101, "schema": "pr_1"}]', "run 0 has unknown keys schema, expected job, cause, branch"),
+        ('{"job": 101}', "must be a JSON list of objects"),
+        ('[{"schema_override": "pr_1"}]', "each with a job"),
+        ("[{", "Expecting"),
+    ],
+)
+def test_invalid_matrix_is_a_usage_error(tmp_path, capsys, content, error) -> None:
+    matrix = tmp_path / "runs.json"
+    matrix.write_text(content)
+
+    with pytest.raises(SystemExit) as exc:
+        dbt_cicd.cli(["--matrix", str(matrix)])
+
+    assert exc.value.code == 2
+    assert error in capsys.readouterr().err
+
+
+async def _serve(app: web.Application, monkeypatch) -> web.AppRunner:
+    """Start app on a free port as the dbt Cloud API, returning its runner to clean up."""
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    monkeypatch.setattr(dbt_cicd, "api_url", f"http://127.0.0.1:{runner.addresses[0][1]}")
+    return runner
+
+
+def test_artifact_downloads_outlast_the_api_timeout(tmp_path, monkeypatch) -> None:
+    """Streaming an artifact takes longer than the client's total timeout, which only bounds the JSON API calls."""
+
+    async def artifact(request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse()
+        await response.prepare(request)
+        for _ in range(5):
+            await response.write(b"x" * 1024)
+            await asyncio.sleep(0.1)
+        return response
+
+    async def download() -> bool:
+        app = web.Application()
+        app.router.add_get("/api/v2/accounts/{account}/runs/{run}/artifacts/{name}", artifact)
+        runner = await _serve(app, monkeypatch)
+        try:
+            async with dbt_cicd.DbtCloudClient({}, timeout=0.25, retries=0) as client:
+                return await dbt_cicd.download_artifact(client, 1, "manifest.json", tmp_path, {})
+        finally:
+            await runner.cleanup()
+
+    assert asyncio.run(download()) is True
+    assert (tmp_path / "manifest.json").stat().st_size == 5 * 1024
+
+
+def test_token_bucket_lets_the_lowest_priority_value_through_first() -> None:
+    priorities = [dbt_cicd.PRIORITY_ARTIFACT, dbt_cicd.PRIORITY_POLL, dbt_cicd.PRIORITY_TRIGGER, dbt_cicd.PRIORITY_POLL]
+
+    async def order() -> list[int]:
+        bucket = dbt_cicd.TokenBucket(rate=50, capacity=1)
+        await bucket.acquire()  # Empty the bucket, so the rest queue up
+        released: list[int] = []
+
+        async def acquire(priority: int) -> None:
+            await bucket.acquire(priority)
+            released.append(priority)
+
+        await asyncio.gather(*(acquire(priority) for priority in priorities))
+        return released
+
+    assert asyncio.run(order()) == sorted(priorities)
+
+
+@pytest.mark.parametrize(
+    ("rate", "capacity", "requests", "minimum"),
+    [
+        (20, 1, 5, 4 / 20),  # One token at a time: every request after the first waits for a refill
+        (20, 5, 5, 0),  # A full bucket lets a burst through at once
+        (20, 2, 6, 4 / 20),  # The burst, then the refill rate
+    ],
+)
+def test_token_bucket_refills_at_its_rate(rate, capacity, requests, minimum) -> None:
+    async def elapsed() -> float:
+        bucket = dbt_cicd.TokenBucket(rate, capacity)
+        started = time.monotonic()
+        await asyncio.gather(*(bucket.acquire() for _ in range(requests)))
+        return time.monotonic() - started
+
+    assert minimum * 0.9 <= asyncio.run(elapsed()) < minimum + 0.3
+
+
+def test_token_bucket_pause_holds_back_every_request() -> None:
+    async def elapsed() -> float:
+        bucket = dbt_cicd.TokenBucket(rate=0)  # No rate limit, only the pause
+        bucket.pause(0.2)
+        started = time.monotonic()
+        await asyncio.gather(bucket.acquire(), bucket.acquire(dbt_cicd.PRIORITY_TRIGGER))
+        return time.monotonic() - started
+
+    assert 0.18 <= asyncio.run(elapsed()) < 0.35
+
+
+def test_gets_are_retried_on_server_errors_and_throttling(monkeypatch) -> None:
+    statuses = [503, 429, 200]
+    received: list[str] = []
+
+    async def flaky(request: web.Request) -> web.Response:
+        received.append(request.method)
+        status = statuses.pop(0)
+        return web.json_response({"data": status} if status == 200 else {}, status=status, headers={"Retry-After": "0"})
+
+    async def get() -> dict:
+        app = web.Application()
+        app.router.add_get("/runs", flaky)
+        runner = await _serve(app, monkeypatch)
+        try:
+            async with dbt_cicd.DbtCloudClient({}, backoff=0, limiter=dbt_cicd.TokenBucket(rate=0)) as client:
+                return await client.get(f"{dbt_cicd.api_url}/runs")
+        finally:
+            await runner.cleanup()
+
+    assert asyncio.run(get()) == {"data": 200}
+    assert received == ["GET", "GET", "GET"]
+
+
+@pytest.mark.parametrize("failure", ["server error", "disconnect"])
+def test_triggers_are_not_retried_once_sent(monkeypatch, failure) -> None:
+    received: list[str] = []
+
+    async def trigger(request: web.Request) -> web.Response:
+        received.append(request.method)
+        if failure == "disconnect":
+            # dbt Cloud may have queued the run before the connection dropped, so repeating it could run the job twice
+            request.transport.close()
+        return web.json_response({}, status=503)
+
+    async def post() -> dict:
+        app = web.Application()
+        app.router.add_post("/run", trigger)
+        runner = await _serve(app, monkeypatch)
+        try:
+            async with dbt_cicd.DbtCloudClient({}, backoff=0, limiter=dbt_cicd.TokenBucket(rate=0)) as client:
+                return await client.request("POST", f"{dbt_cicd.api_url}/run", json={})
+        finally:
+            await runner.cleanup()
+
+    with pytest.raises(dbt_cicd.aiohttp.ClientError):
+        asyncio.run(post())
+    assert received == ["POST"]
+
+
+def test_client_requires_async_with() -> None:
+    with pytest.raises(RuntimeError, match="DbtCloudClient used outside 'async with'"):
+        asyncio.run(dbt_cicd.DbtCloudClient({}).get("http://127.0.0.1/runs"))
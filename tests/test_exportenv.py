@@ -0,0 +1,112 @@
+# Standard Library
+import os
+import shlex
+
+# Third Party
+import pytest
+
+# Our Libraries
+from python_onboarding_guide.cli import COMMANDS, load_command
+
+exportenv = load_command(COMMANDS["exportenv"])
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("KEY=value", {"KEY": "value"}),
+        ("  KEY = value  ", {"KEY": "value"}),
+        ("export KEY=value", {"KEY": "value"}),
+        ("export\tKEY=value", {"KEY": "value"}),
+        ("KEY=", {"KEY": ""}),
+        ("KEY=a b", {"KEY": "a b"}),
+        ("KEY=value # comment", {"KEY": "value"}),
+        ("KEY=abc#x", {"KEY": "abc#x"}),
+        ("# KEY=value\n\n  # other", {}),
+        ("not an assignment\nKEY=1", {"KEY": "1"}),
+        ("KEY='single $NOT ${EXPANDED}'", {"KEY": "single $NOT ${EXPANDED}"}),
+        ("KEY='it\\'s'", {"KEY": "it's"}),
+        ("KEY='a # b' # comment", {"KEY": "a # b"}),
+        ('KEY="a\\tb\\n\\"c\\" \\$HOME \\\\"', {"KEY": 'a\tb\n"c" $HOME \\'}),
+        ('KEY="a # b" # comment', {"KEY": "a # b"}),
+        ('KEY="first\nsecond"\nNEXT=1', {"KEY": "first\nsecond", "NEXT": "1"}),
+        ('KEY="a"b', {"KEY": '"a"b'}),
+        ("KEY=\r", {"KEY": ""}),
+        ("A=1\nA=2", {"A": "2"}),
+        ("a.b=1\n1KEY=2\nKEY-X=3\n_OK=4", {"_OK": "4"}),
+    ],
+)
+def test_parse_env(text, expected) -> None:
+    assert exportenv.parse_env(text, environ={}) == expected
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("KEY=${HOME}/bin", "/home/me/bin"),
+        ('KEY="${HOME}/bin"', "/home/me/bin"),
+        ("KEY='${HOME}/bin'", "${HOME}/bin"),
+        ("KEY=${MISSING}", ""),
+        ("KEY=${MISSING:-fallback}", "fallback"),
+        ("KEY=${EMPTY:-fallback}", "fallback"),
+        ("KEY=${HOME:-fallback}", "/home/me"),
+        ("HOME=/override\nKEY=${HOME}", "/override"),
+        ("KEY=$HOME", "$HOME"),
+    ],
+)
+def test_parse_env_interpolation(text, expected) -> None:
+    assert exportenv.parse_env(text, environ={"HOME": "/home/me", "EMPTY": ""})["KEY"] == expected
+
+
+def _apply(statements: list[str], monkeypatch) -> None:
+    """Evaluate the export/unset statements of the hook like the shell would."""
+    for statement in statements:
+        command, assignment = shlex.split(statement)
+        if command == "unset":
+            monkeypatch.delenv(assignment, raising=False)
+        else:
+            key, value = assignment.split("=", 1)
+            monkeypatch.setenv(key, value)
+
+
+def test_hook_restores_the_environment_on_leaving(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(exportenv, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setenv("PATH", "/usr/bin")
+    monkeypatch.setenv("EDITOR", "nano")
+    monkeypatch.delenv("PROJECT", raising=False)
+    for var in (exportenv.HOOK_STATE_VAR, exportenv.HOOK_ORIGINAL_VAR):
+        monkeypatch.delenv(var, raising=False)
+    project, elsewhere = tmp_path / "project", tmp_path / "elsewhere"
+    project.mkdir()
+    elsewhere.mkdir()
+    env_file = project / ".env"
+
+    # Enter the project
+    env_file.write_text("PATH=${PATH}:/opt/proj/bin\nEDITOR=vim\n")
+    _apply(exportenv.hook(project), monkeypatch)
+    assert (os.environ["PATH"], os.environ["EDITOR"]) == ("/usr/bin:/opt/proj/bin", "vim")
+    assert exportenv.hook(project) == []
+
+    # Edit its .env: interpolation uses the original PATH, not the exported one
+    env_file.write_text("PATH=${PATH}:/opt/proj/bin\nEDITOR=vim\nPROJECT=demo\n")
+    _apply(exportenv.hook(project), monkeypatch)
+    assert (os.environ["PATH"], os.environ["PROJECT"]) == ("/usr/bin:/opt/proj/bin", "demo")
+
+    # Leave it: the shell's own values come back and the project's own keys go away
+    statements = exportenv.hook(elsewhere)
+    _apply(statements, monkeypatch)
+    assert "unset PATH" not in statements
+    assert (os.environ["PATH"], os.environ["EDITOR"]) == ("/usr/bin", "nano")
+    assert "PROJECT" not in os.environ
+    assert exportenv.HOOK_STATE_VAR not in os.environ
+    assert exportenv.HOOK_ORIGINAL_VAR not in os.environ
+
+
+def test_hook_cache_tracks_interpolated_variables(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(exportenv, "CACHE_DIR", tmp_path / "cache")
+    (tmp_path / ".env").write_text("TARGET=${BASE}/target\n")
+    files = exportenv.layered_env_files(tmp_path)
+    signature = exportenv.files_signature(files)
+
+    assert exportenv.load_layered_env(files, signature, {"BASE": "/a"}) == {"TARGET": "/a/target"}
+    assert exportenv.load_layered_env(files, signature, {"BASE": "/b"}) == {"TARGET": "/b/target"}
@@ -0,0 +1,460 @@
+# Standard Library
+import json
+import os
+import pathlib
+import re
+import sys
+
+# Third Party
+import pytest
+
+# Our Libraries
+from python_onboarding_guide.cli import COMMANDS, load_command
+
+injinja = load_command(COMMANDS["render"])
+
+
+@pytest.fixture(name="parse_cache")
+def _parse_cache(tmp_path, monkeypatch):
+    """An empty parse cache, in memory and on disk."""
+    monkeypatch.setattr(injinja, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(injinja, "_parse_cache", {})
+    monkeypatch.setattr(injinja, "_configs_memo", {})
+    return tmp_path / "cache" / "parsed"
+
+
+@pytest.fixture(name="conf")
+def _conf(tmp_path):
+    conf = tmp_path / "conf"
+    (conf / "frags").mkdir(parents=True)
+    (conf / "main.yml").write_text("name: main\nshared: !include shared.yml\nfrags: !include frags/*.yml\n")
+    (conf / "shared.yml").write_text("value: 1\n")
+    (conf / "frags" / "a.yml").write_text("a: 1\n")
+    (conf / "frags" / "b.yml").write_text("b: 2\n")
+    return conf
+
+
+def test_include_resolves_files_and_globs(conf, parse_cache) -> None:
+    resolver = injinja.IncludeResolver()
+    data = injinja.load_config(str(conf / "main.yml"), resolver=resolver)
+
+    assert data == {"name": "main", "shared": {"value": 1}, "frags": [{"a": 1}, {"b": 2}]}
+    assert resolver.dependencies[(conf / "main.yml").resolve()] == {
+        (conf / name).resolve() for name in ("shared.yml", "frags/a.yml", "frags/b.yml")
+    }
+
+
+def test_include_parses_each_file_once(conf, parse_cache) -> None:
+    (conf / "main.yml").write_text("one: !include shared.yml\ntwo: !include shared.yml\n")
+    resolver = injinja.IncludeResolver()
+
+    data = injinja.load_config(str(conf / "main.yml"), resolver=resolver)
+
+    assert data["one"] is data["two"]
+
+
+def test_include_cycle_is_reported(conf, parse_cache) -> None:
+    (conf / "shared.yml").write_text("back: !include main.yml\n")
+
+    with pytest.raises(ValueError, match="Circular !include"):
+        injinja.load_config(str(conf / "main.yml"))
+
+
+@pytest.mark.parametrize("new_process", [False, True])
+def test_parse_cache_sees_new_glob_matches(conf, parse_cache, monkeypatch, new_process) -> None:
+    assert injinja.load_config(str(conf / "main.yml"))["frags"] == [{"a": 1}, {"b": 2}]
+    (conf / "frags" / "c.yml").write_text("c: 3\n")
+    if new_process:
+        monkeypatch.setattr(injinja, "_parse_cache", {})
+
+    assert injinja.load_config(str(conf / "main.yml"))["frags"] == [{"a": 1}, {"b": 2}, {"c": 3}]
+
+
+def test_parse_cache_sees_changed_includes(conf, parse_cache, monkeypatch) -> None:
+    assert injinja.load_config(str(conf / "main.yml"))["shared"] == {"value": 1}
+    (conf / "shared.yml").write_text("value: 2\n")
+    monkeypatch.setattr(injinja, "_parse_cache", {})
+
+    assert injinja.load_config(str(conf / "main.yml"))["shared"] == {"value": 2}
+
+
+def test_memoised_configs_see_new_glob_matches(conf, parse_cache) -> None:
+    config, _ = injinja.load_configs_memoised(str(conf / "main.yml"))
+    assert len(config["frags"]) == 2
+    (conf / "frags" / "c.yml").write_text("c: 3\n")
+
+    config, dependencies = injinja.load_configs_memoised(str(conf / "main.yml"))
+    assert len(config["frags"]) == 3
+    assert (conf / "frags" / "c.yml").resolve() in dependencies
+
+
+def test_parse_cache_is_pruned(tmp_path, parse_cache, monkeypatch) -> None:
+    monkeypatch.setattr(injinja, "PARSE_CACHE_MAX_FILES", 2)
+    for i in range(4):
+        (tmp_path / f"{i}.yml").write_text(f"i: {i}\n")
+        injinja.load_config(str(tmp_path / f"{i}.yml"))
+
+    assert len(list(parse_cache.glob("*.pickle"))) == 2
+
+
+def test_render_key_without_a_script_file(tmp_path, monkeypatch) -> None:
+    """`curl ... | python3 - --incremental` runs from stdin, with no file behind __file__."""
+    monkeypatch.setattr(injinja, "__file__", "<stdin>")
+    injinja._script_digest.cache_clear()
+    try:
+        manifest = injinja.BuildManifest(tmp_path / "manifest.json")
+        key = manifest.render_key("t.j2", ["c.yml"], None, "append")
+        assert key == manifest.render_key("t.j2", ["c.yml"], None, "append")
+    finally:
+        injinja._script_digest.cache_clear()
+
+
+def test_expand_pathspec_skips_hidden_and_virtualenv_directories(tmp_path) -> None:
+    for directory in ("templates/sub", ".venv/lib", "node_modules/pkg", "env/lib", ".git"):
+        (tmp_path / directory).mkdir(parents=True)
+        (tmp_path / directory / "a.j2").write_text("{{ x }}")
+    (tmp_path / "env" / "pyvenv.cfg").write_text("")
+
+    found = injinja.expand_pathspec(str(tmp_path), injinja.TEMPLATE_SUFFIXES)
+
+    assert found == [str(tmp_path / "templates" / "sub" / "a.j2")]
+
+
+@pytest.mark.parametrize("new_process", [False, True])
+def test_parse_cache_resolves_includes_per_directory(tmp_path, parse_cache, monkeypatch, new_process) -> None:
+    """Configs with identical text include the common.yml next to each of them."""
+    for name, value in (("a", 1), ("b", 2)):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "main.yml").write_text("x: !include common.yml\n")
+        (tmp_path / name / "common.yml").write_text(f"value: {value}\n")
+
+    assert injinja.load_config(str(tmp_path / "a" / "main.yml")) == {"x": {"value": 1}}
+    if new_process:
+        monkeypatch.setattr(injinja, "_parse_cache", {})
+    assert injinja.load_config(str(tmp_path / "b" / "main.yml")) == {"x": {"value": 2}}
+
+
+@pytest.fixture(name="templates")
+def _templates(tmp_path):
+    templates = tmp_path / "templates"
+    templates.mkdir()
+    (templates / "table.sql.j2").write_text("{% set db = 'raw' %}\nSELECT * FROM {{ db }}.{{ schema }}\n{{ rows }}\n")
+    (templates / "view.sql.j2").write_text("{% for t in tables %}{{ t }}{% endfor %}\n")
+    return templates
+
+
+def test_lint_reports_undeclared_variables(templates, parse_cache) -> None:
+    problems = injinja.lint(str(templates), workers=1)
+
+    assert problems == [
+        f"{templates / 'table.sql.j2'}:2: undeclared variable 'schema'",
+        f"{templates / 'table.sql.j2'}:3: undeclared variable 'rows'",
+        f"{templates / 'view.sql.j2'}:1: undeclared variable 'tables'",
+    ]
+
+
+def test_lint_suppresses_config_keys_and_data_sources(templates, tmp_path, parse_cache, caplog) -> None:
+    (tmp_path / "config.yml").write_text("schema: analytics\ntables: [a, b]\n")
+    (tmp_path / "rows.csv").write_text("id\n1\n")
+    argv = ["--lint", str(templates), "-c", str(tmp_path / "config.yml"), "--workers", "1"]
+
+    assert injinja.main([*argv, "--data", f"rows={tmp_path / 'rows.csv'}"]) == 0
+    assert not [record for record in caplog.records if record.levelname == "ERROR"]
+
+    assert injinja.main(argv) == 1
+    assert [record.message for record in caplog.records if record.levelname == "ERROR"] == [
+        f"{templates / 'table.sql.j2'}:3: undeclared variable 'rows'"
+    ]
+
+
+def test_lint_reports_syntax_errors(tmp_path, parse_cache) -> None:
+    (tmp_path / "broken.j2").write_text("{% if x %}\n")
+
+    assert injinja.main(["--lint", str(tmp_path), "--workers", "1"]) == 1
+    assert "syntax error" in injinja.lint(str(tmp_path), workers=1)[0]
+
+
+def test_lint_cache_is_keyed_by_the_script_and_pruned(templates, parse_cache, monkeypatch) -> None:
+    lint_cache = parse_cache.parent / "lint"
+    injinja.lint(str(templates), workers=1)
+    assert len(list(lint_cache.glob("*.json"))) == 2
+
+    # A new injinja lints every template again, and only the most recently used results are kept
+    monkeypatch.setattr(injinja, "_script_digest", lambda: "new")
+    monkeypatch.setattr(injinja, "LINT_CACHE_MAX_FILES", 3)
+    monkeypatch.setattr(injinja, "_lint_source", lambda source, filename: [])
+    assert injinja.lint(str(templates), workers=1) == []
+    assert len(list(lint_cache.glob("*.json"))) == 3
+
+
+@pytest.fixture(name="compiles")
+def _compiles(parse_cache, monkeypatch):
+    """Count the templates compiled from source, with a fresh Environment (as in a new process) before and after."""
+    compiled: list[str] = []
+    compile_source = injinja.jinja2.Environment.compile
+
+    def compile(self, source, name=None, filename=None, *args, **kwargs):
+        compiled.append(filename)
+        return compile_source(self, source, name, filename, *args, **kwargs)
+
+    monkeypatch.setattr(injinja.jinja2.Environment, "compile", compile)
+    injinja.get_environment.cache_clear()
+    yield compiled
+    injinja.get_environment.cache_clear()
+
+
+def test_bytecode_cache_is_reused_until_the_template_changes(tmp_path, parse_cache, compiles) -> None:
+    template = tmp_path / "t.j2"
+    template.write_text("one {{ x }}")
+    assert injinja.merge_template(str(template), {"x": 1}) == "one 1"
+
+    injinja.get_environment.cache_clear()  # A new process loads the compiled template from disk
+    assert injinja.merge_template(str(template), {"x": 1}) == "one 1"
+    assert len(compiles) == 1
+
+    template.write_text("two {{ x }}")
+    os.utime(template, ns=(0, 0))  # Invalidated by the source, whatever its mtime
+    injinja.get_environment.cache_clear()
+    assert injinja.merge_template(str(template), {"x": 1}) == "two 1"
+    assert len(compiles) == 2
+    assert len(list((parse_cache.parent / "bytecode").iterdir())) == 1  # Replaced, not orphaned
+
+
+def test_bytecode_cache_is_pruned(tmp_path, parse_cache, compiles, monkeypatch) -> None:
+    monkeypatch.setattr(injinja, "BYTECODE_CACHE_MAX_FILES", 2)
+    for i in range(4):
+        (tmp_path / f"{i}.j2").write_text(f"{i} {{{{ x }}}}")
+        injinja.merge_template(str(tmp_path / f"{i}.j2"), {"x": i})
+
+    injinja.get_environment.cache_clear()
+    injinja.get_environment()
+
+    assert len(list((parse_cache.parent / "bytecode").iterdir())) == 2
+
+
+@pytest.fixture(name="batch")
+def _batch(tmp_path):
+    """A manifest rendering every template under pages/ (one of them broken) into out/, with the temporary files."""
+    (tmp_path / "pages").mkdir()
+    (tmp_path / "pages" / "home.html.j2").write_text("home of {{ site }}")
+    (tmp_path / "pages" / "about.html.j2").write_text("about {{ site }}")
+    (tmp_path / "pages" / "broken.html.j2").write_text("{{ site.missing.attribute }}")
+    (tmp_path / "config.yml").write_text("site: example\n")
+    manifest = tmp_path / "batch.yml"
+    manifest.write_text(
+        f"defaults:\n  config: {tmp_path / 'config.yml'}\n"
+        f"items:\n  - template: {tmp_path / 'pages' / '*.j2'}\n    output: {tmp_path / 'out' / '{stem}'}\n"
+        f"  - template: {tmp_path / 'pages' / 'home.html.j2'}\n    output: {tmp_path / 'copy' / '{name}.txt'}\n"
+    )
+    return manifest
+
+
+def test_batch_expands_globs_into_output_patterns(tmp_path, batch) -> None:
+    items = injinja.expand_batch_manifest(str(batch))
+
+    assert [(pathlib.Path(item.template).name, item.output) for item in items] == [
+        ("about.html.j2", str(tmp_path / "out" / "about.html")),
+        ("broken.html.j2", str(tmp_path / "out" / "broken.html")),
+        ("home.html.j2", str(tmp_path / "out" / "home.html")),
+        ("home.html.j2", str(tmp_path / "copy" / "home.html.j2.txt")),
+    ]
+    assert {item.config for item in items} == {(str(tmp_path / "config.yml"),)}
+
+
+def test_batch_failure_does_not_abort_the_other_items(tmp_path, batch, parse_cache, caplog) -> None:
+    caplog.set_level("INFO")
+    assert injinja.main(["--batch", str(batch), "--workers", "1"]) == 1
+
+    assert (tmp_path / "out" / "home.html").read_text() == "home of example"
+    assert (tmp_path / "out" / "about.html").read_text() == "about example"
+    assert (tmp_path / "copy" / "home.html.j2.txt").read_text() == "home of example"
+    errors = [record.message for record in caplog.records if record.levelname == "ERROR"]
+    assert len(errors) == 1
+    assert errors[0].startswith(f"FAILED {tmp_path / 'out' / 'broken.html'}: UndefinedError:")
+    assert "# Rendered 3/4 outputs" in caplog.messages
+
+
+def test_batch_outputs_are_written_atomically(tmp_path, batch, parse_cache) -> None:
+    (tmp_path / "out").mkdir()
+    (tmp_path / "out" / "broken.html").write_text("previous")
+    (tmp_path / "out" / "home.html").write_text("previous")
+    (tmp_path / "out" / "home.html").chmod(0o640)
+
+    injinja.main(["--batch", str(batch), "--workers", "1"])
+
+    # The failed render leaves the previous output, the new one replaces it keeping its mode, and no temporary is left
+    assert (tmp_path / "out" / "broken.html").read_text() == "previous"
+    assert (tmp_path / "out" / "home.html").read_text() == "home of example"
+    assert (tmp_path / "out" / "home.html").stat().st_mode & 0o777 == 0o640
+    assert sorted(path.name for path in (tmp_path / "out").iterdir()) == ["about.html", "broken.html", "home.html"]
+
+
+@pytest.fixture(name="site")
+def _site(tmp_path, parse_cache, monkeypatch):
+    """A template including a partial, its config including a fragment, and the list of outputs rendered."""
+    (tmp_path / "partial.j2").write_text("{{ footer.text }}")
+    (tmp_path / "page.j2").write_text(f"{{{{ title }}}} {{% include '{tmp_path / 'partial.j2'}' %}}")
+    (tmp_path / "footer.yml").write_text("text: bye\n")
+    (tmp_path / "config.yml").write_text("title: hello\nfooter: !include footer.yml\n")
+    rendered: list[str] = []
+    render_to = injinja.render_to
+
+    def counting_render_to(template, config, output="stdout"):
+        rendered.append(output)
+        render_to(template, config, output)
+
+    monkeypatch.setattr(injinja, "render_to", counting_render_to)
+    return rendered
+
+
+def _render_incrementally(tmp_path) -> int:
+    manifest, output = tmp_path / "manifest.json", tmp_path / "page.txt"
+    argv = ["-t", str(tmp_path / "page.j2"), "-c", str(tmp_path / "config.yml"), "-o", str(output)]
+    return injinja.main([*argv, "--incremental", str(manifest)])
+
+
+def test_incremental_skips_unchanged_outputs(tmp_path, site) -> None:
+    assert _render_incrementally(tmp_path) == 0
+    assert _render_incrementally(tmp_path) == 0
+
+    assert len(site) == 1
+    assert (tmp_path / "page.txt").read_text() == "hello bye"
+
+
+@pytest.mark.parametrize(
+    ("changed", "content", "expected"),
+    [
+        ("page.j2", "{{ title }}!", "hello!"),
+        ("partial.j2", "{{ footer.text }}!", "hello bye!"),
+        ("config.yml", "title: hi\nfooter: !include footer.yml\n", "hi bye"),
+        ("footer.yml", "text: ciao\n", "hello ciao"),
+    ],
+)
+def test_incremental_renders_again_when_an_input_changes(tmp_path, site, changed, content, expected) -> None:
+    _render_incrementally(tmp_path)
+    (tmp_path / changed).write_text(content)
+    injinja.get_environment.cache_clear()
+
+    assert _render_incrementally(tmp_path) == 0
+    assert len(site) == 2
+    assert (tmp_path / "page.txt").read_text() == expected
+
+
+def test_identical_output_keeps_its_mtime(tmp_path, site) -> None:
+    _render_incrementally(tmp_path)
+    os.utime(tmp_path / "page.txt", ns=(0, 0))
+    (tmp_path / "config.yml").write_text("# Only a comment changed\ntitle: hello\nfooter: !include footer.yml\n")
+
+    assert _render_incrementally(tmp_path) == 0
+    assert len(site) == 2  # Rendered again, as an input changed
+    assert (tmp_path / "page.txt").stat().st_mtime_ns == 0  # But not rewritten
+    assert _render_incrementally(tmp_path) == 0
+    assert len(site) == 2  # And the manifest recorded the kept file as fresh
+
+
+@pytest.mark.parametrize(
+    ("filename", "content"),
+    [("rows.csv", "id,name\n1,a\n2,b\n"), ("rows.jsonl", '{"id": "1", "name": "a"}\n\n{"id": "2", "name": "b"}\n')],
+)
+def test_data_source_reads_the_rows_again_on_every_loop(tmp_path, filename, content) -> None:
+    (tmp_path / filename).write_text(content)
+    source = injinja.DataSource(tmp_path / filename)
+
+    assert list(source) == [{"id": "1", "name": "a"}, {"id": "2", "name": "b"}]
+    assert [row["name"] for row in source] == ["a", "b"]
+
+
+def test_parquet_data_source_without_pyarrow(tmp_path, monkeypatch) -> None:
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    monkeypatch.setitem(sys.modules, "pyarrow.parquet", None)
+
+    with pytest.raises(ImportError, match="requires pyarrow: pip install pyarrow"):
+        list(injinja.DataSource(tmp_path / "rows.parquet"))
+
+
+def test_data_source_of_an_unknown_format(tmp_path) -> None:
+    with pytest.raises(ValueError, match="must be one of .csv, .jsonl"):
+        injinja.DataSource(tmp_path / "rows.xlsx")
+
+
+def test_data_arguments_are_name_and_path(tmp_path) -> None:
+    sources = injinja.data_sources_from_keyvalue_list(["rows=rows.csv", "odd=a=b.jsonl"])
+
+    assert {name: (str(source.path), source.format) for name, source in sources.items()} == {
+        "rows": ("rows.csv", "csv"),
+        "odd": ("a=b.jsonl", "jsonl"),
+    }
+    assert injinja.data_sources_from_keyvalue_list(None) == {}
+
+
+@pytest.mark.parametrize("arg", ["rows.csv", "=rows.csv", "row-s=rows.csv", "1rows=rows.csv", "rows="])
+def test_data_arguments_must_be_name_and_path(arg) -> None:
+    with pytest.raises(ValueError, match="--data expects NAME=PATH"):
+        injinja.data_sources_from_keyvalue_list([arg])
+
+
+@pytest.mark.parametrize("config", [None, {"title": "x"}])
+def test_data_sources_sit_next_to_the_config_keys(tmp_path, config) -> None:
+    data = {"rows": injinja.DataSource(tmp_path / "rows.csv")}
+
+    assert injinja.with_data(config, data) == {**(config or {}), **data}
+    assert injinja.with_data([1, 2], {}) == [1, 2]
+
+
+@pytest.mark.parametrize(("content", "kind"), [("- a\n- b\n", "list"), ("just text\n", "str")])
+def test_data_sources_need_a_mapping_config(tmp_path, parse_cache, caplog, content, kind) -> None:
+    (tmp_path / "config.yml").write_text(content)
+    (tmp_path / "rows.csv").write_text("id\n1\n")
+    (tmp_path / "t.j2").write_text("{{ rows }}")
+    argv = ["-t", str(tmp_path / "t.j2"), "-c", str(tmp_path / "config.yml"), "--data", f"rows={tmp_path / 'rows.csv'}"]
+    error = f"--data needs a mapping at the top level of the config {tmp_path / 'config.yml'}, not a {kind}"
+
+    with pytest.raises(ValueError, match=re.escape(error)):
+        injinja.main(argv)
+
+    # A batch reports it against each of the items of that config instead
+    batch = tmp_path / "batch.yml"
+    batch.write_text(f"- template: {argv[1]}\n  config: {argv[3]}\n  output: {tmp_path / 'out'}\n")
+    assert injinja.main(["--batch", str(batch), "--data", argv[5], "--workers", "1"]) == 1
+    assert error in caplog.text
+
+
+@pytest.fixture(name="profiled")
+def _profiled(tmp_path, parse_cache):
+    """A page with a block, an include and a macro called twice, and the jinja2 hooks as they were before profiling."""
+    (tmp_path / "partial.j2").write_text("{% macro cell(x) %}<td>{{ x }}</td>{% endmacro %}{{ cell(1) }}{{ cell(2) }}")
+    (tmp_path / "page.j2").write_text(
+        f"{{% block body %}}{{{{ title }}}} {{% include '{tmp_path / 'partial.j2'}' %}}{{% endblock %}}"
+    )
+    (tmp_path / "config.yml").write_text("title: hello\n")
+    injinja.get_environment.cache_clear()
+    yield injinja.get_environment().template_class, injinja.jinja2.runtime.Macro._invoke
+    injinja.get_environment.cache_clear()
+
+
+def test_profile_reports_includes_blocks_and_macros(tmp_path, profiled) -> None:
+    argv = ["-t", str(tmp_path / "page.j2"), "-c", str(tmp_path / "config.yml"), "-o", str(tmp_path / "page.html")]
+
+    assert injinja.main([*argv, "--profile-render", str(tmp_path / "profile.json")]) == 0
+
+    assert (tmp_path / "page.html").read_text() == "hello <td>1</td><td>2</td>"
+    entries = {(e["kind"], e["name"]): e for e in json.loads((tmp_path / "profile.json").read_text())}
+    assert {key: entries[key]["calls"] for key in entries} == {
+        ("template", str(tmp_path / "page.j2")): 1,
+        ("block", f"{tmp_path / 'page.j2'}:body"): 1,
+        ("include", str(tmp_path / "partial.j2")): 1,
+        ("macro", "cell"): 2,
+    }
+    assert entries[("macro", "cell")]["chars"] == len("<td>1</td><td>2</td>")
+    assert (injinja.get_environment().template_class, injinja.jinja2.runtime.Macro._invoke) == profiled
+
+
+def test_profile_restores_jinja2_when_the_render_fails(tmp_path, profiled) -> None:
+    (tmp_path / "broken.j2").write_text("{{ title.missing.attribute }}")
+
+    with pytest.raises(injinja.jinja2.UndefinedError), injinja.RenderProfiler() as profiler:
+        assert injinja.get_environment().template_class is not profiled[0]
+        injinja.merge_template(str(tmp_path / "broken.j2"), {"title": "x"})
+
+    assert (injinja.get_environment().template_class, injinja.jinja2.runtime.Macro._invoke) == profiled
+    assert list(profiler.entries) == [("template", str(tmp_path / "broken.j2"))]
@@ -0,0 +1,106 @@
+# Standard Library
+import io
+import socket
+import threading
+import time
+from types import SimpleNamespace
+
+# Third Party
+import pytest
+
+# Our Libraries
+from python_onboarding_guide.cli import COMMANDS, Command, load_command
+
+injinja = load_command(COMMANDS["render"])
+client = load_command(Command("scripts/injinja-client.py", "main", "Render through the injinja daemon."))
+
+
+class Exec(Exception):  # noqa: N818 - stands in for os.execv replacing the process
+    pass
+
+
+@pytest.fixture(name="daemon")
+def _daemon(tmp_path, monkeypatch):
+    """The socket of an injinja daemon serving from a thread, with its caches under tmp_path."""
+    monkeypatch.setattr(injinja, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(injinja, "_parse_cache", {})
+    monkeypatch.setattr(injinja, "_configs_memo", {})
+    injinja.get_environment.cache_clear()  # Its bytecode cache is under CACHE_DIR
+    servers = []
+
+    class Server(injinja.socketserver.UnixStreamServer):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            servers.append(self)
+
+    monkeypatch.setattr(injinja.socketserver, "UnixStreamServer", Server)
+    socket_path = tmp_path / "daemon.sock"
+    thread = threading.Thread(target=injinja.serve, args=(socket_path,), daemon=True)
+    thread.start()
+    for _ in range(100):
+        if servers and socket_path.exists():
+            break
+        time.sleep(0.05)
+    yield socket_path
+    servers[0].shutdown()
+    thread.join(timeout=5)
+    injinja.get_environment.cache_clear()
+
+
+@pytest.fixture(name="output")
+def _output(monkeypatch):
+    """What the client relays, kept apart from sys.stdout and sys.stderr: the daemon thread redirects those."""
+    output = SimpleNamespace(stdout=io.StringIO(), stderr=io.StringIO())
+    monkeypatch.setattr(client, "sys", output)
+    return output
+
+
+def _read(stream: io.StringIO) -> str:
+    text = stream.getvalue()
+    stream.seek(0)
+    stream.truncate()
+    return text
+
+
+def test_client_renders_through_the_daemon(tmp_path, daemon, output) -> None:
+    template, config, shared = tmp_path / "t.j2", tmp_path / "config.yml", tmp_path / "shared.yml"
+    template.write_text("{{ greeting }} {{ shared.value }}\n")
+    config.write_text("greeting: hi\nshared: !include shared.yml\n")
+    shared.write_text("value: 1\n")
+    argv = ["-t", str(template), "-c", str(config)]
+
+    assert client.request(argv, daemon) == 0
+    assert _read(output.stdout) == "hi 1\n"
+
+    config.write_text("greeting: hello\nshared: !include shared.yml\n")
+    assert client.request(argv, daemon) == 0
+    assert _read(output.stdout) == "hello 1\n"
+
+    shared.write_text("value: 22\n")
+    assert client.request(argv, daemon) == 0
+    assert _read(output.stdout) == "hello 22\n"
+
+
+def test_daemon_reports_errors_to_the_client(tmp_path, daemon, output) -> None:
+    assert client.request(["-t", str(tmp_path / "missing.j2"), "-c", str(tmp_path / "missing.yml")], daemon) == 1
+    assert "missing.yml" in _read(output.stderr)
+
+    assert client.request(["--watch", "-t", "t.j2", "-c", "c.yml"], daemon) == 1
+    assert "--watch and --serve cannot be sent to the daemon" in _read(output.stderr)
+
+
+@pytest.mark.parametrize("stale", [False, True])
+def test_client_runs_the_script_without_a_daemon(tmp_path, monkeypatch, stale) -> None:
+    socket_path = tmp_path / "daemon.sock"
+    if stale:  # Left behind by a daemon that was killed: connecting is refused
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.bind(str(socket_path))
+
+    def execv(path, args):
+        raise Exec(args)
+
+    monkeypatch.setattr(client.os, "execv", execv)
+    with pytest.raises(Exec) as exc:
+        client.main(["-t", "t.j2", "-c", "c.yml"], socket_path)
+
+    assert exc.value.args[0][1:] == [str(client.INJINJA_SCRIPT), "-t", "t.j2", "-c", "c.yml"]
@@ -0,0 +1,56 @@
+# Standard Library
+import json
+import subprocess
+
+# Third Party
+import pytest
+
+# Our Libraries
+from python_onboarding_guide.cli import COMMANDS, load_command
+
+penv = load_command(COMMANDS["pyenv-latest"])
+
+# In no particular order, as groupby would silently split unsorted series
+ENTRIES = [
+    "3.11.2",
+    "pypy3.10-7.3.12",
+    "3.12.0",
+    "3.11.10",
+    "3.13.0rc1",
+    "pypy3.9-7.3.15",
+    "3.12.4",
+    "3.11.9",
+    "pypy3.10-7.3.15",
+    "3.13.0t",
+    "3.12.10",
+    "3.10-dev",
+]
+
+
+@pytest.mark.parametrize(
+    ("family", "expected"),
+    [
+        ("cpython", ["3.12.10", "3.11.10"]),
+        ("pypy", ["pypy3.10-7.3.15", "pypy3.9-7.3.15"]),
+        ("graalpy", []),
+    ],
+)
+def test_max_patched_versions_of_unsorted_entries(family, expected) -> None:
+    assert penv.max_patched_versions(ENTRIES, family) == expected
+
+
+@pytest.mark.parametrize(
+    ("returncode", "stdout"),
+    [(1, "Available versions:\n  3.12.0\n"), (0, "Available versions:\n")],
+)
+def test_failed_fetch_keeps_the_cached_index(tmp_path, monkeypatch, returncode, stdout) -> None:
+    cache_file = tmp_path / "index.json"
+    cache_file.write_text(json.dumps({"fetched_at": 0, "versions": ["3.11.9"]}))
+    monkeypatch.setattr(penv, "update_pyenv", lambda: None)
+    result = subprocess.CompletedProcess("pyenv install --list", returncode, stdout, "pyenv: broken")
+    monkeypatch.setattr(penv.subprocess, "run", lambda *args, **kwargs: result)
+
+    with pytest.raises(RuntimeError, match="pyenv install --list"):
+        penv.load_index(cache_file=cache_file)
+
+    assert json.loads(cache_file.read_text())["versions"] == ["3.11.9"]
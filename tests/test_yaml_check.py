@@ -0,0 +1,104 @@
+# Standard Library
+import json
+
+# Third Party
+import pytest
+
+# Our Libraries
+from python_onboarding_guide.cli import COMMANDS, load_command
+
+yaml_check = load_command(COMMANDS["yaml-check"])
+
+SCHEMA = """\
+type: object
+required: [name]
+properties:
+  name: {type: string}
+  replicas: {type: integer, minimum: 1}
+"""
+
+
+@pytest.fixture(autouse=True)
+def _no_validator(monkeypatch):
+    """Checking in this process compiles the schema into a module global, do not leak it into the next test."""
+    monkeypatch.setattr(yaml_check, "_validator", None)
+
+
+@pytest.fixture(name="schema")
+def _schema(tmp_path_factory):
+    schema = tmp_path_factory.mktemp("schema") / "schema.yml"
+    schema.write_text(SCHEMA)
+    return str(schema)
+
+
+def test_syntax_errors_are_reported_at_their_line_and_column(tmp_path, capsys) -> None:
+    (tmp_path / "ok.yml").write_text("name: ok\n")
+    (tmp_path / "bad.yml").write_text("name: ok\nitems: [a, b\nnext: 1\n")
+
+    with pytest.raises(SystemExit) as exc:
+        yaml_check.cli([str(tmp_path), "--workers", "1"])
+
+    assert exc.value.code == 1
+    # The wording of the problem differs between libyaml and the pure Python loader, the position does not
+    [error] = capsys.readouterr().out.splitlines()
+    assert error.startswith(f"{tmp_path / 'bad.yml'}:3:5: ")
+    assert "','" in error
+
+
+def test_schema_violations_are_reported_at_the_offending_value(tmp_path, schema, capsys) -> None:
+    (tmp_path / "deploy.yml").write_text("name: web\nreplicas: 0\n")
+
+    with pytest.raises(SystemExit) as exc:
+        yaml_check.cli([str(tmp_path / "deploy.yml"), "--schema", schema])
+
+    assert exc.value.code == 1
+    assert capsys.readouterr().out.splitlines() == [
+        f"{tmp_path / 'deploy.yml'}:2:11: replicas: 0 is less than the minimum of 1",
+    ]
+
+
+def test_every_document_of_a_file_is_checked(tmp_path, schema) -> None:
+    (tmp_path / "multi.yml").write_text("name: a\n---\nname: b\nreplicas: 2\n---\nreplicas: 3\n")
+    yaml_check._init_worker(yaml_check.load_schema(schema))
+
+    assert yaml_check.check_file(str(tmp_path / "multi.yml")) == [
+        f"{tmp_path / 'multi.yml'}:6:1: <root>: 'name' is a required property",
+    ]
+
+
+def test_valid_files_exit_cleanly(tmp_path, schema) -> None:
+    (tmp_path / "a.yml").write_text("name: a\n---\nname: b\n")
+    (tmp_path / "b.yaml").write_text("name: c\nreplicas: 1\n")
+
+    with pytest.raises(SystemExit) as exc:
+        yaml_check.cli([str(tmp_path), "--schema", schema, "--workers", "2"])
+
+    assert exc.value.code == 0
+
+
+def _jsonl(capsys) -> list:
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_jsonl_writes_one_line_per_document(tmp_path, capsys) -> None:
+    (tmp_path / "a.yml").write_text("name: a\nwhen: 2024-01-31\n---\n[1, 2]\n---\n")
+    (tmp_path / "b.yml").write_text("name: b\n")
+
+    yaml_check.cli(["--jsonl", str(tmp_path / "a.yml"), str(tmp_path / "b.yml")])
+
+    assert _jsonl(capsys) == [{"name": "a", "when": "2024-01-31"}, [1, 2], None, {"name": "b"}]
+
+
+def test_jsonl_items_splits_top_level_sequences(tmp_path, capsys) -> None:
+    (tmp_path / "rows.yml").write_text(
+        "- &base {id: 1, tags: [x]}\n- {id: 2, <<: *base}\n- [nested, list]\n---\nname: not a sequence\n"
+    )
+
+    yaml_check.cli(["--jsonl", "--items", str(tmp_path / "rows.yml")])
+
+    assert _jsonl(capsys) == [
+        {"id": 1, "tags": ["x"]},
+        {"id": 2, "tags": ["x"]},
+        ["nested", "list"],
+        {"name": "not a sequence"},
+    ]